@@ -0,0 +1,282 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+"""Compare the accuracy and speed of every interpolant registered in
+`bilby_nr.match.interpolant_map` against the reference Pade-Pade fit,
+`bilby_nr.interp.pade_pade.mismatch_interpolant`. All interpolants are
+evaluated on the same random set of parameters drawn from the domain of the
+fits. For each interpolant and waveform approximant we report the number of
+evaluations per second (scalar and batched), the maximum and root mean square
+error in log10 mismatch and the maximum and root mean square error in the
+resulting weights. A table is written as a csv file alongside a plot:
+
+    $ python benchmarks/interpolant_accuracy.py --outdir benchmark_results
+"""
+
+import os
+import time
+import numpy as np
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+INTERPOLANT_ARGS = [
+    "mass_1", "mass_2", "a_1", "tilt_1", "phi_12", "a_2", "tilt_2", "phi_jl",
+    "theta_jn", "phase"
+]
+COLUMNS = [
+    "interpolant", "waveform_approximant", "scalar_evaluations_per_second",
+    "batched_evaluations_per_second", "max_log10_mismatch_error",
+    "rms_log10_mismatch_error", "max_weight_error", "rms_weight_error",
+    "best_model_changed_fraction"
+]
+
+
+def random_parameters(nsamples=100000, seed=1234):
+    """Draw random binary black hole parameters from the domain of the
+    Pade-Pade fits
+
+    Parameters
+    ----------
+    nsamples: int, optional
+        number of samples to draw. Default 100000
+    seed: int, optional
+        seed for the random number generator. Default 1234
+
+    Returns
+    -------
+    parameters: dict
+        dictionary of arrays for each argument of the interpolants
+    """
+    from bilby_nr.interp.pade_pade import FIT_DOMAIN
+    rng = np.random.default_rng(seed)
+    mass_1 = rng.uniform(*FIT_DOMAIN["mass_1"], nsamples)
+    return dict(
+        mass_1=mass_1,
+        mass_2=mass_1 * rng.uniform(*FIT_DOMAIN["mass_ratio"], nsamples),
+        a_1=rng.uniform(*FIT_DOMAIN["a_1"], nsamples),
+        tilt_1=np.arccos(rng.uniform(-1, 1, nsamples)),
+        phi_12=rng.uniform(0, 2 * np.pi, nsamples),
+        a_2=rng.uniform(*FIT_DOMAIN["a_2"], nsamples),
+        tilt_2=np.arccos(rng.uniform(-1, 1, nsamples)),
+        phi_jl=rng.uniform(0, 2 * np.pi, nsamples),
+        theta_jn=np.arccos(rng.uniform(-1, 1, nsamples)),
+        phase=rng.uniform(0, 2 * np.pi, nsamples),
+    )
+
+
+def _throughput(function, args, nscalar=1000, repeat=3):
+    """Return the number of scalar and batched evaluations per second. The
+    quickest of `repeat` runs is used
+    """
+    scalar, batched = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for num in range(min(nscalar, len(args[0]))):
+            function(*[arg[num] for arg in args])
+        scalar.append(
+            min(nscalar, len(args[0])) / (time.perf_counter() - start)
+        )
+        start = time.perf_counter()
+        function(*args)
+        batched.append(len(args[0]) / (time.perf_counter() - start))
+    return max(scalar), max(batched)
+
+
+def _errors(difference):
+    """Return the maximum absolute and root mean square of an array"""
+    difference = np.abs(difference)
+    return float(np.max(difference)), float(np.sqrt(np.mean(difference**2)))
+
+
+def compare_interpolants(
+    waveform_approximant_list=None, nsamples=100000, nscalar=1000, repeat=3,
+    seed=1234, use_best=False, mapping=None
+):
+    """Evaluate every interpolant in `bilby_nr.match.interpolant_map` and
+    compare against the reference Pade-Pade fit
+
+    Parameters
+    ----------
+    waveform_approximant_list: list, optional
+        list of waveform approximants to compare. Default all waveform
+        approximants with a Pade-Pade fit
+    nsamples: int, optional
+        number of random samples to evaluate. Default 100000
+    nscalar: int, optional
+        number of samples used to measure the scalar throughput. Default 1000
+    repeat: int, optional
+        number of times each throughput measurement is repeated. Default 3
+    seed: int, optional
+        seed for the random number generator. Default 1234
+    use_best: bool, optional
+        if True, give all weight to the approximant with the highest match
+        when comparing weights. Default False
+    mapping: str, optional
+        a string that can be evaluated to map an array of matches to a series
+        of weights. See bilby_nr.source._weights_from_matches
+
+    Returns
+    -------
+    table: pandas.DataFrame
+        table with one row per interpolant and waveform approximant
+    """
+    import pandas as pd
+    from bilby_nr.interp.pade_pade import ALLOWED_MODELS, mismatch_interpolant
+    from bilby_nr.match import interpolant_map
+    from bilby_nr.source import _weights_from_matches
+    if waveform_approximant_list is None:
+        waveform_approximant_list = ALLOWED_MODELS
+    parameters = random_parameters(nsamples=nsamples, seed=seed)
+    args = [parameters[key] for key in INTERPOLANT_ARGS]
+    reference = np.array([
+        mismatch_interpolant(approximant, *args) for approximant in
+        waveform_approximant_list
+    ]).T
+    reference_weights = _weights_from_matches(
+        1 - reference, use_best=use_best, mapping=mapping
+    )
+    rows = []
+    for name, function in interpolant_map.items():
+        # warm up so that compilation and file reads are not timed
+        for approximant in waveform_approximant_list:
+            function(approximant, *[arg[:1] for arg in args])
+        matches = np.array([
+            function(approximant, *args) for approximant in
+            waveform_approximant_list
+        ]).T
+        weights = _weights_from_matches(
+            matches, use_best=use_best, mapping=mapping
+        )
+        changed = np.mean(
+            np.argmax(weights, axis=-1) !=
+            np.argmax(reference_weights, axis=-1)
+        )
+        for num, approximant in enumerate(waveform_approximant_list):
+            scalar, batched = _throughput(
+                lambda *_args: function(approximant, *_args), args,
+                nscalar=nscalar, repeat=repeat
+            )
+            with np.errstate(divide="ignore"):
+                log10_error = _errors(
+                    np.log10(1 - matches[:, num]) -
+                    np.log10(reference[:, num])
+                )
+            weight_error = _errors(
+                weights[:, num] - reference_weights[:, num]
+            )
+            rows.append(dict(zip(COLUMNS, [
+                name, approximant, scalar, batched, *log10_error,
+                *weight_error, float(changed)
+            ])))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def plot(table, filename):
+    """Plot the error in log10 mismatch against the number of evaluations per
+    second for each interpolant and waveform approximant
+
+    Parameters
+    ----------
+    table: pandas.DataFrame
+        table produced by `compare_interpolants`
+    filename: str
+        name of the file to save the plot to
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, axs = plt.subplots(1, 2, figsize=(12, 5), sharey=True)
+    markers = dict(zip(
+        table["waveform_approximant"].unique(), ["o", "s", "^", "v", "D"]
+    ))
+    for ax, mode in zip(axs, ["scalar", "batched"]):
+        for num, name in enumerate(table["interpolant"].unique()):
+            _table = table[table["interpolant"] == name]
+            for _, row in _table.iterrows():
+                ax.scatter(
+                    row[f"{mode}_evaluations_per_second"],
+                    # errors of zero can not be shown on a log scale
+                    max(row["max_log10_mismatch_error"], 1e-16),
+                    color=f"C{num}",
+                    marker=markers.get(row["waveform_approximant"], "o"),
+                    label=f"{name}: {row['waveform_approximant']}"
+                )
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel(f"{mode.capitalize()} evaluations per second")
+        ax.grid(alpha=0.3)
+    axs[0].set_ylabel(r"Maximum error in $\log_{10}$ mismatch")
+    axs[1].legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(filename)
+    plt.close(fig)
+    return filename
+
+
+def create_parser():
+    """Create a parser for the interpolant benchmark"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare the accuracy and speed of the match interpolants"
+        )
+    )
+    parser.add_argument(
+        "--outdir", default=".",
+        help="directory to write the table and plot to. Default '.'"
+    )
+    parser.add_argument(
+        "--waveform-approximant-list", nargs="+", default=None,
+        help=(
+            "waveform approximants to compare. Default all approximants with "
+            "a Pade-Pade fit"
+        )
+    )
+    parser.add_argument(
+        "--nsamples", type=int, default=100000,
+        help="number of random samples to evaluate. Default 100000"
+    )
+    parser.add_argument(
+        "--nscalar", type=int, default=1000,
+        help=(
+            "number of samples used to measure the scalar throughput. "
+            "Default 1000"
+        )
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="number of times each timing is repeated. Default 3"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=1234,
+        help="seed for the random number generator. Default 1234"
+    )
+    parser.add_argument(
+        "--use-best-match", action="store_true", default=False,
+        help="give all weight to the approximant with the highest match"
+    )
+    parser.add_argument(
+        "--match-to-weight", default=None,
+        help="string to map an array of matches to a series of weights"
+    )
+    return parser
+
+
+def main(args=None):
+    """Compare the accuracy and speed of the match interpolants"""
+    args = create_parser().parse_args(args=args)
+    os.makedirs(args.outdir, exist_ok=True)
+    table = compare_interpolants(
+        waveform_approximant_list=args.waveform_approximant_list,
+        nsamples=args.nsamples, nscalar=args.nscalar, repeat=args.repeat,
+        seed=args.seed, use_best=args.use_best_match,
+        mapping=args.match_to_weight
+    )
+    table.to_csv(
+        os.path.join(args.outdir, "interpolant_accuracy.csv"), index=False
+    )
+    plot(table, os.path.join(args.outdir, "interpolant_accuracy.png"))
+    return table
+
+
+if __name__ == "__main__":
+    print(main().to_string(index=False))
@@ -0,0 +1,170 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+"""Benchmarks for the performance critical parts of bilby_nr. These
+benchmarks run offline and make use of pytest-benchmark. To store a new
+baseline, run,
+
+    $ python -m pytest benchmarks --benchmark-autosave
+
+and to compare against the latest stored baseline, flagging any benchmark
+whose mean runtime has increased by more than 10%, run,
+
+    $ python -m pytest benchmarks --benchmark-compare \
+        --benchmark-compare-fail=mean:10%
+
+Baselines are stored as JSON files in the `.benchmarks` directory.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+PARAMETERS = dict(
+    mass_1=100., mass_2=50., a_1=0.6, tilt_1=np.pi / 3, phi_12=np.pi / 2,
+    a_2=0.2, tilt_2=np.pi / 10, phi_jl=np.pi, theta_jn=np.pi / 3, phase=0.,
+)
+INTERPOLANT_ARGS = [
+    "mass_1", "mass_2", "a_1", "tilt_1", "phi_12", "a_2", "tilt_2", "phi_jl",
+    "theta_jn", "phase"
+]
+WAVEFORM_ARGUMENTS = dict(
+    reference_frequency=20.0, minimum_frequency=20.0,
+    catch_waveform_errors=False,
+)
+
+
+def _random_parameters(n, seed=1234):
+    """Return n sets of random binary black hole parameters within the
+    domain of the Pade-Pade fits
+    """
+    rng = np.random.default_rng(seed)
+    mass_1 = rng.uniform(30, 150, n)
+    return dict(
+        mass_1=mass_1, mass_2=mass_1 * rng.uniform(0.25, 1, n),
+        a_1=rng.uniform(0, 0.99, n), tilt_1=np.arccos(rng.uniform(-1, 1, n)),
+        phi_12=rng.uniform(0, 2 * np.pi, n), a_2=rng.uniform(0, 0.99, n),
+        tilt_2=np.arccos(rng.uniform(-1, 1, n)),
+        phi_jl=rng.uniform(0, 2 * np.pi, n),
+        theta_jn=np.arccos(rng.uniform(-1, 1, n)),
+        phase=rng.uniform(0, 2 * np.pi, n),
+    )
+
+
+@pytest.fixture(scope="module")
+def frequency_array():
+    from bilby.core.utils import create_frequency_series
+    return create_frequency_series(1024, 4)
+
+
+@pytest.fixture(scope="module")
+def likelihood():
+    import bilby
+    ifos = bilby.gw.detector.InterferometerList(["H1", "L1"])
+    ifos.set_strain_data_from_zero_noise(
+        sampling_frequency=1024, duration=4, start_time=-2
+    )
+    waveform_generator = bilby.gw.waveform_generator.WaveformGenerator(
+        duration=4, sampling_frequency=1024,
+        frequency_domain_source_model=bilby.gw.source.lal_binary_black_hole,
+        waveform_arguments=dict(
+            waveform_approximant="IMRPhenomPv2", **WAVEFORM_ARGUMENTS
+        ),
+    )
+    return bilby.gw.likelihood.GravitationalWaveTransient(
+        ifos, waveform_generator
+    )
+
+
+@pytest.mark.benchmark(group="interpolant")
+def test_mismatch_interpolant_scalar(benchmark):
+    from bilby_nr.interp.pade_pade import mismatch_interpolant
+    args = [PARAMETERS[key] for key in INTERPOLANT_ARGS]
+    benchmark(mismatch_interpolant, "IMRPhenomXPHMST", *args)
+
+
+@pytest.mark.benchmark(group="interpolant")
+def test_match_interpolant_batched(benchmark):
+    from bilby_nr.match import match_from_pade_pade_interpolant
+    samples = _random_parameters(100)
+    args = [samples[key] for key in INTERPOLANT_ARGS]
+    benchmark(match_from_pade_pade_interpolant, "IMRPhenomXPHMST", *args)
+
+
+@pytest.mark.benchmark(group="weights")
+def test_weights_from_matches(benchmark):
+    from bilby_nr.source import _weights_from_matches
+    matches = np.array([0.993, 0.989, 0.995])
+    benchmark(_weights_from_matches, matches)
+
+
+@pytest.mark.benchmark(group="source")
+def test_lal_binary_black_hole(benchmark, frequency_array):
+    from bilby.gw.source import lal_binary_black_hole
+    benchmark(
+        lal_binary_black_hole, frequency_array, luminosity_distance=500.,
+        waveform_approximant="IMRPhenomPv2", **PARAMETERS,
+        **WAVEFORM_ARGUMENTS
+    )
+
+
+@pytest.mark.benchmark(group="source")
+def test_multi_model_binary_black_hole_no_interpolant(
+    benchmark, frequency_array
+):
+    from bilby_nr.source import multi_model_binary_black_hole
+
+    def func():
+        return multi_model_binary_black_hole(
+            frequency_array, luminosity_distance=500.,
+            waveform_approximant_list=["IMRPhenomPv2"], **PARAMETERS,
+            **WAVEFORM_ARGUMENTS
+        )
+    benchmark(func)
+
+
+@pytest.mark.benchmark(group="source")
+def test_multi_model_binary_black_hole_interpolant(benchmark, frequency_array):
+    from bilby_nr.source import multi_model_binary_black_hole
+
+    def func():
+        return multi_model_binary_black_hole(
+            frequency_array, luminosity_distance=500.,
+            waveform_approximant_list=["IMRPhenomXPHMST"],
+            match_interpolant="bilby_nr.match.match_from_pade_pade_interpolant",
+            **PARAMETERS, **WAVEFORM_ARGUMENTS
+        )
+    benchmark(func)
+
+
+@pytest.mark.benchmark(group="attribution")
+def test_determine_waveform_approximant_from_likelihood(benchmark, likelihood):
+    from bilby_nr.conversion import (
+        determine_waveform_approximant_from_likelihood
+    )
+    sample = dict(
+        luminosity_distance=500., ra=2.2, dec=-1.22, psi=0.7,
+        geocent_time=0., **PARAMETERS
+    )
+    sample["log_likelihood"] = likelihood.log_likelihood_ratio(sample)
+    benchmark(
+        determine_waveform_approximant_from_likelihood, sample,
+        ["IMRPhenomXP", "IMRPhenomPv2"], likelihood
+    )
+
+
+def test_interpolant_accuracy_harness(tmp_path):
+    from interpolant_accuracy import COLUMNS, main
+    from bilby_nr.match import interpolant_map
+    table = main([
+        "--outdir", str(tmp_path), "--nsamples", "100", "--nscalar", "10",
+        "--repeat", "1", "--waveform-approximant-list", "IMRPhenomTPHM"
+    ])
+    assert list(table.columns) == COLUMNS
+    assert list(table["interpolant"]) == list(interpolant_map.keys())
+    reference = table[table["interpolant"] == "pade_pade"].iloc[0]
+    assert reference["max_log10_mismatch_error"] < 1e-10
+    assert (tmp_path / "interpolant_accuracy.csv").exists()
+    assert (tmp_path / "interpolant_accuracy.png").exists()
@@ -1,10 +1,14 @@
 # Licensed under an MIT style license -- see LICENSE.md
 
 from bilby_pipe.input import Input as _Input
-from bilby_pipe.main import MainInput as _MainInput, main
+from bilby_pipe.main import MainInput as _MainInput
 from bilby_pipe.data_analysis import DataAnalysisInput as _DAInput
+from bilby_pipe.job_creation import generate_dag as _generate_dag
+from bilby_pipe.job_creation.node import Node
+from bilby_pipe.job_creation.nodes import AnalysisNode
 from bilby_pipe.utils import logger, BilbyPipeError
 import inspect
+import os
 
 __author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
 
@@ -36,9 +40,7 @@ class Input(_Input):
         if waveform_approximant is not None:
             models = convert_waveform_list_from_input(waveform_approximant)
             if isinstance(models, list) and len(models) > 1:
-                source_model = self.bilby_frequency_domain_source_model
-                source_module = inspect.getmodule(source_model).__name__
-                if source_module == "bilby_nr.source":
+                if self._uses_bilby_nr_source_model:
                     logger.warning(
                         f"A list has been provided for the waveform "
                         f"approximant. Sampling over the models: "
@@ -57,12 +59,24 @@ class Input(_Input):
                 models = models[0]
             self._waveform_approximant = models
 
+    @property
+    def _uses_bilby_nr_source_model(self):
+        """Whether or not the frequency domain source model is provided by
+        bilby_nr.source
+        """
+        source_model = self.bilby_frequency_domain_source_model
+        return inspect.getmodule(source_model).__name__ == "bilby_nr.source"
+
     def get_default_waveform_arguments(self):
         """Return the default waveform arguments.
 
         If the code is sampling over multiple models, this method will return
         the arguments for the first model in the list, and add the full list
-        to the dictionary under the key `waveform_approximant_list`.
+        to the dictionary under the key `waveform_approximant_list`. If a
+        single waveform approximant is used with a bilby_nr source model,
+        e.g. for the single-model analyses of a model-parallel run, the list
+        only contains that approximant and the arguments used to weight the
+        models are removed since the only model always has a weight of 1.
 
         Returns
         -------
@@ -76,6 +90,12 @@ class Input(_Input):
             # bilby_nr source models
             wfa["waveform_approximant"] = self.waveform_approximant[0]
             wfa["waveform_approximant_list"] = self.waveform_approximant
+        elif self._uses_bilby_nr_source_model:
+            wfa["waveform_approximant_list"] = [wfa["waveform_approximant"]]
+            for key in [
+                "match_interpolant", "use_best_match", "match_to_weight"
+            ]:
+                wfa.pop(key, None)
         return wfa
 
 
@@ -86,6 +106,135 @@ class MainInput(Input, _MainInput):
     def __init__(self, *args, **kwargs):
         self.frequency_domain_source_model = args[0].frequency_domain_source_model
         super().__init__(*args, **kwargs)
+        perform_checks = kwargs.get(
+            "perform_checks", args[2] if len(args) > 2 else True
+        )
+        if perform_checks and self._sample_multiple_models:
+            self.stage_interpolants()
+        if perform_checks and getattr(args[0], "bilby_nr_preflight", False):
+            self.run_preflight_check(
+                apply=getattr(args[0], "bilby_nr_apply_resource_hints", False),
+                nsamples=getattr(args[0], "bilby_nr_preflight_samples", 1000),
+            )
+
+    def stage_interpolants(self):
+        """Validate the match_interpolant, match_to_weight and use_best_match
+        waveform arguments and compile the interpolants into a binary bundle
+        in the data directory. The bundle is added to the waveform arguments
+        (as 'interpolant_bundle') so that the data analysis jobs load the
+        compiled interpolants rather than parsing the coefficient files. If
+        the truncated interpolant is used, the interpolants are truncated
+        here, once, and the truncated coefficients are stored in the bundle
+
+        Returns
+        -------
+        filename: str
+            path to the interpolant bundle. None if no bundle was produced
+        """
+        from bilby_pipe.utils import convert_string_to_dict
+        from .interp.pade_pade import ALLOWED_MODELS, save_bundle
+        from .match import match_from_truncated_pade_pade_interpolant
+        from .source import _import_interpolant, validate_weight_arguments
+        args = self.known_args
+        waveform_arguments = {}
+        if args.waveform_arguments_dict is not None:
+            waveform_arguments = convert_string_to_dict(
+                args.waveform_arguments_dict
+            )
+        match_interpolant = waveform_arguments.get("match_interpolant", None)
+        try:
+            validate_weight_arguments(
+                self.waveform_approximant,
+                match_interpolant=match_interpolant,
+                use_best=waveform_arguments.get("use_best_match", False),
+                mapping=waveform_arguments.get("match_to_weight", None)
+            )
+        except ValueError as e:
+            raise BilbyPipeError(f"Invalid bilby_nr waveform arguments: {e}")
+        if match_interpolant is None or not any(
+            approximant in ALLOWED_MODELS for approximant in
+            self.waveform_approximant
+        ):
+            return
+        filename = os.path.abspath(
+            os.path.join(self.data_directory, "bilby_nr_interpolants.npz")
+        )
+        save_bundle(
+            filename, self.waveform_approximant, truncate=(
+                _import_interpolant(match_interpolant) is
+                match_from_truncated_pade_pade_interpolant
+            )
+        )
+        logger.info(f"Compiled interpolants stored in {filename}")
+        waveform_arguments["interpolant_bundle"] = filename
+        # the data analysis jobs read the waveform arguments from the
+        # complete config file which is written from the known args
+        args.waveform_arguments_dict = repr(waveform_arguments)
+        return filename
+
+    def run_preflight_check(self, apply=False, nsamples=1000):
+        """Estimate the cost of the analysis before it is submitted. The
+        report is logged and written to 'bilby_nr_preflight.json' in the
+        output directory
+
+        Parameters
+        ----------
+        apply: bool, optional
+            if True, use the suggested request-cpus, request-memory and npool
+            in the generated submit files. Default False
+        nsamples: int, optional
+            number of prior samples to draw when estimating how often each
+            model is drawn. Default 1000
+
+        Returns
+        -------
+        report: dict
+            the pre-flight report, see bilby_nr.preflight.estimate_cost
+        """
+        import json
+        from bilby.core.utils import create_frequency_series
+        from .preflight import estimate_cost, format_report
+        if not self._sample_multiple_models:
+            logger.info(
+                "Skipping the bilby_nr pre-flight check because only a single "
+                "waveform approximant has been provided"
+            )
+            return
+        args = self.known_args
+        # MainInput does not store the waveform settings so we construct
+        # them from the parsed arguments
+        inputs = Input(None, None)
+        inputs.frequency_domain_source_model = self.frequency_domain_source_model
+        inputs.waveform_approximant = self.waveform_approximant
+        inputs.detectors = self.detectors
+        inputs.duration = args.duration
+        inputs.sampling_frequency = args.sampling_frequency
+        for key in [
+            "reference_frequency", "minimum_frequency", "maximum_frequency",
+            "catch_waveform_errors", "pn_spin_order", "pn_tidal_order",
+            "pn_phase_order", "pn_amplitude_order", "mode_array",
+            "waveform_arguments_dict"
+        ]:
+            setattr(inputs, key, getattr(args, key))
+        report = estimate_cost(
+            self._get_priors(add_time=False), self.waveform_approximant,
+            create_frequency_series(args.sampling_frequency, args.duration),
+            inputs.get_default_waveform_arguments(), nsamples=nsamples
+        )
+        logger.info(format_report(report))
+        os.makedirs(self.outdir, exist_ok=True)
+        filename = os.path.join(self.outdir, "bilby_nr_preflight.json")
+        with open(filename, "w") as f:
+            json.dump(report, f, indent=4)
+        if apply:
+            suggested = report["suggested"]
+            self.request_cpus = suggested["request_cpus"]
+            self.request_memory = suggested["request_memory"]
+            self.sampler_kwargs["npool"] = suggested["npool"]
+            # keep the complete config file consistent with the inputs
+            self.known_args.request_cpus = self.request_cpus
+            self.known_args.request_memory = suggested["request_memory"]
+        return report
 
 
 class DataAnalysisInput(Input, _DAInput):
@@ -95,6 +244,103 @@ class DataAnalysisInput(Input, _DAInput):
     def __init__(self, *args, **kwargs):
         self.frequency_domain_source_model = args[0].frequency_domain_source_model
         super().__init__(*args, **kwargs)
+        bundle = self.get_default_waveform_arguments().get(
+            "interpolant_bundle", None
+        )
+        if bundle is not None:
+            # load the interpolants compiled during generation before the
+            # likelihood is set up
+            from .interp.pade_pade import use_bundle
+            use_bundle(bundle)
+        self.bilby_nr_warm_up = getattr(args[0], "bilby_nr_warm_up", True)
+
+    @property
+    def npool(self):
+        """The number of processes used by the sampler"""
+        npool = self.sampler_kwargs.get("npool", self.request_cpus)
+        return int(npool) if npool is not None else 1
+
+    @property
+    def match_interpolant(self):
+        """The interpolant used to weight the waveform approximants"""
+        return self.get_default_waveform_arguments().get(
+            "match_interpolant", None
+        )
+
+    def get_likelihood_and_priors(self):
+        """Read in the likelihood and prior from the data dump. If sampling
+        over multiple models, the interpolants, waveform approximants and
+        likelihood are warmed up before they are passed to the sampler, see
+        bilby_nr.warmup.warm_up
+
+        Returns
+        -------
+        likelihood, priors
+            The bilby likelihood and priors
+        """
+        likelihood, priors = super().get_likelihood_and_priors()
+        if self._sample_multiple_models and self.bilby_nr_warm_up:
+            from .warmup import warm_up
+            warm_up(likelihood, priors)
+        return likelihood, priors
+
+    def run_sampler(self):
+        """Run the sampler. If sampling over multiple models, the model
+        selection statistics are aggregated across all likelihood calls,
+        including those made by pool workers, and stored in the result
+        meta data under the key 'bilby_nr_model_statistics'. If an
+        interpolant is used to weight the models, the interpolant
+        coefficients are placed in shared memory once so that pool workers
+        do not each hold their own copy. The statistics, instrumentation
+        and weight cache of the parent and every pool worker are stored next
+        to the sampler checkpoint whenever the sampler writes a checkpoint
+        or exits, and restored when the analysis resumes, see
+        bilby_nr.checkpoint. The conversion of the posterior at the end of
+        sampling is checkpointed in '{label}_bilby_nr_conversion.hdf5' so
+        that it resumes rather than restarts if the job is interrupted, see
+        bilby_nr.conversion.conversion_checkpoint
+        """
+        if not self._sample_multiple_models:
+            return super().run_sampler()
+        from .checkpoint import (
+            load_state, remove_state, sampler_checkpoint_exists, save_state,
+            start_periodic_save, state_filename, stop_periodic_save
+        )
+        from .conversion import conversion_checkpoint
+        from .statistics import statistics
+        from .interp.shared import shared_interpolants
+        statistics.share(self.waveform_approximant, nslots=self.npool + 1)
+        if self.match_interpolant is not None:
+            shared_interpolants.share(self.waveform_approximant)
+        filename = state_filename(self.result_directory, self.label)
+        # only restore the state if the sampler is resuming, otherwise the
+        # statistics of a previous run would be counted twice
+        if sampler_checkpoint_exists(self.result_directory, self.label):
+            load_state(filename)
+        else:
+            remove_state(filename)
+        start_periodic_save(filename, self.result_directory, self.label)
+        try:
+            with conversion_checkpoint(os.path.join(
+                self.result_directory,
+                f"{self.label}_bilby_nr_conversion.hdf5"
+            ), checkpoint_time=60.):
+                super().run_sampler()
+            self.result.meta_data["bilby_nr_model_statistics"] = (
+                statistics.as_dict()
+            )
+            self.result.save_to_file(
+                extension=self.result_format, overwrite=True,
+                outdir=self.result_directory
+            )
+        finally:
+            stop_periodic_save()
+            try:
+                save_state(filename)
+            except Exception as e:
+                logger.warning(f"Unable to store the bilby_nr state: {e}")
+            statistics.unshare()
+            shared_interpolants.unshare()
 
 
 def create_parser(top_level=False):
@@ -113,4 +359,333 @@ def create_parser(top_level=False):
         main_input_class="bilby_nr.bilby_pipe.MainInput",
         analysis_input_class="bilby_nr.bilby_pipe.DataAnalysisInput",
     )
+    from bilby_pipe.parser import StoreBoolean
+    bilby_nr_parser = parser.add_argument_group(
+        title="bilby_nr arguments",
+        description="Additional options for sampling over multiple models",
+    )
+    bilby_nr_parser.add(
+        "--bilby-nr-preflight",
+        action=StoreBoolean,
+        default=False,
+        help=(
+            "If true, estimate the cost per likelihood call before the "
+            "analysis is submitted by drawing prior samples and timing "
+            "waveform evaluations for each approximant"
+        ),
+    )
+    bilby_nr_parser.add(
+        "--bilby-nr-preflight-samples",
+        type=int,
+        default=1000,
+        help=(
+            "Number of prior samples used to estimate how often each "
+            "approximant is drawn during the pre-flight check"
+        ),
+    )
+    bilby_nr_parser.add(
+        "--bilby-nr-apply-resource-hints",
+        action=StoreBoolean,
+        default=False,
+        help=(
+            "If true, use the request-cpus, request-memory and npool "
+            "suggested by the pre-flight check in the submit files"
+        ),
+    )
+    bilby_nr_parser.add(
+        "--bilby-nr-warm-up",
+        action=StoreBoolean,
+        default=True,
+        help=(
+            "If true, load the interpolants, evaluate each waveform "
+            "approximant once and prime the caches before sampling starts so "
+            "that these one-off costs are not paid by the first likelihood "
+            "calls or by each process in the pool"
+        ),
+    )
+    bilby_nr_parser.add(
+        "--bilby-nr-model-parallel",
+        action=StoreBoolean,
+        default=False,
+        help=(
+            "If true, launch a single-model analysis for each waveform "
+            "approximant in parallel, followed by a job which combines the "
+            "single-model results into a multi-model result using the "
+            "interpolant weights. If false, a single analysis samples over "
+            "all models. Only used by bilby_nr_pipe"
+        ),
+    )
     return parser
+
+
+class ModelAnalysisNode(AnalysisNode):
+    """Analysis node which runs a single-model analysis as part of a
+    model-parallel multi-model run. Inherited from
+    bilby_pipe.job_creation.nodes.AnalysisNode
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        the waveform approximant to use for this analysis
+    """
+    def __init__(
+        self, inputs, generation_node, detectors, sampler, parallel_idx, dag,
+        waveform_approximant
+    ):
+        self.waveform_approximant = waveform_approximant
+        super().__init__(
+            inputs, generation_node=generation_node, detectors=detectors,
+            sampler=sampler, parallel_idx=parallel_idx, dag=dag
+        )
+
+    @property
+    def base_job_name(self):
+        """Base job name including the waveform approximant. This ensures
+        that jobs (and merge jobs) for different models do not clash
+        """
+        return f"{self._base_job_name}_{self.waveform_approximant}"
+
+    @base_job_name.setter
+    def base_job_name(self, base_job_name):
+        self._base_job_name = base_job_name
+
+    def setup_arguments(self, *args, **kwargs):
+        """Setup the arguments for the job. The waveform approximant is
+        added last so that it takes precedence over the list of models in
+        the ini file
+        """
+        super().setup_arguments(*args, **kwargs)
+        self.arguments.add("waveform-approximant", self.waveform_approximant)
+
+
+class CombinationNode(Node):
+    """Node which combines single-model results into a multi-model result
+    with the `bilby_nr_reweight` executable
+
+    Parameters
+    ----------
+    inputs: bilby_nr.bilby_pipe.MainInput
+        the inputs for the analysis
+    generation_node: bilby_pipe.job_creation.nodes.GenerationNode
+        the generation node that produced the data for the analyses
+    model_node_list: list
+        list of nodes which produce the single-model results
+    waveform_approximant_list: list
+        waveform approximant used by each node in model_node_list
+    detectors: list
+        list of detectors used in the analyses
+    base_job_name: str
+        base job name of the single-model analyses
+    dag: bilby_pipe.job_creation.dag.Dag
+        the DAG to add the node to
+    """
+    run_node_on_osg = True
+
+    def __init__(
+        self, inputs, generation_node, model_node_list,
+        waveform_approximant_list, detectors, base_job_name, dag
+    ):
+        super().__init__(inputs, retry=3)
+        self.dag = dag
+        self.request_cpus = inputs.request_cpus
+        self.job_name = f"{base_job_name}_combine"
+        self.label = base_job_name
+
+        self.setup_arguments()
+        if self.inputs.transfer_files or self.inputs.osg:
+            input_files_to_transfer = [
+                str(generation_node.data_dump_file),
+                str(self.inputs.complete_ini_file),
+            ] + [
+                self._relative_topdir(node.result_file, self.inputs.initialdir)
+                for node in model_node_list
+            ] + inputs.additional_transfer_paths
+            if self.transfer_container:
+                input_files_to_transfer.append(self.inputs.container)
+            input_files_to_transfer, need_scitokens = \
+                self.job_needs_authentication(input_files_to_transfer)
+            if need_scitokens:
+                self.extra_lines.extend(self.scitoken_lines)
+            self.extra_lines.extend(
+                self._condor_file_transfer_lines(
+                    input_files_to_transfer,
+                    [self._relative_topdir(
+                        self.inputs.outdir, self.inputs.initialdir
+                    )],
+                )
+            )
+            self.arguments.add("outdir", os.path.relpath(self.inputs.outdir))
+        for det in detectors:
+            self.arguments.add("detectors", det)
+        self.arguments.add("label", self.label)
+        self.arguments.add("data-dump-file", generation_node.data_dump_file)
+        self.arguments.add("sampler", self.inputs.sampler)
+        self.arguments.append("--result-files")
+        for node in model_node_list:
+            self.arguments.append(os.path.relpath(node.result_file))
+        self.arguments.append("--result-waveform-approximants")
+        for approximant in waveform_approximant_list:
+            self.arguments.append(approximant)
+
+        self.process_node()
+        for node in model_node_list:
+            self.job.add_parent(node.job)
+
+    @property
+    def executable(self):
+        return self._get_executable_path("bilby_nr_reweight")
+
+    @property
+    def request_memory(self):
+        return self.inputs.request_memory
+
+    @property
+    def log_directory(self):
+        return self.inputs.data_analysis_log_directory
+
+    @property
+    def result_file(self):
+        return (
+            f"{self.inputs.result_directory}/{self.label}_multi_model_result."
+            f"{self.inputs.result_format}"
+        )
+
+
+def generate_dag(inputs):
+    """Extension of bilby_pipe.job_creation.generate_dag to allow for a
+    model-parallel layout. If `--bilby-nr-model-parallel` is provided and
+    multiple waveform approximants are requested, a single-model analysis is
+    launched for each approximant in parallel and the results are then
+    combined into a multi-model result by a `CombinationNode`. The wall time
+    is therefore bounded by the slowest model rather than the mixture of
+    models. Otherwise the original bilby_pipe DAG is generated
+
+    Parameters
+    ----------
+    inputs: bilby_nr.bilby_pipe.MainInput
+        the inputs for the analysis
+    """
+    import copy
+    from bilby_pipe.job_creation.bilby_pipe_dag_creator import (
+        get_trigger_time_list, get_detectors_list, get_parallel_list
+    )
+    from bilby_pipe.job_creation.dag import Dag
+    from bilby_pipe.job_creation.nodes import (
+        FinalResultNode, GenerationNode, MergeNode, PESummaryNode, PlotNode,
+        PostProcessAllResultsNode, PostProcessSingleResultsNode
+    )
+    from bilby_pipe.job_creation.overview import create_overview
+    known_args = getattr(inputs, "known_args", None)
+    model_parallel = getattr(known_args, "bilby_nr_model_parallel", False)
+    if not model_parallel or not getattr(
+        inputs, "_sample_multiple_models", False
+    ):
+        return _generate_dag(inputs)
+    inputs = copy.deepcopy(inputs)
+    logger.info(
+        f"Launching a single-model analysis for each of the models: "
+        f"{', '.join(inputs.waveform_approximant)}"
+    )
+    dag = Dag(inputs)
+    generation_node_list = []
+    for idx, trigger_time in enumerate(get_trigger_time_list(inputs)):
+        kwargs = dict(trigger_time=trigger_time, idx=idx, dag=dag)
+        if idx > 0:
+            kwargs["parent"] = generation_node_list[0]
+            if hasattr(inputs, "_start_time"):
+                del inputs._start_time
+        generation_node_list.append(GenerationNode(inputs, **kwargs))
+
+    parallel_list = get_parallel_list(inputs)
+    combined_node_list, all_parallel_node_list = [], []
+    for generation_node in generation_node_list:
+        for detectors in get_detectors_list(inputs):
+            model_node_list = []
+            for approximant in inputs.waveform_approximant:
+                parallel_node_list = [
+                    ModelAnalysisNode(
+                        inputs, generation_node=generation_node,
+                        detectors=detectors, sampler=inputs.sampler,
+                        parallel_idx=parallel_idx, dag=dag,
+                        waveform_approximant=approximant
+                    ) for parallel_idx in parallel_list
+                ]
+                all_parallel_node_list += parallel_node_list
+                if len(parallel_node_list) == 1:
+                    model_node_list.append(parallel_node_list[0])
+                else:
+                    model_node_list.append(
+                        MergeNode(
+                            inputs=inputs,
+                            parallel_node_list=parallel_node_list,
+                            detectors=detectors, dag=dag
+                        )
+                    )
+            combined_node_list.append(
+                CombinationNode(
+                    inputs, generation_node, model_node_list,
+                    inputs.waveform_approximant, detectors,
+                    parallel_node_list[0]._base_job_name, dag
+                )
+            )
+
+    plot_nodes_list = []
+    for combined_node in combined_node_list:
+        if inputs.final_result:
+            FinalResultNode(inputs, combined_node, dag=dag)
+        if inputs.plot_node_needed:
+            plot_nodes_list.append(PlotNode(inputs, combined_node, dag=dag))
+        if inputs.single_postprocessing_executable:
+            PostProcessSingleResultsNode(inputs, combined_node, dag=dag)
+    if inputs.create_summary:
+        PESummaryNode(
+            inputs, combined_node_list, generation_node_list, dag=dag
+        )
+    if inputs.postprocessing_executable is not None:
+        PostProcessAllResultsNode(inputs, combined_node_list, dag)
+    dag.build()
+    create_overview(
+        inputs, generation_node_list, all_parallel_node_list,
+        combined_node_list, plot_nodes_list,
+    )
+
+
+def main():
+    """Top-level interface for bilby_nr_pipe. This mirrors bilby_pipe.main.main
+    but uses the bilby_nr parser and input class by default, and generates
+    the model-parallel DAG if `--bilby-nr-model-parallel` is provided (see
+    `generate_dag`)
+    """
+    from bilby_pipe.main import (
+        get_command_line_arguments, get_outdir_name, parse_args,
+        write_complete_config_file
+    )
+    from bilby_pipe.utils import (
+        get_colored_string, get_function_from_string_path,
+        log_version_information
+    )
+    parser = create_parser(top_level=True)
+    args, unknown_args = parse_args(get_command_line_arguments(), parser)
+    if args.analysis_executable_parser is not None:
+        # Alternative parser requested, reload args
+        parser = get_function_from_string_path(
+            args.analysis_executable_parser
+        )()
+        args, unknown_args = parse_args(get_command_line_arguments(), parser)
+
+    args.outdir = args.outdir.replace("'", "").replace('"', "")
+    if args.overwrite_outdir is False:
+        args.outdir = get_outdir_name(args.outdir)
+
+    log_version_information()
+    if args.main_input_class is not None:
+        input_cls = get_function_from_string_path(args.main_input_class)
+    else:
+        input_cls = MainInput
+    inputs = input_cls(args, unknown_args)
+    write_complete_config_file(parser, args, inputs, input_cls=input_cls)
+    generate_dag(inputs)
+
+    if len(unknown_args) > 0:
+        msg = get_colored_string(f"Unrecognized arguments {unknown_args}")
+        logger.warning(msg)
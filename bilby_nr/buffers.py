@@ -0,0 +1,134 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+from contextlib import contextmanager
+import numpy as np
+from .instrumentation import instrumentation
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+
+class BufferPool(object):
+    """Class to store preallocated output arrays for the GW polarizations so
+    that they can be reused across likelihood calls. Buffers are leased with
+    `acquire` and handed back with `release`; a buffer is only handed out
+    again once it has been released. Released buffers are stored for each
+    frequency array shape and a new array is allocated if no released
+    buffer is available. `borrow` can be used to lease buffers for the
+    duration of a context.
+
+    Buffers are returned writeable and must be completely overwritten by the
+    caller. Once filled, they should be passed to `lock` so that the
+    polarizations cannot be modified in place by downstream code.
+
+    Parameters
+    ----------
+    nbuffers: int, optional
+        maximum number of released buffers to store for each frequency array
+        shape. Default 2
+    """
+    def __init__(self, nbuffers=2):
+        self.nbuffers = nbuffers
+        self._buffers = {}
+        self._leased = {}
+
+    def __len__(self):
+        return sum(len(free) for free in self._buffers.values())
+
+    @staticmethod
+    def _key(shape, modes, dtype):
+        return tuple(np.atleast_1d(shape)), tuple(modes), np.dtype(dtype)
+
+    def acquire(self, shape, modes=("plus", "cross"), dtype=complex):
+        """Lease a dictionary of writeable arrays to store the polarizations.
+        The arrays are not handed out again until they are passed to
+        `release`
+
+        Parameters
+        ----------
+        shape: tuple
+            shape of the frequency array
+        modes: tuple, optional
+            names of the polarizations. Default ('plus', 'cross')
+        dtype: type, optional
+            data type of the polarizations. Default complex
+
+        Returns
+        -------
+        out: dict
+            dictionary of arrays, one for each polarization
+        """
+        key = self._key(shape, modes, dtype)
+        free = self._buffers.setdefault(key, [])
+        if len(free):
+            arrays = free.pop()
+            instrumentation.increment("buffer_reuse")
+        else:
+            arrays = [np.empty(key[0], dtype=dtype) for _ in modes]
+            instrumentation.increment("buffer_allocate")
+        for array in arrays:
+            array.flags.writeable = True
+        out = dict(zip(modes, arrays))
+        self._leased[id(arrays[0])] = (key, arrays)
+        return out
+
+    def release(self, out):
+        """Return leased arrays to the pool so that they can be handed out
+        again. The arrays, and any views of them, must not be used after
+        they have been released
+
+        Parameters
+        ----------
+        out: dict
+            dictionary of arrays returned by `acquire`
+        """
+        arrays = list(out.values())
+        lease = self._leased.get(id(arrays[0]) if len(arrays) else None)
+        if lease is None or any(
+            array is not _array for array, _array in zip(arrays, lease[1])
+        ):
+            raise ValueError("The arrays were not leased from this pool")
+        del self._leased[id(arrays[0])]
+        key, arrays = lease
+        free = self._buffers.setdefault(key, [])
+        if len(free) < self.nbuffers:
+            free.append(arrays)
+
+    @contextmanager
+    def borrow(self, shape, modes=("plus", "cross"), dtype=complex):
+        """Context manager which leases arrays with `acquire` and releases
+        them when the context exits
+
+        Parameters
+        ----------
+        shape: tuple
+            shape of the frequency array
+        modes: tuple, optional
+            names of the polarizations. Default ('plus', 'cross')
+        dtype: type, optional
+            data type of the polarizations. Default complex
+        """
+        out = self.acquire(shape, modes=modes, dtype=dtype)
+        try:
+            yield out
+        finally:
+            self.release(out)
+
+    @staticmethod
+    def lock(out):
+        """Mark the polarizations as read-only
+
+        Parameters
+        ----------
+        out: dict
+            dictionary of arrays returned by `acquire`
+        """
+        for array in out.values():
+            array.flags.writeable = False
+        return out
+
+    def clear(self):
+        """Remove all released buffers. Leased buffers are unaffected"""
+        self._buffers.clear()
+
+
+buffers = BufferPool()
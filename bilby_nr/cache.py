@@ -0,0 +1,293 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+
+class LRUCache(object):
+    """A bounded in-memory cache which evicts the least recently used entry
+    once the maximum size has been reached
+
+    Parameters
+    ----------
+    maxsize: int, optional
+        maximum number of entries to store. If 0, nothing is stored.
+        Default 128
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __setitem__(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Return the value stored for a given key and mark it as the most
+        recently used entry
+
+        Parameters
+        ----------
+        key: hashable
+            the key to look up
+        default: optional
+            value to return if the key is not in the cache. Default None
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def items(self):
+        """Return a list of (key, value) pairs ordered from the least to the
+        most recently used entry
+        """
+        return list(self._data.items())
+
+    def clear(self):
+        """Remove all entries and reset the hit and miss counters"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def quantise(values, tolerance=0.):
+    """Return a hashable key for a list of floats. If a tolerance is
+    provided, each value is rounded to the nearest multiple of its tolerance.
+    Values which share a key therefore differ by at most the tolerance.
+    Note that values which differ by less than the tolerance are not
+    guaranteed to share a key since they may lie either side of the
+    boundary between two multiples of the tolerance
+
+    Parameters
+    ----------
+    values: list
+        list of floats to convert to a key
+    tolerance: float, list, optional
+        the tolerance to quantise to. Either a single tolerance for all
+        values or a list containing the tolerance for each value. Values
+        with a tolerance of 0 are used exactly. Default 0
+
+    Returns
+    -------
+    key: tuple
+        the quantised values
+    """
+    tolerance = np.broadcast_to(
+        np.asarray(tolerance, dtype=float), (len(values),)
+    )
+    return tuple(
+        int(np.round(value / tol)) if tol > 0 else float(value) for
+        value, tol in zip(values, tolerance)
+    )
+
+
+class DiskCache(object):
+    """A persistent, content-addressed cache for GW polarizations stored on
+    disk. Each entry is stored as a single .npy file named by a hash of its
+    contents (see `waveform_key`) and is loaded as a read-only memory-mapped
+    array. Entries are written to a temporary file and atomically moved into
+    place, meaning that several processes can safely read and write to the
+    same directory. Once the total size of the cache exceeds the maximum
+    size, the least recently used entries are removed
+
+    Parameters
+    ----------
+    directory: str
+        directory to store the cache. Created if it does not exist
+    max_size: float, optional
+        maximum size of the cache in GB. Default 1
+    """
+    extension = ".npy"
+
+    def __init__(self, directory, max_size=1.):
+        self.directory = os.path.abspath(directory)
+        self.max_size = float(max_size)
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def max_bytes(self):
+        return int(self.max_size * 1024**3)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def __contains__(self, key):
+        return os.path.isfile(self._path(key))
+
+    def get(self, key):
+        """Return the polarizations stored for a given key and mark it as the
+        most recently used entry. None is returned if the key is not in the
+        cache
+
+        Parameters
+        ----------
+        key: str
+            the key to look up
+        """
+        path = self._path(key)
+        try:
+            data = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (OSError, ValueError):
+            # the entry does not exist, was evicted by another process or
+            # could not be read
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {name: data[name] for name in data.dtype.names}
+
+    def __setitem__(self, key, polarizations):
+        names = list(polarizations.keys())
+        values = [np.asarray(polarizations[name]) for name in names]
+        data = np.empty(
+            values[0].shape, dtype=[
+                (name, value.dtype) for name, value in zip(names, values)
+            ]
+        )
+        for name, value in zip(names, values):
+            data[name] = value
+        fd, tmp = tempfile.mkstemp(
+            dir=self.directory, prefix=".tmp_", suffix=self.extension
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += os.path.getsize(self._path(key))
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """Return a list of (mtime, size, path) for every entry"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith(".") or not name.endswith(self.extension):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        """Return the total size of the cache in bytes"""
+        return sum(entry[1] for entry in self._entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the total size of
+        the cache is below the maximum size
+        """
+        entries = sorted(self._entries())
+        self._size = sum(entry[1] for entry in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # already removed by another process
+                pass
+            self._size -= size
+
+    def clear(self):
+        """Remove all entries and reset the hit and miss counters"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+@lru_cache(maxsize=None)
+def get_disk_cache(directory, max_size=1.):
+    """Return the DiskCache for a given directory. A single instance is
+    created per process
+
+    Parameters
+    ----------
+    directory: str
+        directory to store the cache
+    max_size: float, optional
+        maximum size of the cache in GB. Default 1
+    """
+    return DiskCache(directory, max_size=max_size)
+
+
+def waveform_key(
+    waveform_approximant, parameters, waveform_arguments, frequency_array
+):
+    """Return a hash which uniquely identifies a waveform
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        the waveform approximant
+    parameters: list
+        list of floats used to generate the waveform
+    waveform_arguments: dict
+        the waveform arguments passed to the source function
+    frequency_array: np.ndarray
+        the frequency array
+
+    Returns
+    -------
+    key: str
+        the hexadecimal hash
+    """
+    sha = hashlib.sha256()
+    sha.update(str(waveform_approximant).encode())
+    sha.update(np.asarray(parameters, dtype=float).tobytes())
+    for key in sorted(waveform_arguments):
+        sha.update(str(key).encode())
+        _update_hash(sha, waveform_arguments[key])
+    _update_hash(sha, frequency_array)
+    return sha.hexdigest()
+
+
+def _update_hash(sha, value):
+    """Update a hash with an arbitrary value. Arrays are hashed by their
+    contents, dtype and shape; all other values by their repr
+    """
+    if isinstance(value, np.ndarray):
+        sha.update(str((value.dtype.str, value.shape)).encode())
+        sha.update(np.ascontiguousarray(value).tobytes())
+    else:
+        sha.update(repr(value).encode())
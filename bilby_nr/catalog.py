@@ -0,0 +1,390 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import glob
+import os
+import numpy as np
+from bilby.core.utils import logger
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+_REQUIRED = [
+    "mass_1", "mass_2", "a_1", "tilt_1", "phi_12", "a_2", "tilt_2", "phi_jl",
+    "theta_jn", "phase"
+]
+# columns which can be used to construct the required columns
+_OPTIONAL = [
+    "chirp_mass", "mass_ratio", "total_mass", "symmetric_mass_ratio",
+    "chi_1", "chi_2", "cos_tilt_1", "cos_tilt_2"
+]
+_EXTENSIONS = ["hdf5", "h5", "json"]
+
+
+def summarise_result(
+    filename, waveform_approximant_list, match_interpolant=(
+        "bilby_nr.match.match_from_pade_pade_interpolant"
+    ), use_best=False, mapping=None, chunk_size=100000
+):
+    """Summarise the model accuracy for the posterior stored in a bilby
+    result file. The posterior is streamed in chunks; the next chunk is read
+    while the weights for the current chunk are calculated
+
+    Parameters
+    ----------
+    filename: str
+        path to the bilby result file
+    waveform_approximant_list: list
+        list of waveform approximants to summarise
+    match_interpolant: str, optional
+        the interpolant used to estimate the match. Default
+        'bilby_nr.match.match_from_pade_pade_interpolant'
+    use_best: bool, optional
+        if True, give all weight to the approximant with the highest match.
+        Default False
+    mapping: str, optional
+        a string that can be evaluated to map an array of matches to a series
+        of weights. See bilby_nr.source._weights_from_matches
+    chunk_size: int, optional
+        number of samples to process at once. Default 100000
+
+    Returns
+    -------
+    summary: dict
+        dictionary containing the number of samples, the fraction of
+        posterior samples where each approximant has the largest weight
+        ('dominant_<model>'), the mean weight of each approximant
+        ('mean_weight_<model>'), the fraction of samples outside of the
+        domain of the interpolant ('outside_domain') and any warnings
+    """
+    from .source import _weights_for_samples
+    nsamples, outside = 0, 0
+    dominant = np.zeros(len(waveform_approximant_list))
+    weights = np.zeros(len(waveform_approximant_list))
+    for chunk in _stream_posterior(filename, chunk_size=chunk_size):
+        _weights = _weights_for_samples(
+            waveform_approximant_list, chunk,
+            match_interpolant=match_interpolant, use_best=use_best,
+            mapping=mapping
+        )
+        nsamples += len(_weights)
+        dominant += np.bincount(
+            np.argmax(_weights, axis=1),
+            minlength=len(waveform_approximant_list)
+        )
+        weights += np.sum(_weights, axis=0)
+        outside += int(np.sum(_outside_domain(chunk)))
+
+    summary = {"nsamples": nsamples}
+    for num, model in enumerate(waveform_approximant_list):
+        summary[f"dominant_{model}"] = _fraction(dominant[num], nsamples)
+    for num, model in enumerate(waveform_approximant_list):
+        summary[f"mean_weight_{model}"] = _fraction(weights[num], nsamples)
+    summary["outside_domain"] = _fraction(outside, nsamples)
+    warnings = []
+    if outside:
+        warnings.append(
+            f"{100 * summary['outside_domain']:.1f}% of samples lie outside "
+            f"of the domain of the interpolant"
+        )
+    if not nsamples:
+        warnings.append("no posterior samples")
+    summary["warnings"] = "; ".join(warnings)
+    return summary
+
+
+def _fraction(value, nsamples):
+    """Return value / nsamples rounded to 6 decimal places to keep the
+    summary table compact
+    """
+    return round(float(value) / max(nsamples, 1), 6)
+
+
+def _outside_domain(samples):
+    """Return a boolean array which is True for samples outside of the domain
+    used to construct the Pade-Pade fits
+
+    Parameters
+    ----------
+    samples: dict
+        dictionary of arrays. Must contain 'mass_1', 'mass_2', 'a_1' and 'a_2'
+    """
+    from .interp.pade_pade import FIT_DOMAIN
+    values = dict(samples)
+    values["mass_ratio"] = samples["mass_2"] / samples["mass_1"]
+    outside = np.zeros(len(values["mass_1"]), dtype=bool)
+    for key, (low, high) in FIT_DOMAIN.items():
+        outside |= (values[key] < low) | (values[key] > high)
+    return outside
+
+
+def _stream_posterior(filename, chunk_size=100000):
+    """Yield chunks of the posterior stored in a bilby result file. Only the
+    columns required to evaluate the interpolant are read. Chunks are read
+    in a background thread so that reading the next chunk overlaps with the
+    processing of the current chunk
+
+    Parameters
+    ----------
+    filename: str
+        path to the bilby result file
+    chunk_size: int, optional
+        number of samples to read at once. Default 100000
+
+    Yields
+    ------
+    chunk: dict
+        dictionary containing arrays for the columns in _REQUIRED
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    if filename.endswith(".json"):
+        import bilby
+        posterior = bilby.core.result.read_in_result(filename).posterior
+        nsamples = len(posterior)
+
+        def read(start):
+            stop = min(start + chunk_size, nsamples)
+            return {
+                key: posterior[key].values[start:stop] for key in
+                _REQUIRED + _OPTIONAL if key in posterior
+            }
+        for chunk in _stream(read, nsamples, chunk_size):
+            yield _complete_columns(chunk)
+        return
+
+    import h5py
+    with h5py.File(filename, "r") as f:
+        posterior = f["posterior"]
+        columns = [
+            key for key in _REQUIRED + _OPTIONAL if key in posterior.keys()
+        ]
+        nsamples = len(posterior[columns[0]]) if len(columns) else 0
+
+        def read(start):
+            stop = min(start + chunk_size, nsamples)
+            return {key: posterior[key][start:stop] for key in columns}
+        # h5py serialises access to a file, so a single reader thread is used
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for chunk in _stream(read, nsamples, chunk_size, executor):
+                yield _complete_columns(chunk)
+
+
+def _stream(read, nsamples, chunk_size, executor=None):
+    """Yield the output of `read` for each chunk, submitting the read for
+    the next chunk before yielding the current one
+    """
+    starts = list(range(0, nsamples, chunk_size))
+    if executor is None:
+        yield from map(read, starts)
+        return
+    future = executor.submit(read, starts[0]) if len(starts) else None
+    for num in range(len(starts)):
+        chunk = future.result()
+        if num + 1 < len(starts):
+            future = executor.submit(read, starts[num + 1])
+        yield chunk
+
+
+def _complete_columns(chunk):
+    """Construct the columns required to evaluate the interpolant. Angles
+    which are not present in the posterior, and are not required by the
+    interpolant, are set to 0
+    """
+    from bilby.gw.conversion import convert_to_lal_binary_black_hole_parameters
+    chunk = {
+        key: np.asarray(value, dtype=float) for key, value in chunk.items()
+    }
+    if not all(key in chunk for key in _REQUIRED):
+        chunk, _ = convert_to_lal_binary_black_hole_parameters(chunk)
+    nsamples = len(next(iter(chunk.values())))
+    return {
+        key: np.asarray(chunk[key], dtype=float) if key in chunk else
+        np.zeros(nsamples) for key in _REQUIRED
+    }
+
+
+def _summarise_file(args):
+    """Summarise a single result file. Used by `summarise_catalog`"""
+    filename, kwargs = args
+    try:
+        summary = summarise_result(filename, **kwargs)
+    except Exception as e:
+        summary = {"warnings": f"unable to summarise: {e}"}
+    return filename, summary
+
+
+def summarise_catalog(
+    directory, outfile, waveform_approximant_list, match_interpolant=(
+        "bilby_nr.match.match_from_pade_pade_interpolant"
+    ), use_best=False, mapping=None, npool=1, chunk_size=100000, force=False
+):
+    """Summarise the model accuracy for all bilby result files in a
+    directory and write the summaries to a single table. Result files are
+    summarised in parallel and files whose summary in an existing table is
+    already up to date (same size and modification time) are skipped
+
+    Parameters
+    ----------
+    directory: str
+        directory to search (recursively) for bilby result files
+    outfile: str
+        csv file to write the summary table to. If the file already exists,
+        existing summaries are reused where possible
+    waveform_approximant_list: list
+        list of waveform approximants to summarise
+    match_interpolant: str, optional
+        the interpolant used to estimate the match. Default
+        'bilby_nr.match.match_from_pade_pade_interpolant'
+    use_best: bool, optional
+        if True, give all weight to the approximant with the highest match.
+        Default False
+    mapping: str, optional
+        a string that can be evaluated to map an array of matches to a series
+        of weights. See bilby_nr.source._weights_from_matches
+    npool: int, optional
+        number of processes to use. Default 1
+    chunk_size: int, optional
+        number of samples to process at once. Default 100000
+    force: bool, optional
+        if True, summarise all files even if their summary is up to date.
+        Default False
+
+    Returns
+    -------
+    table: pandas.DataFrame
+        the summary table
+    """
+    import multiprocessing
+    import pandas as pd
+    settings = repr(
+        (list(waveform_approximant_list), match_interpolant, use_best, mapping)
+    )
+    files = sorted(set(
+        filename for extension in _EXTENSIONS for filename in glob.glob(
+            os.path.join(directory, "**", f"*result.{extension}"),
+            recursive=True
+        )
+    ))
+    existing = {}
+    if os.path.isfile(outfile) and not force:
+        existing = {
+            row["filename"]: row for row in pd.read_csv(
+                outfile, keep_default_na=False
+            ).to_dict(orient="records")
+        }
+    rows, todo = {}, []
+    for filename in files:
+        stat = os.stat(filename)
+        row = existing.get(filename, None)
+        if (
+            row is not None and row["size"] == stat.st_size and
+            row["mtime_ns"] == stat.st_mtime_ns and
+            row["settings"] == settings and
+            not str(row["warnings"]).startswith("unable to summarise")
+        ):
+            rows[filename] = row
+        else:
+            todo.append(filename)
+    logger.info(
+        f"Found {len(files)} result files, {len(files) - len(todo)} of which "
+        f"are up to date"
+    )
+    kwargs = dict(
+        waveform_approximant_list=list(waveform_approximant_list),
+        match_interpolant=match_interpolant, use_best=use_best,
+        mapping=mapping, chunk_size=chunk_size
+    )
+    args = [(filename, kwargs) for filename in todo]
+    pool = multiprocessing.Pool(npool) if npool > 1 and len(todo) > 1 else None
+    try:
+        results = (
+            map(_summarise_file, args) if pool is None else
+            pool.imap_unordered(_summarise_file, args)
+        )
+        for num, (filename, summary) in enumerate(results):
+            stat = os.stat(filename)
+            if summary["warnings"]:
+                logger.warning(f"{filename}: {summary['warnings']}")
+            rows[filename] = dict(
+                filename=filename, size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns, settings=settings, **summary
+            )
+            logger.debug(f"Summarised {num + 1}/{len(todo)} result files")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    table = pd.DataFrame([rows[filename] for filename in files])
+    tmp = f"{outfile}.tmp"
+    table.to_csv(tmp, index=False)
+    os.replace(tmp, outfile)
+    return table
+
+
+def create_parser():
+    """Create a parser for the bilby_nr_catalog executable"""
+    import argparse
+    from .interp.pade_pade import ALLOWED_MODELS
+    parser = argparse.ArgumentParser(
+        description=(
+            "Summarise the model accuracy for a catalog of bilby result files"
+        )
+    )
+    parser.add_argument(
+        "directory", type=str,
+        help="Directory to search (recursively) for bilby result files"
+    )
+    parser.add_argument(
+        "--outfile", type=str, default=None,
+        help=(
+            "csv file to write the summary table to. Default "
+            "'bilby_nr_summary.csv' in the result directory"
+        )
+    )
+    parser.add_argument(
+        "--waveform-approximant-list", type=str, nargs="+",
+        default=ALLOWED_MODELS, help="Waveform approximants to summarise"
+    )
+    parser.add_argument(
+        "--match-interpolant", type=str,
+        default="bilby_nr.match.match_from_pade_pade_interpolant",
+        help="Interpolant used to estimate the match"
+    )
+    parser.add_argument(
+        "--match-to-weight", type=str, default=None,
+        help="Mapping from matches to weights"
+    )
+    parser.add_argument(
+        "--use-best-match", action="store_true", default=False,
+        help="Give all weight to the approximant with the highest match"
+    )
+    parser.add_argument(
+        "--npool", type=int, default=1, help="Number of processes to use"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=100000,
+        help="Number of samples to process at once"
+    )
+    parser.add_argument(
+        "--force", action="store_true", default=False,
+        help="Summarise all result files even if they are up to date"
+    )
+    return parser
+
+
+def main(args=None):
+    """Summarise the model accuracy for a catalog of bilby result files
+
+    .. code-block:: console
+
+        $ bilby_nr_catalog /path/to/results --npool 16
+    """
+    args = create_parser().parse_args(args)
+    outfile = args.outfile
+    if outfile is None:
+        outfile = os.path.join(args.directory, "bilby_nr_summary.csv")
+    summarise_catalog(
+        args.directory, outfile, args.waveform_approximant_list,
+        match_interpolant=args.match_interpolant,
+        use_best=args.use_best_match, mapping=args.match_to_weight,
+        npool=args.npool, chunk_size=args.chunk_size, force=args.force
+    )
+    logger.info(f"Summary table written to {outfile}")
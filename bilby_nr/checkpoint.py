@@ -0,0 +1,383 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import glob
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from bilby.core.utils import logger
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+# increment when the layout of the state file changes
+FORMAT_VERSION = 1
+# instrumentation inherited from the parent when a pool worker is forked.
+# This is subtracted when the worker stores its state so that the parent's
+# timers and counters are not counted twice
+_fork_baseline = {}
+# settings used by `maybe_save_state`, see `start_periodic_save`
+_periodic = None
+
+
+def _record_fork_baseline():
+    """Store the instrumentation inherited from the parent process"""
+    global _fork_baseline
+    from .instrumentation import instrumentation
+    _fork_baseline = instrumentation.as_dict()
+
+
+os.register_at_fork(after_in_child=_record_fork_baseline)
+
+
+def state_filename(outdir, label):
+    """Return the name of the file used to store the bilby_nr state next to
+    the sampler checkpoint
+
+    Parameters
+    ----------
+    outdir: str
+        directory containing the sampler checkpoint
+    label: str
+        label of the analysis
+    """
+    return os.path.join(outdir, f"{label}_bilby_nr_resume.npz")
+
+
+def worker_state_filename(filename, pid=None):
+    """Return the name of the file used to store the bilby_nr state of a
+    pool worker
+
+    Parameters
+    ----------
+    filename: str
+        name of the file used to store the state of the parent process, see
+        `state_filename`
+    pid: int, optional
+        process ID of the pool worker. Default the current process
+    """
+    if pid is None:
+        pid = os.getpid()
+    return f"{os.path.splitext(filename)[0]}_{pid}.npz"
+
+
+def worker_state_filenames(filename):
+    """Return the names of all files storing the bilby_nr state of pool
+    workers
+
+    Parameters
+    ----------
+    filename: str
+        name of the file used to store the state of the parent process, see
+        `state_filename`
+    """
+    return sorted(glob.glob(worker_state_filename(filename, pid="*")))
+
+
+def sampler_checkpoint_exists(outdir, label):
+    """Return True if the sampler has written a checkpoint which it will
+    resume from, i.e. a '{label}_resume' file exists in outdir
+
+    Parameters
+    ----------
+    outdir: str
+        directory containing the sampler checkpoint
+    label: str
+        label of the analysis
+    """
+    return len(glob.glob(os.path.join(outdir, f"{label}_resume*"))) > 0
+
+
+def _sampler_checkpoint_time(outdir, label):
+    """Return the time that the sampler checkpoint was last modified. None
+    if no checkpoint exists
+    """
+    times = []
+    for filename in glob.glob(os.path.join(outdir, f"{label}_resume*")):
+        try:
+            times.append(os.path.getmtime(filename))
+        except OSError:
+            pass
+    return max(times) if len(times) else None
+
+
+def _encode(data):
+    """Encode a JSON serialisable object as an array of bytes"""
+    return np.frombuffer(json.dumps(data).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode(array):
+    """Decode an array of bytes produced by `_encode`"""
+    return json.loads(np.asarray(array, dtype=np.uint8).tobytes().decode())
+
+
+def _subtract(data, baseline):
+    """Subtract the timers and counters in baseline from those in data. Both
+    are in the format returned by
+    bilby_nr.instrumentation.Instrumentation.as_dict
+    """
+    timers, counters = {}, {}
+    for stage, approximants in data.get("timers", {}).items():
+        for approximant, value in approximants.items():
+            base = baseline.get("timers", {}).get(stage, {}).get(
+                approximant, {"count": 0, "time": 0.}
+            )
+            timers.setdefault(stage, {})[approximant] = {
+                "count": value["count"] - base["count"],
+                "time": value["time"] - base["time"]
+            }
+    for counter, approximants in data.get("counters", {}).items():
+        for approximant, value in approximants.items():
+            counters.setdefault(counter, {})[approximant] = value - (
+                baseline.get("counters", {}).get(counter, {}).get(
+                    approximant, 0
+                )
+            )
+    return {"timers": timers, "counters": counters}
+
+
+def save_state(filename):
+    """Store the model selection statistics, instrumentation timers and
+    counters and the contents of the weight cache of the current process in
+    a compressed binary file. If the current process is a forked pool
+    worker, only the timers and counters collected by the worker are
+    stored. The file is written atomically so that an interrupted write
+    does not corrupt the previous state
+
+    Parameters
+    ----------
+    filename: str
+        name of the file to write to
+
+    Returns
+    -------
+    filename: str
+        name of the file that was written
+    """
+    from .instrumentation import instrumentation
+    from .source import _weight_cache
+    from .statistics import statistics
+    models, totals = statistics.totals()
+    arrays = {"statistics": totals}
+    # weight cache keys are (interpolant, waveform_approximant_list,
+    # use_best, mapping) followed by the masses and spins, which are
+    # integers if quantised. Entries are grouped by the non-numeric part of
+    # the key and which of the masses and spins are quantised
+    groups, order = [], []
+    for rank, (key, value) in enumerate(_weight_cache.items()):
+        header = [
+            key[0], list(key[1]), key[2], key[3],
+            [isinstance(_, int) for _ in key[4:]]
+        ]
+        if header not in groups:
+            groups.append(header)
+            order.append([])
+        order[groups.index(header)].append((rank, key[4:], value))
+    for num, entries in enumerate(order):
+        ranks, keys, values = zip(*entries)
+        arrays[f"weight_cache_{num}_rank"] = np.array(ranks, dtype=np.int64)
+        arrays[f"weight_cache_{num}_keys"] = np.array(keys, dtype=np.float64)
+        arrays[f"weight_cache_{num}_values"] = np.array(
+            values, dtype=np.float64
+        )
+    arrays["metadata"] = _encode({
+        "version": FORMAT_VERSION, "time": time.time(), "models": models,
+        "weight_bins": statistics.weight_bins,
+        "weight_cache": groups,
+        "weight_cache_size": int(_weight_cache.maxsize),
+        "instrumentation": _subtract(
+            instrumentation.as_dict(), _fork_baseline
+        )
+    })
+    directory = os.path.dirname(os.path.abspath(filename))
+    with tempfile.NamedTemporaryFile(
+        dir=directory, suffix=".npz", delete=False
+    ) as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(f.name, filename)
+    return filename
+
+
+def _read_state(filename):
+    """Read a file written by `save_state`. None is returned if the file
+    cannot be read or was written with a different format version
+    """
+    try:
+        with np.load(filename, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        metadata = _decode(arrays.pop("metadata"))
+    except Exception as e:
+        logger.warning(f"Unable to read bilby_nr state from {filename}: {e}")
+        return
+    if metadata.get("version") != FORMAT_VERSION:
+        logger.warning(
+            f"Ignoring bilby_nr state in {filename} as it was written with "
+            f"format version {metadata.get('version')} but version "
+            f"{FORMAT_VERSION} is required"
+        )
+        return
+    return metadata, arrays
+
+
+def load_state(filename):
+    """Restore the state stored with `save_state`, including the state
+    stored by pool workers (see `worker_state_filename`). Timers and
+    counters are added to those collected so far and the weight cache is
+    repopulated with the most recently used entries of each process, up to
+    the size of the cache. The model statistics are shared
+    by all processes, so the most recently stored statistics are added to
+    those collected so far. Files written with a different format version
+    are ignored. The state of the pool workers is then merged into filename
+    and the worker files are removed
+
+    Parameters
+    ----------
+    filename: str
+        name of the file to read
+
+    Returns
+    -------
+    restored: bool
+        True if the state was restored
+    """
+    from .instrumentation import instrumentation
+    from .source import _weight_cache
+    from .statistics import statistics
+    workers = worker_state_filenames(filename)
+    states = [
+        _read_state(_filename) for _filename in [filename] + workers if
+        _filename != filename or os.path.isfile(filename)
+    ]
+    states = [state for state in states if state is not None]
+    if not len(states):
+        return False
+    metadata, arrays = max(states, key=lambda state: state[0].get("time", 0))
+    if metadata["weight_bins"] == statistics.weight_bins:
+        statistics.merge(metadata["models"], arrays["statistics"])
+    else:
+        logger.warning(
+            f"Unable to restore the model statistics from {filename} as the "
+            f"number of weight bins has changed"
+        )
+    entries = []
+    for num, (metadata, arrays) in enumerate(states):
+        instrumentation.merge(metadata["instrumentation"])
+        size = sum(
+            len(arrays[f"weight_cache_{group}_rank"]) for group in
+            range(len(metadata["weight_cache"]))
+        )
+        for group, header in enumerate(metadata["weight_cache"]):
+            interpolant, models, use_best, mapping, quantised = header
+            for rank, key, value in zip(
+                arrays[f"weight_cache_{group}_rank"],
+                arrays[f"weight_cache_{group}_keys"].tolist(),
+                arrays[f"weight_cache_{group}_values"]
+            ):
+                value.flags.writeable = False
+                header = (interpolant, tuple(models), use_best, mapping)
+                # entries are ordered by how recently they were used in
+                # the process that stored them
+                entries.append((
+                    (rank - size, num), header + tuple(
+                        int(_) if _quantised else _ for _, _quantised in
+                        zip(key, quantised)
+                    ), value
+                ))
+    # the size of the cache is only set by the source model, so the size
+    # used by the previous run is restored if it has not been set yet
+    if _weight_cache.maxsize <= 0:
+        _weight_cache.maxsize = max(
+            metadata.get("weight_cache_size", 0) for metadata, _ in states
+        )
+    entries = sorted(entries, key=lambda entry: entry[0])
+    if _weight_cache.maxsize > 0:
+        for _, key, value in entries[-_weight_cache.maxsize:]:
+            _weight_cache[key] = value
+    if len(workers):
+        save_state(filename)
+        for _filename in workers:
+            os.remove(_filename)
+    logger.info(
+        f"Restored bilby_nr state from {filename} and {len(workers)} pool "
+        f"workers including {len(_weight_cache)} cached weights"
+    )
+    return True
+
+
+def remove_state(filename):
+    """Remove the state stored with `save_state`, including the state
+    stored by pool workers
+
+    Parameters
+    ----------
+    filename: str
+        name of the file used to store the state of the parent process
+    """
+    for _filename in [filename] + worker_state_filenames(filename):
+        if os.path.isfile(_filename):
+            os.remove(_filename)
+
+
+def start_periodic_save(filename, outdir, label, interval=60.):
+    """Store the state of each process whenever the sampler writes a new
+    checkpoint, see `maybe_save_state`. This must be called in the parent
+    process before the pool is created. The parent stores its state in
+    filename and pool workers store their state in
+    `worker_state_filename(filename)`. Pool workers created with the
+    'spawn' start method do not store their state
+
+    Parameters
+    ----------
+    filename: str
+        name of the file used to store the state of the parent process
+    outdir: str
+        directory containing the sampler checkpoint
+    label: str
+        label of the analysis
+    interval: float, optional
+        minimum time in seconds between checks for a new sampler
+        checkpoint. Default 60
+    """
+    global _periodic
+    _periodic = {
+        "filename": filename, "outdir": outdir, "label": label,
+        "interval": float(interval), "owner": os.getpid(),
+        "next_check": time.monotonic() + float(interval),
+        "saved": _sampler_checkpoint_time(outdir, label) or 0.,
+    }
+
+
+def stop_periodic_save():
+    """Stop storing the state whenever the sampler writes a checkpoint"""
+    global _periodic
+    _periodic = None
+
+
+def maybe_save_state():
+    """Store the state of the current process if the sampler has written a
+    new checkpoint since the state was last stored. This is called for every
+    likelihood evaluation by the bilby_nr source models and only checks for
+    a new checkpoint once per interval, see `start_periodic_save`. As the
+    state is stored shortly after the sampler checkpoint, likelihood
+    evaluations made in between may be counted twice if the analysis is
+    killed and resumes from that checkpoint
+    """
+    if _periodic is None:
+        return
+    now = time.monotonic()
+    if now < _periodic["next_check"]:
+        return
+    _periodic["next_check"] = now + _periodic["interval"]
+    modified = _sampler_checkpoint_time(
+        _periodic["outdir"], _periodic["label"]
+    )
+    if modified is None or modified <= _periodic["saved"]:
+        return
+    _periodic["saved"] = modified
+    filename = _periodic["filename"]
+    if os.getpid() != _periodic["owner"]:
+        filename = worker_state_filename(filename)
+    try:
+        save_state(filename)
+    except Exception as e:
+        logger.warning(f"Unable to store the bilby_nr state: {e}")
@@ -1,12 +1,23 @@
 # Licensed under an MIT style license -- see LICENSE.md
 
 import copy
+from contextlib import contextmanager
 import numpy as np
 from bilby.gw import conversion
 from bilby.gw.conversion import _generate_all_cbc_parameters as _base_generate
+from .statistics import statistics
 
 __author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
 
+# settings used to checkpoint the conversion of a posterior, see
+# `conversion_checkpoint`
+_conversion_checkpoint = None
+# likelihoods sent to the workers of attribution process pools when the
+# pool was created, keyed by id(executor), see `attribution_executor`
+_initialised_likelihoods = {}
+# likelihood stored in an attribution pool worker
+_worker_likelihood = None
+
 
 def chi_par_chi_perp_from_mass_spin(
     mass_1, mass_2, a_1, tilt_1, a_2, tilt_2, phi_12, phi_jl, theta_jn, phase,
@@ -137,11 +148,268 @@ def chi_perp(
     return chi_perp
 
 
+def chi_perp_from_tilts(mass_1, mass_2, a_1, tilt_1, a_2, tilt_2, phi_12):
+    """Calculate and return the perpendicular spin, as defined in Eq. 11 of
+    https://www.nature.com/articles/s41550-025-02579-7, directly from the
+    tilt angles. The in-plane spin components are defined in a frame where
+    the orbital angular momentum lies along z, meaning that the magnitude of
+    the total in-plane spin depends only on the in-plane spin magnitudes and
+    the angle between them. This gives the same result as `chi_perp` but
+    can be evaluated for arrays of samples
+
+    Parameters
+    ----------
+    mass_1: float, np.ndarray
+        The mass of the primary black hole
+    mass_2: float, np.ndarray
+        The mass of the secondary black hole
+    a_1: float, np.ndarray
+        The dimensionless spin magnitude of the primary black hole
+    tilt_1: float, np.ndarray
+        The tilt angle of the primary black hole spin
+    a_2: float, np.ndarray
+        The dimensionless spin magnitude of the secondary black hole
+    tilt_2: float, np.ndarray
+        The tilt angle of the secondary black hole spin
+    phi_12: float, np.ndarray
+        The difference in azimuthal angle between the two spins
+
+    Returns
+    -------
+    chi_perp: float, np.ndarray
+        The perpendicular spin
+    """
+    S1_perp = mass_1**2 * a_1 * np.sin(tilt_1)
+    S2_perp = mass_2**2 * a_2 * np.sin(tilt_2)
+    S_perp_mag = np.sqrt(np.abs(
+        S1_perp**2 + S2_perp**2 + 2 * S1_perp * S2_perp * np.cos(phi_12)
+    ))
+    return S_perp_mag / (mass_1 + mass_2)**2
+
+
+def generate_model_accuracy_parameters(
+    sample, likelihood=None, priors=None, npool=1,
+    waveform_approximant_list=None, match_interpolant=None, use_best=None,
+    mapping=None
+):
+    """Add the parallel spin, perpendicular spin and, for every waveform
+    approximant, the approximate match to numerical relativity and the
+    weight assigned to the approximant. All columns are calculated for the
+    full set of samples at once and are stored as float32. This function
+    follows the signature of bilby's conversion functions and can therefore
+    be passed to bilby as (or called within) a `conversion_function`
+
+    Parameters
+    ----------
+    sample: dict, pandas.DataFrame
+        Samples to fill in with extra parameters
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling. If provided, the
+        waveform approximants, interpolant and mapping are read from the
+        waveform arguments unless explicitly provided
+    priors: dict, optional
+        Dictionary of prior objects. Not used
+    npool: int, optional
+        Number of processes to use for the conversion. Not used
+    waveform_approximant_list: list, optional
+        list of waveform approximants to add columns for
+    match_interpolant: str, optional
+        the interpolant you wish to use to estimate the match. If None, the
+        matches are nan and all approximants are given equal weight
+    use_best: bool, optional
+        if True, give all weight to the approximant with the highest match.
+        If None, the value is read from the likelihood if provided.
+        Default None, i.e. False if no likelihood is provided
+    mapping: str, optional
+        a string that can be evaluated to map an array of matches to a series
+        of weights. See bilby_nr.source._weights_from_matches. If None, the
+        mapping is read from the likelihood if provided
+
+    Returns
+    -------
+    sample: dict, pandas.DataFrame
+        the samples with the columns 'chi_par', 'chi_perp', 'match_<model>'
+        and 'weight_<model>' added
+    """
+    from .source import _weights_for_samples, _matches_for_samples
+    if likelihood is not None:
+        waveform_arguments = likelihood.waveform_generator.waveform_arguments
+        if waveform_approximant_list is None:
+            waveform_approximant_list = waveform_arguments.get(
+                "waveform_approximant_list", None
+            )
+        if match_interpolant is None:
+            match_interpolant = waveform_arguments.get(
+                "match_interpolant", None
+            )
+        if use_best is None:
+            use_best = waveform_arguments.get("use_best_match", None)
+        if mapping is None:
+            mapping = waveform_arguments.get("match_to_weight", None)
+    if waveform_approximant_list is None:
+        waveform_approximant_list = []
+    if use_best is None:
+        use_best = False
+
+    required = [
+        "mass_1", "mass_2", "a_1", "tilt_1", "phi_12", "a_2", "tilt_2",
+        "phi_jl", "theta_jn", "phase"
+    ]
+    if all(key in sample.keys() for key in required):
+        converted = sample
+    else:
+        converted, _ = conversion.convert_to_lal_binary_black_hole_parameters(
+            sample.copy()
+        )
+    scalar = not np.ndim(converted["mass_1"])
+    samples = {
+        key: np.atleast_1d(np.asarray(converted[key], dtype=float)) for key in
+        required
+    }
+    columns = {
+        "chi_par": chi_par(
+            *[samples[key] for key in [
+                "mass_1", "mass_2", "a_1", "tilt_1", "a_2", "tilt_2"
+            ]]
+        ),
+        "chi_perp": chi_perp_from_tilts(
+            *[samples[key] for key in [
+                "mass_1", "mass_2", "a_1", "tilt_1", "a_2", "tilt_2", "phi_12"
+            ]]
+        ),
+    }
+    if len(waveform_approximant_list):
+        matches = np.full(
+            (len(samples["mass_1"]), len(waveform_approximant_list)), np.nan
+        )
+        if match_interpolant is not None:
+            matches = _matches_for_samples(
+                waveform_approximant_list, samples, match_interpolant
+            )
+        weights = _weights_for_samples(
+            waveform_approximant_list, samples,
+            match_interpolant=match_interpolant, use_best=use_best,
+            mapping=mapping
+        )
+        for num, model in enumerate(waveform_approximant_list):
+            columns[f"match_{model}"] = matches[:, num]
+            columns[f"weight_{model}"] = weights[:, num]
+    for key, value in columns.items():
+        value = value.astype(np.float32)
+        sample[key] = value[0] if scalar else value
+    return sample
+
+
+@contextmanager
+def conversion_checkpoint(
+    filename, chunk_size=1000, checkpoint_interval=None, checkpoint_time=None
+):
+    """Context manager which periodically checkpoints the conversion of a
+    posterior within the context, including the conversion run by bilby at
+    the end of sampling. Posteriors are converted in chunks and the
+    converted samples are stored in filename. If the conversion is
+    interrupted, it resumes from the last checkpoint when the same posterior
+    is converted again, see
+    bilby_nr.postprocessing.generate_all_cbc_parameters_with_checkpoint
+
+    Parameters
+    ----------
+    filename: str
+        path to the HDF5 file used to store the converted samples
+    chunk_size: int, optional
+        number of samples to convert at once. Default 1000
+    checkpoint_interval: int, optional
+        minimum number of samples to process between checkpoints. Default
+        None
+    checkpoint_time: float, optional
+        minimum time in seconds between checkpoints. Default None. If
+        neither checkpoint_interval nor checkpoint_time are provided, a
+        checkpoint is written after every chunk
+    """
+    global _conversion_checkpoint
+    previous = _conversion_checkpoint
+    _conversion_checkpoint = {
+        "checkpoint_file": filename, "chunk_size": chunk_size,
+        "checkpoint_interval": checkpoint_interval,
+        "checkpoint_time": checkpoint_time
+    }
+    try:
+        yield
+    finally:
+        _conversion_checkpoint = previous
+
+
+def generate_all_bbh_parameters(
+    sample, likelihood=None, priors=None, npool=1, concurrent=False,
+    max_workers=None, checkpoint_file=None, checkpoint_interval=None,
+    checkpoint_time=None
+):
+    """Extension of bilby.gw.conversion.generate_all_bbh_parameters which
+    allows the likelihood evaluations used to attribute the samples to a
+    waveform approximant to be run concurrently, and the conversion to be
+    checkpointed
+
+    Parameters
+    ----------
+    sample: dict, pandas.DataFrame
+        Samples to fill in with extra parameters, this may be either an
+        injection or posterior samples.
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling, used for waveform and
+        likelihood.interferometers.
+    priors: dict, optional
+        Dictionary of prior objects, used to fill in non-sampled parameters.
+    npool: int, optional
+        Number of processes to use for the conversion. Default 1
+    concurrent: bool, optional
+        if True, evaluate the likelihood for all waveform approximants
+        concurrently when attributing the samples to a waveform approximant.
+        See `determine_waveform_approximant_from_likelihood`. Default False
+    max_workers: int, optional
+        maximum number of workers to use when concurrent=True. Default the
+        number of waveform approximants
+    checkpoint_file: str, optional
+        path to the HDF5 file used to checkpoint the conversion of a
+        posterior, see `conversion_checkpoint`. Default None, i.e. no
+        checkpointing unless called within `conversion_checkpoint`
+    checkpoint_interval: int, optional
+        minimum number of samples to process between checkpoints. Only used
+        if checkpoint_file is provided. Default None
+    checkpoint_time: float, optional
+        minimum time in seconds between checkpoints. Only used if
+        checkpoint_file is provided. Default None
+    """
+    waveform_defaults = {
+        "reference_frequency": 50.0, "waveform_approximant": "IMRPhenomPv2",
+        "minimum_frequency": 20.0
+    }
+    kwargs = dict(
+        defaults=waveform_defaults,
+        base_conversion=conversion.convert_to_lal_binary_black_hole_parameters,
+        likelihood=likelihood, priors=priors, npool=npool,
+        concurrent=concurrent, max_workers=max_workers
+    )
+    if checkpoint_file is None:
+        return _generate_all_cbc_parameters(sample, **kwargs)
+    with conversion_checkpoint(
+        checkpoint_file, checkpoint_interval=checkpoint_interval,
+        checkpoint_time=checkpoint_time
+    ):
+        return _generate_all_cbc_parameters(sample, **kwargs)
+
+
+# likelihood evaluations during post-processing should not contribute to the
+# model selection statistics
+@statistics.paused()
 def _generate_all_cbc_parameters(
-    sample, defaults, base_conversion, likelihood=None, priors=None, npool=1
+    sample, defaults, base_conversion, likelihood=None, priors=None, npool=1,
+    concurrent=False, max_workers=None
 ):
     """Extension of bilby.gw.conversion.generate_all_bbh_parameters to allow
-    for multiple models
+    for multiple models. If called within `conversion_checkpoint`,
+    posteriors with more than one sample are converted in checkpointed
+    chunks and each sample is attributed to a waveform approximant
+    separately
 
     Parameters
     ==========
@@ -155,32 +423,143 @@ def _generate_all_cbc_parameters(
         Dictionary of prior objects, used to fill in non-sampled parameters.
     npool: int, optional
         Number of processes to use for the conversion. Default 1
+    concurrent: bool, optional
+        if True, evaluate the likelihood for all waveform approximants
+        concurrently when attributing the samples to a waveform approximant.
+        See `determine_waveform_approximant_from_likelihood`. Default False
+    max_workers: int, optional
+        maximum number of workers to use when concurrent=True. Default the
+        number of waveform approximants
     """
+    import pandas as pd
+    if _conversion_checkpoint is not None and isinstance(
+        sample, pd.DataFrame
+    ) and len(sample) > 1:
+        from .postprocessing import (
+            generate_all_cbc_parameters_with_checkpoint
+        )
+        return generate_all_cbc_parameters_with_checkpoint(
+            sample, defaults=defaults, base_conversion=base_conversion,
+            likelihood=likelihood, priors=priors, npool=npool,
+            concurrent=concurrent, max_workers=max_workers,
+            **_conversion_checkpoint
+        )
     _chosen_model = None
-    if "log_likelihood" in sample.keys() and likelihood is not None:
+    waveform_approximant_list = None
+    if likelihood is not None:
         waveform_approximant_list = \
             likelihood.waveform_generator.waveform_arguments.get(
                 "waveform_approximant_list", None
             )
+    if "waveform_index" in sample.keys() and (
+        waveform_approximant_list is not None
+    ):
+        # the waveform approximant was sampled so no attribution is needed
+        return _generate_all_cbc_parameters_from_index(
+            sample, waveform_approximant_list, defaults, base_conversion,
+            likelihood=likelihood, priors=priors, npool=npool
+        )
+    if "log_likelihood" in sample.keys() and likelihood is not None:
         if waveform_approximant_list is not None:
             _chosen_model = determine_waveform_approximant_from_likelihood(
-                sample, waveform_approximant_list, likelihood
+                sample, waveform_approximant_list, likelihood,
+                concurrent=concurrent, max_workers=max_workers
             )
 
     if _chosen_model is None:
         # assume a default
         _chosen_model = "IMRPhenomTPHM"
-    _likelihood = copy.deepcopy(likelihood)
-    if _chosen_model is not None:
-        if likelihood is not None:
-            _likelihood.waveform_generator.waveform_arguments.update(
-                {
-                    "waveform_approximant_list": [_chosen_model],
-                    "waveform_approximant": _chosen_model
-                }
+    return _generate_all_cbc_parameters_for_model(
+        sample, _chosen_model, defaults, base_conversion,
+        likelihood=likelihood, priors=priors, npool=npool
+    )
+
+
+def _generate_all_cbc_parameters_from_index(
+    sample, waveform_approximant_list, defaults, base_conversion,
+    likelihood=None, priors=None, npool=1
+):
+    """Generate all CBC parameters for samples which contain the sampled
+    index of the waveform approximant, see
+    bilby_nr.source.indexed_multi_model_binary_black_hole
+
+    Parameters
+    ==========
+    sample: dict, pandas.DataFrame
+        Samples to fill in with extra parameters
+    waveform_approximant_list: list
+        list of waveform approximants that are indexed
+    defaults: dict
+        default waveform arguments
+    base_conversion: func
+        function to convert the samples to the parameters required by the
+        source model
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling
+    priors: dict, optional
+        Dictionary of prior objects, used to fill in non-sampled parameters.
+    npool: int, optional
+        Number of processes to use for the conversion. Default 1
+    """
+    import pandas as pd
+    from .source import waveform_approximant_from_index
+    models = waveform_approximant_from_index(
+        sample["waveform_index"], waveform_approximant_list
+    )
+    if isinstance(models, str) or not isinstance(sample, pd.DataFrame):
+        return _generate_all_cbc_parameters_for_model(
+            sample, np.atleast_1d(models)[0], defaults, base_conversion,
+            likelihood=likelihood, priors=priors, npool=npool
+        )
+    converted = []
+    for model in pd.unique(models):
+        converted.append(
+            _generate_all_cbc_parameters_for_model(
+                sample[models == model].copy(), model, defaults,
+                base_conversion, likelihood=likelihood, priors=priors,
+                npool=npool
             )
-        sample["waveform_approximant"] = _chosen_model
-        defaults["waveform_approximant"] = _chosen_model
+        )
+    return pd.concat(converted).sort_index()
+
+
+def _generate_all_cbc_parameters_for_model(
+    sample, waveform_approximant, defaults, base_conversion, likelihood=None,
+    priors=None, npool=1
+):
+    """Generate all CBC parameters for samples that were attributed to a
+    single waveform approximant
+
+    Parameters
+    ==========
+    sample: dict, pandas.DataFrame
+        Samples to fill in with extra parameters
+    waveform_approximant: str
+        the waveform approximant that the samples were attributed to
+    defaults: dict
+        default waveform arguments
+    base_conversion: func
+        function to convert the samples to the parameters required by the
+        source model
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling, used for waveform and
+        likelihood.interferometers.
+    priors: dict, optional
+        Dictionary of prior objects, used to fill in non-sampled parameters.
+    npool: int, optional
+        Number of processes to use for the conversion. Default 1
+    """
+    _likelihood = copy.deepcopy(likelihood)
+    if likelihood is not None:
+        _arguments = {"waveform_approximant": waveform_approximant}
+        # when the waveform approximant is sampled, the waveform index
+        # selects the approximant from the full list
+        if "waveform_index" not in sample.keys():
+            _arguments["waveform_approximant_list"] = [waveform_approximant]
+        _likelihood.waveform_generator.waveform_arguments.update(_arguments)
+    sample["waveform_approximant"] = waveform_approximant
+    defaults = defaults.copy()
+    defaults["waveform_approximant"] = waveform_approximant
     return _base_generate(
         sample, defaults=defaults,
         base_conversion=base_conversion,
@@ -189,7 +568,8 @@ def _generate_all_cbc_parameters(
 
 
 def determine_waveform_approximant_from_likelihood(
-    sample, waveform_approximant_list, likelihood
+    sample, waveform_approximant_list, likelihood, concurrent=False,
+    max_workers=None, executor=None
 ):
     """Determine the waveform approximant that evaluated the likelihood during
     the inference.
@@ -202,6 +582,23 @@ def determine_waveform_approximant_from_likelihood(
         list of waveform approximants you wish to consider
     likelihood: bilby.gw.likelihood.GravitationalWaveTransient
         likelihood object that was used during the sampling
+    concurrent: bool, optional
+        if True, evaluate the likelihood for all waveform approximants
+        concurrently and cancel outstanding evaluations as soon as one
+        matches the stored log likelihood. A thread pool is used if the
+        backends of all waveform approximants release the GIL, otherwise a
+        process pool is used and the likelihood is sent to each worker once.
+        Default False
+    max_workers: int, optional
+        maximum number of workers to use when concurrent=True. Default the
+        number of waveform approximants
+    executor: concurrent.futures.Executor, optional
+        executor used to evaluate the likelihoods concurrently. This allows
+        the same executor to be reused when attributing many samples, see
+        `attribution_executor`. The executor is not shut down. If provided,
+        concurrent and max_workers are ignored. Default None, i.e. an
+        executor is created and shut down for this sample if
+        concurrent=True
     """
     _chosen_model = None
     _sample = sample.copy()
@@ -220,12 +617,26 @@ def determine_waveform_approximant_from_likelihood(
             _sample = _sample.to_dict(orient="list")
             _sample = {key: item[0] for key, item in _sample.items()}
 
-    for model in waveform_approximant_list:
-        _likelihood = copy.deepcopy(likelihood)
-        logl = _likelihood_for_given_model(_sample, model, _likelihood)
-        if np.isclose(logl, original):
-            _chosen_model = model
-            break
+    if executor is not None:
+        _chosen_model = _concurrent_attribution(
+            _sample, original, waveform_approximant_list, likelihood, executor
+        )
+    elif concurrent:
+        with attribution_executor(
+            waveform_approximant_list, concurrent=True,
+            max_workers=max_workers, likelihood=likelihood
+        ) as executor:
+            _chosen_model = _concurrent_attribution(
+                _sample, original, waveform_approximant_list, likelihood,
+                executor
+            )
+    else:
+        for model in waveform_approximant_list:
+            _likelihood = copy.deepcopy(likelihood)
+            logl = _likelihood_for_given_model(_sample, model, _likelihood)
+            if np.isclose(logl, original):
+                _chosen_model = model
+                break
     if _chosen_model is None:
         raise ValueError(
            "Unable to find a model that returns the same log likelihood as "
@@ -234,6 +645,144 @@ def determine_waveform_approximant_from_likelihood(
     return _chosen_model
 
 
+def _attribution_executor(waveform_approximant_list):
+    """Return the executor class used to evaluate the likelihood for multiple
+    waveform approximants concurrently. A thread pool is only used if the
+    source functions for all waveform approximants set `releases_gil = True`
+
+    Parameters
+    ----------
+    waveform_approximant_list: list
+        list of waveform approximants you wish to consider
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from .source import get_backend
+    if all(
+        getattr(get_backend(model)[0], "releases_gil", False) for model in
+        waveform_approximant_list
+    ):
+        return ThreadPoolExecutor
+    return ProcessPoolExecutor
+
+
+@contextmanager
+def attribution_executor(
+    waveform_approximant_list, concurrent=True, max_workers=None,
+    likelihood=None
+):
+    """Context manager which creates a single executor that can be reused
+    to attribute many samples to a waveform approximant, see
+    `determine_waveform_approximant_from_likelihood`. The executor is shut
+    down once, when the context exits
+
+    Parameters
+    ----------
+    waveform_approximant_list: list
+        list of waveform approximants you wish to consider
+    concurrent: bool, optional
+        if False, no executor is created and None is returned. Default True
+    max_workers: int, optional
+        maximum number of workers. Default the number of waveform
+        approximants
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        likelihood object that was used during the sampling. If provided and
+        a process pool is used, the likelihood is sent to each worker once
+        when the worker starts rather than with every likelihood evaluation.
+        Samples attributed with this executor must then use the same
+        likelihood. Default None
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    if not concurrent:
+        yield None
+        return
+    executor_class = _attribution_executor(waveform_approximant_list)
+    kwargs = {"max_workers": max_workers or len(waveform_approximant_list)}
+    initialise = likelihood is not None and issubclass(
+        executor_class, ProcessPoolExecutor
+    )
+    if initialise:
+        kwargs.update(
+            initializer=_initialise_attribution_worker,
+            initargs=(likelihood,)
+        )
+    executor = executor_class(**kwargs)
+    if initialise:
+        _initialised_likelihoods[id(executor)] = likelihood
+    try:
+        yield executor
+    finally:
+        _initialised_likelihoods.pop(id(executor), None)
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _initialise_attribution_worker(likelihood):
+    """Store the likelihood in an attribution pool worker, see
+    `attribution_executor`
+
+    Parameters
+    ----------
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient
+        likelihood object that was used during the sampling
+    """
+    global _worker_likelihood
+    _worker_likelihood = likelihood
+
+
+def _attribution_task(sample, waveform_approximant, likelihood=None):
+    """Evaluate the likelihood for a given waveform approximant in an
+    attribution worker. If likelihood is None, the likelihood stored when
+    the worker started is used, see `attribution_executor`
+    """
+    if likelihood is None:
+        likelihood = _worker_likelihood
+    return _likelihood_for_given_model(
+        sample, waveform_approximant, likelihood
+    )
+
+
+def _concurrent_attribution(
+    sample, original, waveform_approximant_list, likelihood, executor
+):
+    """Evaluate the likelihood for all waveform approximants concurrently and
+    return the first approximant which reproduces the stored log likelihood.
+    Evaluations which have not started are cancelled and evaluations which
+    are running are left to finish in the executor
+
+    Parameters
+    ----------
+    sample: dict
+        the sample you wish to evaluate the likelihood for, excluding the
+        log likelihood
+    original: float
+        the log likelihood stored in the sample
+    waveform_approximant_list: list
+        list of waveform approximants you wish to consider
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient
+        likelihood object that was used during the sampling
+    executor: concurrent.futures.Executor
+        executor used to evaluate the likelihoods
+    """
+    from concurrent.futures import as_completed
+    # avoid sending the likelihood with every evaluation if the workers
+    # already hold it
+    _likelihood = likelihood
+    if _initialised_likelihoods.get(id(executor), None) is likelihood:
+        _likelihood = None
+    futures = {
+        executor.submit(
+            _attribution_task, sample, model, _likelihood
+        ): model for model in waveform_approximant_list
+    }
+    try:
+        for future in as_completed(futures):
+            if np.isclose(future.result(), original):
+                return futures[future]
+    finally:
+        for future in futures:
+            future.cancel()
+    return None
+
+
 def _likelihood_for_given_model(sample, waveform_approximant, likelihood):
     """Evaluate the likelihood for a given waveform approximant
 
@@ -0,0 +1,204 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import json
+import os
+import signal
+import time
+from contextlib import nullcontext
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+_ENVIRONMENT_VARIABLE = "BILBY_NR_INSTRUMENTATION"
+_NULL_CONTEXT = nullcontext()
+
+
+class _Timer(object):
+    """Context manager that records the time spent inside the context with
+    a monotonic clock
+    """
+    __slots__ = ["_instrumentation", "_stage", "_approximant", "_start"]
+
+    def __init__(self, instrumentation, stage, approximant):
+        self._instrumentation = instrumentation
+        self._stage = stage
+        self._approximant = approximant
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._instrumentation.record(
+            self._stage, time.perf_counter() - self._start,
+            approximant=self._approximant
+        )
+        return False
+
+
+class Instrumentation(object):
+    """Class to collect per-stage timers and call counters. Instrumentation is
+    disabled by default and can be enabled either by calling `enable` or by
+    setting the `BILBY_NR_INSTRUMENTATION` environment variable. The
+    environment variable is inherited by pool workers so it is the
+    recommended way to enable instrumentation when sampling with `npool` > 1
+
+    Parameters
+    ----------
+    enabled: bool, optional
+        if True, collect timers and counters. Default False
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def enable(self):
+        """Start collecting timers and counters"""
+        self.enabled = True
+
+    def disable(self):
+        """Stop collecting timers and counters"""
+        self.enabled = False
+
+    def reset(self):
+        """Remove all timers and counters collected so far"""
+        self._timers = {}
+        self._counters = {}
+
+    def timer(self, stage, approximant=None):
+        """Return a context manager which times the code inside the context
+
+        Parameters
+        ----------
+        stage: str
+            name of the stage you wish to time, e.g. 'waveform'
+        approximant: str, optional
+            name of the waveform approximant associated with this stage
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self, stage, approximant)
+
+    def record(self, stage, elapsed, approximant=None, count=1):
+        """Record the time spent in a given stage
+
+        Parameters
+        ----------
+        stage: str
+            name of the stage
+        elapsed: float
+            time spent in the stage in seconds
+        approximant: str, optional
+            name of the waveform approximant associated with this stage
+        count: int, optional
+            number of calls to associate with this time. Default 1
+        """
+        if not self.enabled:
+            return
+        key = (stage, approximant)
+        total = self._timers.get(key)
+        if total is None:
+            self._timers[key] = [count, elapsed]
+        else:
+            total[0] += count
+            total[1] += elapsed
+
+    def increment(self, counter, approximant=None, value=1):
+        """Increment a counter
+
+        Parameters
+        ----------
+        counter: str
+            name of the counter, e.g. 'cache_hit'
+        approximant: str, optional
+            name of the waveform approximant associated with this counter
+        value: int, optional
+            value to increment the counter by. Default 1
+        """
+        if not self.enabled:
+            return
+        key = (counter, approximant)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def merge(self, data):
+        """Add timers and counters, e.g. from a previous run, to those
+        collected so far
+
+        Parameters
+        ----------
+        data: dict
+            dictionary of timers and counters in the format returned by
+            `as_dict`
+        """
+        for stage, approximants in data.get("timers", {}).items():
+            for approximant, value in approximants.items():
+                key = (stage, None if approximant == "all" else approximant)
+                total = self._timers.setdefault(key, [0, 0.])
+                total[0] += value["count"]
+                total[1] += value["time"]
+        for counter, approximants in data.get("counters", {}).items():
+            for approximant, value in approximants.items():
+                key = (counter, None if approximant == "all" else approximant)
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def as_dict(self):
+        """Return the collected timers and counters as a dictionary. Timers
+        are stored as {stage: {approximant: {'count': N, 'time': T}}} and
+        counters as {counter: {approximant: N}}. Entries that are not
+        associated with a waveform approximant are stored under 'all'
+        """
+        timers, counters = {}, {}
+        for (stage, approximant), (count, elapsed) in self._timers.items():
+            timers.setdefault(stage, {})[approximant or "all"] = {
+                "count": count, "time": elapsed
+            }
+        for (counter, approximant), value in self._counters.items():
+            counters.setdefault(counter, {})[approximant or "all"] = value
+        return {"pid": os.getpid(), "timers": timers, "counters": counters}
+
+    def dump(self, filename=None):
+        """Write the collected timers and counters to a JSON file
+
+        Parameters
+        ----------
+        filename: str, optional
+            name of the file to write to. Default
+            'bilby_nr_instrumentation_{pid}.json' in the current working
+            directory
+
+        Returns
+        -------
+        filename: str
+            name of the file that was written
+        """
+        if filename is None:
+            filename = f"bilby_nr_instrumentation_{os.getpid()}.json"
+        with open(filename, "w") as f:
+            json.dump(self.as_dict(), f, indent=4)
+        return filename
+
+    def install_signal_handler(self, signum=signal.SIGUSR1, outdir="."):
+        """Dump the collected timers and counters whenever the process
+        receives a given signal. Signal handlers are inherited by forked
+        pool workers, meaning that sending the signal to the process group
+        of a running sampler dumps one file per process
+
+        Parameters
+        ----------
+        signum: int, optional
+            signal to listen for. Default signal.SIGUSR1
+        outdir: str, optional
+            directory to write the files to. Default '.'
+        """
+        def handler(_signum, _frame):
+            self.dump(
+                os.path.join(
+                    outdir, f"bilby_nr_instrumentation_{os.getpid()}.json"
+                )
+            )
+        signal.signal(signum, handler)
+
+
+instrumentation = Instrumentation(
+    enabled=os.environ.get(_ENVIRONMENT_VARIABLE, "").lower() in
+    ["1", "true", "yes"]
+)
@@ -2,11 +2,25 @@
 
 import numpy as np
 import os
+from functools import lru_cache
 from bilby.gw.conversion import component_masses_to_symmetric_mass_ratio
-from ..conversion import chi_par_chi_perp_from_mass_spin
+from ..conversion import chi_par, chi_perp_from_tilts
 
 __author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
 
+ALLOWED_MODELS = ["IMRPhenomXPHMST", "IMRPhenomTPHM", "SEOBNRv5PHM"]
+FIT_VARIABLES = ["chi_perp", "chi_par", "eta", "Mtot"]
+# region of the parameter space used to construct the fits
+FIT_DOMAIN = {
+    "mass_1": (30., 150.), "mass_ratio": (0.25, 1.), "a_1": (0., 0.99),
+    "a_2": (0., 0.99)
+}
+_IDENTIFIERS = {
+    "IMRPhenomXPHMST": "XPHMST",
+    "IMRPhenomTPHM": "TPHM",
+    "SEOBNRv5PHM": "SEOB",
+}
+
 
 def Cijkl(i, j, k, l, fit_coeffs):
     """Return coefficients of the Pade Pade fit as defined in Eq.X of
@@ -123,74 +137,650 @@ def mismatch_interpolant(
     mismatch: float
         An approximate mismatch for a given model
     """
-    allowed_models = ["IMRPhenomXPHMST", "IMRPhenomTPHM", "SEOBNRv5PHM"]
-    if waveform_approximant not in allowed_models:
+    log10_mismatch = _evaluate(
+        waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2
+    )
+    mismatch = 10**log10_mismatch
+    return mismatch
+
+
+def mismatch_interpolant_gradient(
+    waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2,
+    phi_jl, theta_jn, phase
+):
+    """Evaluate the log10 mismatch interpolant and its analytic derivatives.
+    Derivatives are calculated with respect to the fit variables (chi_perp,
+    chi_par, eta and Mtot) and chained back to the component masses and
+    spins. The interpolant is independent of phi_jl, theta_jn and phase
+    meaning that derivatives with respect to these parameters are zero.
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        Name of waveform approximant you wish to evaluate the interpolant for.
+        Currently allowed waveform approximants include
+        ["IMRPhenomXPHMST", "IMRPhenomTPHM", "SEOBNRv5PHM"]
+    mass_1: float, np.ndarray
+        Detector-frame primary mass of the binary black hole
+    mass_2: float, np.ndarray
+        Detector-frame secondary mass of the binary black hole
+    a_1: float, np.ndarray
+        Magnitude of the spin vector associated with the primary component in
+        the binary black hole
+    tilt_1: float, np.ndarray
+        Polar angle of the spin vector associated with the primary component in
+        the binary black hole
+    phi_12: float, np.ndarray
+        Azimuthal angle between the primary spin and secondary spin vector
+    a_2: float, np.ndarray
+        Magnitude of the spin vector associated with the secondary component
+        in the binary black hole
+    tilt_2: float, np.ndarray
+        Polar angle of the spin vector associated with the secondary component
+        in the binary black hole
+    phi_jl: float, np.ndarray
+        Azimuthal angle between the total angular momentum and the orbital
+        angular momentum
+    theta_jn: float, np.ndarray
+        Inclination angle of the binary: the angle between the total angular
+        momentum and the line of sight
+    phase: float, np.ndarray
+        The phase of the binary black hole
+
+    Returns
+    -------
+    log10_mismatch: float, np.ndarray
+        The log10 of the approximate mismatch for a given model
+    gradient: dict
+        Dictionary containing the derivative of log10_mismatch with respect
+        to chi_perp, chi_par, eta, Mtot, mass_1, mass_2, a_1, tilt_1, phi_12,
+        a_2, tilt_2, phi_jl, theta_jn and phase
+    """
+    scalar = np.ndim(mass_1) == 0
+    mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2 = [
+        np.atleast_1d(np.asarray(_, dtype=float)) for _ in
+        [mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2]
+    ]
+    interpolant = _check_and_load(waveform_approximant, mass_1, mass_2)
+    Mtot = mass_1 + mass_2
+    eta = component_masses_to_symmetric_mass_ratio(mass_1, mass_2)
+    _chi_par = chi_par(mass_1, mass_2, a_1, tilt_1, a_2, tilt_2)
+    _chi_perp = chi_perp_from_tilts(
+        mass_1, mass_2, a_1, tilt_1, a_2, tilt_2, phi_12
+    )
+    log10_mismatch, partials = interpolant.log10_mismatch_and_gradient(
+        _chi_perp, _chi_par, eta, Mtot
+    )
+    d_chi_perp, d_chi_par, d_eta, d_Mtot = partials
+
+    # derivatives of the fit variables with respect to masses and spins
+    S1 = mass_1**2 * a_1 * np.sin(tilt_1)
+    S2 = mass_2**2 * a_2 * np.sin(tilt_2)
+    S = _chi_perp * Mtot**2
+    nonzero = S > 0
+    dS_dS1 = np.divide(
+        S1 + S2 * np.cos(phi_12), S, out=np.zeros_like(S), where=nonzero
+    )
+    dS_dS2 = np.divide(
+        S2 + S1 * np.cos(phi_12), S, out=np.zeros_like(S), where=nonzero
+    )
+    dS_dphi_12 = np.divide(
+        -S1 * S2 * np.sin(phi_12), S, out=np.zeros_like(S), where=nonzero
+    )
+    P = _chi_par * Mtot**2
+    gradient = {
+        "chi_perp": d_chi_perp, "chi_par": d_chi_par, "eta": d_eta,
+        "Mtot": d_Mtot,
+    }
+    for num, (mass, other) in enumerate([(mass_1, mass_2), (mass_2, mass_1)]):
+        a, tilt = [(a_1, tilt_1), (a_2, tilt_2)][num]
+        dS_dSi = [dS_dS1, dS_dS2][num]
+        label = num + 1
+        dchi_par_dm = (
+            2 * mass * a * np.cos(tilt) / Mtot**2 - 2 * P / Mtot**3
+        )
+        dchi_perp_dm = (
+            dS_dSi * 2 * mass * a * np.sin(tilt) / Mtot**2 - 2 * S / Mtot**3
+        )
+        deta_dm = other * (other - mass) / Mtot**3
+        gradient[f"mass_{label}"] = (
+            d_chi_perp * dchi_perp_dm + d_chi_par * dchi_par_dm +
+            d_eta * deta_dm + d_Mtot
+        )
+        gradient[f"a_{label}"] = (
+            d_chi_perp * dS_dSi * mass**2 * np.sin(tilt) / Mtot**2 +
+            d_chi_par * mass**2 * np.cos(tilt) / Mtot**2
+        )
+        gradient[f"tilt_{label}"] = (
+            d_chi_perp * dS_dSi * mass**2 * a * np.cos(tilt) / Mtot**2 -
+            d_chi_par * mass**2 * a * np.sin(tilt) / Mtot**2
+        )
+    gradient["phi_12"] = d_chi_perp * dS_dphi_12 / Mtot**2
+    for key in ["phi_jl", "theta_jn", "phase"]:
+        gradient[key] = np.zeros_like(log10_mismatch)
+    if scalar:
+        log10_mismatch = float(log10_mismatch[0])
+        gradient = {key: float(value[0]) for key, value in gradient.items()}
+    return log10_mismatch, gradient
+
+
+class PadePadeInterpolant(object):
+    """Compiled representation of the Pade-Pade fit defined in Eq.X of
+    https://www.nature.com/articles/s41550-025-02579-7,
+
+    log10(mismatch) = sum_ij X^i Y^j N_ij(Z, V) / D_ij(Z, V)
+
+    where N_ij = sum_kl C_ijkl Z^k V^l and D_ij = sum_kl |C_ij(k)(l+2)| Z^k V^l.
+    The coefficients are stored as dense arrays so that the fit can be
+    evaluated for many samples at once
+
+    Parameters
+    ----------
+    numerator: np.ndarray
+        array of shape (I, J, K, L) containing the numerator coefficients
+    denominator: np.ndarray
+        array of shape (I, J, K, L) containing the (absolute) denominator
+        coefficients
+    transforms: list, optional
+        list of 4 strings which map the fit variables (chi_perp, chi_par, eta,
+        Mtot) onto X, Y, Z and V. Default is the identity map
+    """
+    def __init__(self, numerator, denominator, transforms=None):
+        self.numerator = np.asarray(numerator, dtype=float)
+        self.denominator = np.asarray(denominator, dtype=float)
+        if self.numerator.shape != self.denominator.shape:
+            raise ValueError(
+                "The numerator and denominator coefficients must have the "
+                "same shape"
+            )
+        if transforms is None:
+            transforms = [f"({var})" for var in FIT_VARIABLES]
+        self.transforms = transforms
+
+    @classmethod
+    def from_file(cls, filename):
+        """Compile the interpolant from a file containing the fitting
+        coefficients
+
+        Parameters
+        ----------
+        filename: str
+            path to the file containing the fitting coefficients
+        """
+        with open(filename, "r") as f:
+            lines = f.readlines()
+            lines = [l.strip() for l in lines]
+            original_variables = lines[1].split("\t")
+            changed_variables = lines[2].split("\t")
+
+        fit_coeffs = np.genfromtxt(filename, skip_header=3, names=True)
+        x, y, z, v = original_variables[:4]
+        transforms = []
+        for var in changed_variables[2:6]:
+            for orig in [x, y, z, v]:
+                var = var.replace(
+                    orig.split("=")[0], f"({orig.split('=')[1]})"
+                )
+            transforms.append(var.split("=")[1])
+
+        shape = [int(np.max(fit_coeffs[key])) + 1 for key in "ijkl"]
+        coefficients = np.full(shape, np.nan)
+        for i, j, k, l, C in zip(
+            *[fit_coeffs[key].astype(int) for key in "ijkl"],
+            fit_coeffs["Cijkl"]
+        ):
+            if not np.isnan(coefficients[i, j, k, l]):
+                raise ValueError("Duplicated entry")
+            coefficients[i, j, k, l] = C
+        max_l = shape[3] - 1
+        numerator = coefficients[:, :, :, :max_l - 1]
+        denominator = np.abs(coefficients[:, :, :, 2:max_l + 1])
+        if np.any(np.isnan(numerator)) or np.any(np.isnan(denominator)):
+            raise ValueError(f"Missing fitting coefficients in {filename}")
+        return cls(numerator, denominator, transforms=transforms)
+
+    @property
+    def identity_transforms(self):
+        """Return True if X, Y, Z and V are the fit variables"""
+        return all(
+            transform.strip("() ") == var for transform, var in
+            zip(self.transforms, FIT_VARIABLES)
+        )
+
+    def _fit_variables(self, chi_perp, chi_par, eta, Mtot):
+        """Return X, Y, Z and V for the given fit variables"""
+        namespace = dict(
+            chi_perp=chi_perp, chi_par=chi_par, eta=eta, Mtot=Mtot,
+            Sqrt=np.sqrt, ArcTan=ArcTan
+        )
+        return [
+            np.asarray(eval(transform, namespace), dtype=float) *
+            np.ones_like(chi_perp, dtype=float) for transform in
+            self.transforms
+        ]
+
+    @staticmethod
+    def _powers(values, n):
+        """Return values**[0, ..., n-1] and their derivatives"""
+        exponents = np.arange(n)
+        powers = values[:, None]**exponents
+        derivative = np.zeros_like(powers)
+        derivative[:, 1:] = exponents[1:] * powers[:, :-1]
+        return powers, derivative
+
+    def log10_mismatch(self, chi_perp, chi_par, eta, Mtot):
+        """Evaluate the fit
+
+        Parameters
+        ----------
+        chi_perp: np.ndarray
+            the perpendicular spin
+        chi_par: np.ndarray
+            the parallel spin
+        eta: np.ndarray
+            the symmetric mass ratio
+        Mtot: np.ndarray
+            the total mass
+
+        Returns
+        -------
+        log10_mismatch: np.ndarray
+            the log10 mismatch
+        """
+        X, Y, Z, V = [
+            np.atleast_1d(_) for _ in
+            self._fit_variables(chi_perp, chi_par, eta, Mtot)
+        ]
+        I, J, K, L = self.numerator.shape
+        Xp = X[:, None]**np.arange(I)
+        Yp = Y[:, None]**np.arange(J)
+        Zp = Z[:, None]**np.arange(K)
+        Vp = V[:, None]**np.arange(L)
+        N = np.einsum("nk,nl,ijkl->nij", Zp, Vp, self.numerator)
+        D = np.einsum("nk,nl,ijkl->nij", Zp, Vp, self.denominator)
+        return np.einsum("ni,nj,nij->n", Xp, Yp, N / D)
+
+    def log10_mismatch_and_gradient(self, chi_perp, chi_par, eta, Mtot):
+        """Evaluate the fit and its analytic derivatives with respect to the
+        fit variables
+
+        Parameters
+        ----------
+        chi_perp: np.ndarray
+            the perpendicular spin
+        chi_par: np.ndarray
+            the parallel spin
+        eta: np.ndarray
+            the symmetric mass ratio
+        Mtot: np.ndarray
+            the total mass
+
+        Returns
+        -------
+        log10_mismatch: np.ndarray
+            the log10 mismatch
+        gradient: list
+            the derivatives of the log10 mismatch with respect to chi_perp,
+            chi_par, eta and Mtot
+        """
+        if not self.identity_transforms:
+            raise NotImplementedError(
+                "Analytic derivatives are only available for fits which use "
+                "chi_perp, chi_par, eta and Mtot directly"
+            )
+        X, Y, Z, V = [
+            np.atleast_1d(np.asarray(_, dtype=float)) for _ in
+            [chi_perp, chi_par, eta, Mtot]
+        ]
+        I, J, K, L = self.numerator.shape
+        Xp, dXp = self._powers(X, I)
+        Yp, dYp = self._powers(Y, J)
+        Zp, dZp = self._powers(Z, K)
+        Vp, dVp = self._powers(V, L)
+        N = np.einsum("nk,nl,ijkl->nij", Zp, Vp, self.numerator)
+        D = np.einsum("nk,nl,ijkl->nij", Zp, Vp, self.denominator)
+        R = N / D
+        dR_dZ = (
+            np.einsum("nk,nl,ijkl->nij", dZp, Vp, self.numerator) * D -
+            np.einsum("nk,nl,ijkl->nij", dZp, Vp, self.denominator) * N
+        ) / D**2
+        dR_dV = (
+            np.einsum("nk,nl,ijkl->nij", Zp, dVp, self.numerator) * D -
+            np.einsum("nk,nl,ijkl->nij", Zp, dVp, self.denominator) * N
+        ) / D**2
+        log10_mismatch = np.einsum("ni,nj,nij->n", Xp, Yp, R)
+        gradient = [
+            np.einsum("ni,nj,nij->n", dXp, Yp, R),
+            np.einsum("ni,nj,nij->n", Xp, dYp, R),
+            np.einsum("ni,nj,nij->n", Xp, Yp, dR_dZ),
+            np.einsum("ni,nj,nij->n", Xp, Yp, dR_dV),
+        ]
+        return log10_mismatch, gradient
+
+
+class TruncatedPadePadeInterpolant(PadePadeInterpolant):
+    """Reduced-order representation of the Pade-Pade fit where only a subset
+    of the rational terms N_ij / D_ij are retained. Terms which vary little
+    over the domain of the fit are replaced by a constant and evaluated as a
+    polynomial in X and Y,
+
+    log10(mismatch) = sum_ij P_ij X^i Y^j + sum_b X^i_b Y^j_b N_b(Z, V) / D_b(Z, V)
+
+    See bilby_nr.interp.truncate.truncate_interpolant
+
+    Parameters
+    ----------
+    numerator: np.ndarray
+        array of shape (B, K, L) containing the numerator coefficients of the
+        retained rational terms
+    denominator: np.ndarray
+        array of shape (B, K, L) containing the (absolute) denominator
+        coefficients of the retained rational terms
+    blocks: np.ndarray
+        array of shape (B, 2) containing the indices (i, j) of each retained
+        rational term
+    polynomial: np.ndarray
+        array of shape (I, J) containing the coefficients of the polynomial
+        terms
+    transforms: list, optional
+        list of 4 strings which map the fit variables (chi_perp, chi_par, eta,
+        Mtot) onto X, Y, Z and V. Default is the identity map
+    """
+    def __init__(
+        self, numerator, denominator, blocks, polynomial, transforms=None
+    ):
+        super().__init__(numerator, denominator, transforms=transforms)
+        self.blocks = np.asarray(blocks, dtype=int).reshape(-1, 2)
+        self.polynomial = np.asarray(polynomial, dtype=float)
+        if len(self.blocks) != len(self.numerator):
+            raise ValueError(
+                "Please provide the indices of each retained rational term"
+            )
+        # the numerator and denominator are evaluated with a single matrix
+        # product over the flattened (k, l) powers
+        nblocks = len(self.blocks)
+        self._coefficients = np.concatenate([
+            self.numerator.reshape(nblocks, -1),
+            self.denominator.reshape(nblocks, -1)
+        ]).T
+
+    def log10_mismatch(self, chi_perp, chi_par, eta, Mtot):
+        """Evaluate the truncated fit
+
+        Parameters
+        ----------
+        chi_perp: np.ndarray
+            the perpendicular spin
+        chi_par: np.ndarray
+            the parallel spin
+        eta: np.ndarray
+            the symmetric mass ratio
+        Mtot: np.ndarray
+            the total mass
+
+        Returns
+        -------
+        log10_mismatch: np.ndarray
+            the log10 mismatch
+        """
+        X, Y, Z, V = [
+            np.atleast_1d(_) for _ in
+            self._fit_variables(chi_perp, chi_par, eta, Mtot)
+        ]
+        I, J = self.polynomial.shape
+        _, K, L = self.numerator.shape
+        Xp = X[:, None]**np.arange(I)
+        Yp = Y[:, None]**np.arange(J)
+        ZV = (
+            Z[:, None, None]**np.arange(K)[:, None] *
+            V[:, None, None]**np.arange(L)
+        ).reshape(len(Z), K * L)
+        N, D = np.split(ZV @ self._coefficients, 2, axis=1)
+        basis = Xp[:, self.blocks[:, 0]] * Yp[:, self.blocks[:, 1]]
+        return (
+            np.sum((Xp @ self.polynomial) * Yp, axis=1) +
+            np.sum(basis * N / D, axis=1)
+        )
+
+    def log10_mismatch_and_gradient(self, chi_perp, chi_par, eta, Mtot):
+        """Analytic derivatives are not available for truncated fits"""
+        raise NotImplementedError(
+            "Analytic derivatives are not available for truncated fits"
+        )
+
+
+def coefficient_filename(waveform_approximant):
+    """Return the path to the file containing the fitting coefficients for a
+    given waveform approximant
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        Name of waveform approximant
+    """
+    return os.path.join(
+        os.path.dirname(__file__),
+        f"NatureAstronomy.XXX.YYY.2025.{_IDENTIFIERS[waveform_approximant]}.txt"
+    )
+
+
+def load_interpolant(waveform_approximant):
+    """Return the compiled Pade-Pade interpolant for a given waveform
+    approximant. If the interpolant has been placed in shared memory (see
+    bilby_nr.interp.shared), the shared coefficients are used. Otherwise
+    the coefficient file is only read once per process
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        Name of waveform approximant
+    """
+    from .shared import shared_interpolants
+    interpolant = shared_interpolants.get(waveform_approximant)
+    if interpolant is None:
+        interpolant = _load_compiled_interpolant(waveform_approximant)
+    return interpolant
+
+
+def _load_compiled_interpolant(waveform_approximant):
+    """Return the compiled Pade-Pade interpolant for a given waveform
+    approximant from the interpolant bundle (see `use_bundle`) if one has
+    been loaded, otherwise from the coefficient file
+    """
+    if waveform_approximant in _bundled_interpolants:
+        return _bundled_interpolants[waveform_approximant]
+    return _load_interpolant_from_file(waveform_approximant)
+
+
+@lru_cache(maxsize=None)
+def _load_interpolant_from_file(waveform_approximant):
+    """Compile and return the Pade-Pade interpolant for a given waveform
+    approximant from file
+    """
+    return PadePadeInterpolant.from_file(
+        coefficient_filename(waveform_approximant)
+    )
+
+
+_bundled_interpolants = {}
+_bundled_truncated_interpolants = {}
+
+
+def save_bundle(filename, waveform_approximant_list=None, truncate=False):
+    """Compile the Pade-Pade interpolants for a list of waveform approximants
+    and store them in a single binary file. Loading the bundle with
+    `use_bundle` avoids parsing the coefficient files
+
+    Parameters
+    ----------
+    filename: str
+        name of the file to write. Should end with '.npz'
+    waveform_approximant_list: list, optional
+        list of waveform approximants to store. Approximants without an
+        interpolant are ignored. Default all approximants with an interpolant
+    truncate: bool, optional
+        if True, the interpolants are also truncated with the default
+        tolerance (see bilby_nr.interp.truncate.truncate_interpolant) and
+        the truncated coefficients are stored so that they do not need to
+        be recomputed in every process. Default False
+    """
+    import json
+    if waveform_approximant_list is None:
+        waveform_approximant_list = ALLOWED_MODELS
+    arrays = {}
+    for approximant in waveform_approximant_list:
+        if approximant not in ALLOWED_MODELS:
+            continue
+        interpolant = _load_interpolant_from_file(approximant)
+        arrays[f"{approximant}__numerator"] = interpolant.numerator
+        arrays[f"{approximant}__denominator"] = interpolant.denominator
+        arrays[f"{approximant}__transforms"] = np.array(interpolant.transforms)
+        if not truncate:
+            continue
+        from .truncate import DEFAULT_TOLERANCE, truncate_interpolant
+        truncated, report = truncate_interpolant(
+            interpolant, tolerance=DEFAULT_TOLERANCE
+        )
+        key = f"{approximant}__truncated"
+        arrays[f"{key}__numerator"] = truncated.numerator
+        arrays[f"{key}__denominator"] = truncated.denominator
+        arrays[f"{key}__blocks"] = truncated.blocks
+        arrays[f"{key}__polynomial"] = truncated.polynomial
+        arrays[f"{key}__report"] = np.array(json.dumps(report))
+    np.savez(filename, **arrays)
+    return filename
+
+
+def load_bundle(filename, truncated=False):
+    """Return the Pade-Pade interpolants stored in a bundle written by
+    `save_bundle`
+
+    Parameters
+    ----------
+    filename: str
+        name of the bundle
+    truncated: bool, optional
+        if True, return the truncated interpolants stored in the bundle
+        rather than the full interpolants. Default False
+
+    Returns
+    -------
+    interpolants: dict
+        dictionary of compiled interpolants keyed by waveform approximant.
+        If truncated is True, the dictionary is keyed by the waveform
+        approximant and tolerance and each value is a tuple containing the
+        truncated interpolant and the report returned by
+        bilby_nr.interp.truncate.truncate_interpolant
+    """
+    import json
+    with np.load(filename) as data:
+        approximants = sorted(
+            set(key.split("__")[0] for key in data.files)
+        )
+        transforms = {
+            approximant: [
+                str(_) for _ in data[f"{approximant}__transforms"]
+            ] for approximant in approximants
+        }
+        if not truncated:
+            return {
+                approximant: PadePadeInterpolant(
+                    data[f"{approximant}__numerator"],
+                    data[f"{approximant}__denominator"],
+                    transforms=transforms[approximant]
+                ) for approximant in approximants
+            }
+        interpolants = {}
+        for approximant in approximants:
+            key = f"{approximant}__truncated"
+            if f"{key}__report" not in data.files:
+                continue
+            report = json.loads(str(data[f"{key}__report"]))
+            interpolants[(approximant, report["tolerance"])] = (
+                TruncatedPadePadeInterpolant(
+                    data[f"{key}__numerator"], data[f"{key}__denominator"],
+                    data[f"{key}__blocks"], data[f"{key}__polynomial"],
+                    transforms=transforms[approximant]
+                ), report
+            )
+        return interpolants
+
+
+@lru_cache(maxsize=None)
+def use_bundle(filename):
+    """Load a bundle written by `save_bundle` and use it, rather than the
+    coefficient files, when compiling interpolants in this process. Truncated
+    interpolants stored in the bundle are used rather than truncating the
+    interpolants in this process. The bundle is only read once per process.
+    If the bundle does not exist, a warning is logged and the coefficient
+    files are used
+
+    Parameters
+    ----------
+    filename: str
+        name of the bundle
+    """
+    from bilby.core.utils import logger
+    if not os.path.isfile(filename):
+        logger.warning(
+            f"Unable to find the interpolant bundle {filename}. Interpolants "
+            f"will be compiled from the coefficient files"
+        )
+        return
+    _bundled_interpolants.update(load_bundle(filename))
+    _bundled_truncated_interpolants.update(
+        load_bundle(filename, truncated=True)
+    )
+
+
+def _check_and_load(waveform_approximant, mass_1, mass_2):
+    """Check the inputs to the interpolant and return the compiled
+    interpolant
+    """
+    _check_inputs(waveform_approximant, mass_1, mass_2)
+    return load_interpolant(waveform_approximant)
+
+
+def _check_inputs(waveform_approximant, mass_1, mass_2):
+    """Check the inputs to the interpolant"""
+    if waveform_approximant not in ALLOWED_MODELS:
         raise ValueError(
             f"Unable to evaluate interpolant for waveform model "
             f"{waveform_approximant}. Please provide either 'IMRPhenomXPHMST', "
             f"'IMRPhenomTPHM' or 'SEOBNRv5PHM'."
         )
-    if mass_1 < mass_2:
+    if np.any(np.asarray(mass_1) < np.asarray(mass_2)):
         raise ValueError(
             "Secondary mass must be smaller than the primary mass of the binary"
         )
 
+
+def _evaluate(
+    waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2,
+    interpolant=None
+):
+    """Evaluate the log10 mismatch interpolant for scalar or array inputs. If
+    a compiled interpolant is not provided, the full fit for the given
+    waveform approximant is used
+    """
+    if interpolant is None:
+        interpolant = _check_and_load(waveform_approximant, mass_1, mass_2)
+    else:
+        _check_inputs(waveform_approximant, mass_1, mass_2)
+    scalar = np.ndim(mass_1) == 0
+    mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2 = [
+        np.atleast_1d(np.asarray(_, dtype=float)) for _ in
+        [mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2]
+    ]
     Mtot = mass_1 + mass_2
     eta = component_masses_to_symmetric_mass_ratio(mass_1, mass_2)
-    # interpolant uses f_ref = 10.70629431812844 Hz. We use the same
-    # reference frequency here
-    chi_par, chi_perp = chi_par_chi_perp_from_mass_spin(
-        mass_1, mass_2, a_1, tilt_1, a_2, tilt_2, phi_12, phi_jl, theta_jn,
-        phase, 10.70629431812844
+    # chi_perp is independent of the reference frequency (the interpolant
+    # uses f_ref = 10.70629431812844 Hz), phi_jl, theta_jn and phase
+    _chi_par = chi_par(mass_1, mass_2, a_1, tilt_1, a_2, tilt_2)
+    _chi_perp = chi_perp_from_tilts(
+        mass_1, mass_2, a_1, tilt_1, a_2, tilt_2, phi_12
     )
-    # Read in file containing fitting coefficients
-    if waveform_approximant == "IMRPhenomXPHMST":
-        identifier = "XPHMST"
-    elif waveform_approximant == "IMRPhenomTPHM":
-        identifier = "TPHM"
-    else:
-        identifier = "SEOB"
-
-    filename = os.path.join(
-        os.path.dirname(__file__),
-        f"NatureAstronomy.XXX.YYY.2025.{identifier}.txt"
-    )
-        
-    with open(filename, "r") as f:
-        lines = f.readlines()
-        lines = [l.strip() for l in lines]
-        original_variables = lines[1].split("\t")
-        changed_variables = lines[2].split("\t")
-
-    # Evaluate the fitting co-efficients and return the mismatch
-    fit_coeffs = np.genfromtxt(filename, skip_header=3, names=True)
-    Sqrt = np.sqrt
-    x, y, z, v = original_variables[:4]
-    X, Y, Z, V = changed_variables[2:6]
-
-    for var in [x, y, z, v]:
-        X = X.replace(var.split("=")[0], f"({var.split('=')[1]})")
-        Y = Y.replace(var.split("=")[0], f"({var.split('=')[1]})")
-        Z = Z.replace(var.split("=")[0], f"({var.split('=')[1]})")
-        V = V.replace(var.split("=")[0], f"({var.split('=')[1]})")
-
-    X = eval(X.split("=")[1])
-    Y = eval(Y.split("=")[1])
-    Z = eval(Z.split("=")[1])
-    V = eval(V.split("=")[1])
-
-    log10_mismatch = np.sum([
-        (X)**(i) * (Y)**(j) * np.sum([
-            Cijkl(i, j, k, l, fit_coeffs) * (Z)**(k) * (V)**(l)
-            for l in np.arange(0, np.max(fit_coeffs["l"]) - 1)
-            for k in np.arange(0, np.max(fit_coeffs["k"]) + 1)
-        ]) / np.sum([
-            np.abs(Cijkl(i, j, k, l + 2, fit_coeffs)) * (Z)**(k) * (V)**(l)
-            for l in np.arange(0, np.max(fit_coeffs["l"]) - 1)
-            for k in np.arange(0, np.max(fit_coeffs["k"]) + 1)
-        ])
-        for j in np.arange(0, np.max(fit_coeffs["j"]) + 1)
-        for i in np.arange(0, np.max(fit_coeffs["i"]) + 1)
-    ])
-    mismatch = 10**log10_mismatch
-    return mismatch
+    log10_mismatch = interpolant.log10_mismatch(_chi_perp, _chi_par, eta, Mtot)
+    if scalar:
+        return float(log10_mismatch[0])
+    return log10_mismatch
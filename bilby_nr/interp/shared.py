@@ -0,0 +1,185 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import atexit
+import json
+import os
+import numpy as np
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+_ENVIRONMENT_VARIABLE = "BILBY_NR_SHARED_INTERPOLANTS"
+
+
+class SharedInterpolants(object):
+    """Class to store the compiled interpolant coefficients for several
+    waveform approximants in a single shared memory segment. The segment is
+    created once in the parent process by calling `share` and pool workers
+    attach to it without copying the coefficients, either through the
+    `initializer` function or lazily through the
+    BILBY_NR_SHARED_INTERPOLANTS environment variable which is inherited by
+    forked and spawned workers
+    """
+    def __init__(self):
+        self._interpolants = None
+        self._shared_memory = None
+        self._owner = None
+
+    @property
+    def interpolants(self):
+        """Dictionary of interpolants that are stored in shared memory"""
+        if self._interpolants is None:
+            spec = os.environ.get(_ENVIRONMENT_VARIABLE, None)
+            if spec is not None:
+                self.attach(spec)
+            else:
+                self._interpolants = {}
+        return self._interpolants
+
+    def get(self, waveform_approximant):
+        """Return the shared interpolant for a given waveform approximant.
+        None is returned if the interpolant is not in shared memory
+
+        Parameters
+        ----------
+        waveform_approximant: str
+            Name of waveform approximant
+        """
+        return self.interpolants.get(waveform_approximant, None)
+
+    def share(self, waveform_approximant_list=None):
+        """Compile the interpolants for a list of waveform approximants and
+        copy their coefficients into shared memory. This must be called in
+        the parent process before the pool is created
+
+        Parameters
+        ----------
+        waveform_approximant_list: list, optional
+            list of waveform approximants to share. Approximants without an
+            interpolant are ignored. Default all approximants with an
+            interpolant
+
+        Returns
+        -------
+        spec: str
+            specification of the shared memory segment which can be passed
+            to `initializer`
+        """
+        from .pade_pade import ALLOWED_MODELS, _load_compiled_interpolant
+        from ..utils import create_shared_memory
+        if self._shared_memory is not None:
+            self.unshare()
+        if waveform_approximant_list is None:
+            waveform_approximant_list = ALLOWED_MODELS
+        compiled = {
+            approximant: _load_compiled_interpolant(approximant) for
+            approximant in waveform_approximant_list if approximant in
+            ALLOWED_MODELS
+        }
+        layout, offset = {}, 0
+        for approximant, interpolant in compiled.items():
+            layout[approximant] = {
+                "shape": list(interpolant.numerator.shape), "offset": offset,
+                "transforms": interpolant.transforms,
+            }
+            offset += 2 * interpolant.numerator.nbytes
+        self._shared_memory = create_shared_memory(offset)
+        self._owner = os.getpid()
+        for approximant, interpolant in compiled.items():
+            numerator, denominator = self._views(layout[approximant])
+            numerator[:] = interpolant.numerator
+            denominator[:] = interpolant.denominator
+        spec = json.dumps(
+            {"name": self._shared_memory.name, "interpolants": layout}
+        )
+        os.environ[_ENVIRONMENT_VARIABLE] = spec
+        self._attach_views(layout)
+        atexit.register(self.unshare)
+        return spec
+
+    def _views(self, entry):
+        """Return the numerator and denominator arrays stored in shared
+        memory for a given entry in the layout
+        """
+        shape = tuple(entry["shape"])
+        size = int(np.prod(shape))
+        numerator = np.ndarray(
+            shape, dtype=np.float64, buffer=self._shared_memory.buf,
+            offset=entry["offset"]
+        )
+        denominator = np.ndarray(
+            shape, dtype=np.float64, buffer=self._shared_memory.buf,
+            offset=entry["offset"] + size * 8
+        )
+        return numerator, denominator
+
+    def _attach_views(self, layout):
+        """Construct read-only interpolants which view the shared memory"""
+        from .pade_pade import PadePadeInterpolant
+        self._interpolants = {}
+        for approximant, entry in layout.items():
+            numerator, denominator = self._views(entry)
+            numerator.flags.writeable = False
+            denominator.flags.writeable = False
+            self._interpolants[approximant] = PadePadeInterpolant(
+                numerator, denominator, transforms=entry["transforms"]
+            )
+
+    def attach(self, spec):
+        """Attach to interpolants that have been shared by another process
+
+        Parameters
+        ----------
+        spec: str
+            specification of the shared interpolants, as returned by `share`
+            and stored in the BILBY_NR_SHARED_INTERPOLANTS environment
+            variable
+        """
+        from ..utils import attach_shared_memory
+        spec = json.loads(spec)
+        if self._shared_memory is not None:
+            if self._shared_memory.name == spec["name"]:
+                return
+            self.unshare()
+        self._shared_memory = attach_shared_memory(spec["name"])
+        self._owner = None
+        self._attach_views(spec["interpolants"])
+
+    def unshare(self):
+        """Release the shared memory segment. The segment is only unlinked
+        by the process that created it. Interpolants that are subsequently
+        requested are read from file
+        """
+        if self._shared_memory is None:
+            return
+        # views must be released before the segment can be closed
+        self._interpolants = {}
+        try:
+            self._shared_memory.close()
+        except BufferError:
+            # arrays viewing the segment are still referenced elsewhere.
+            # The mapping is released when they are garbage collected
+            pass
+        if self._owner == os.getpid():
+            self._shared_memory.unlink()
+            os.environ.pop(_ENVIRONMENT_VARIABLE, None)
+        self._shared_memory = None
+        self._owner = None
+
+
+def initializer(spec=None):
+    """Pool initializer which attaches the worker to the shared interpolants
+
+    Parameters
+    ----------
+    spec: str, optional
+        specification of the shared interpolants, as returned by
+        `SharedInterpolants.share`. Default read from the
+        BILBY_NR_SHARED_INTERPOLANTS environment variable
+    """
+    if spec is None:
+        spec = os.environ.get(_ENVIRONMENT_VARIABLE, None)
+    if spec is not None:
+        shared_interpolants.attach(spec)
+
+
+shared_interpolants = SharedInterpolants()
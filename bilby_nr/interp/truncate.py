@@ -0,0 +1,309 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import time
+from functools import lru_cache
+import numpy as np
+from bilby.core.utils import logger
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+DEFAULT_TOLERANCE = 0.01
+
+
+def validation_samples(nsamples=100000, seed=1234):
+    """Draw a dense set of samples from the domain of the Pade-Pade fits and
+    return the fit variables. Primary masses are drawn uniformly between
+    30 and 150, mass ratios uniformly between 0.25 and 1 and spins are
+    isotropic with magnitudes below 0.99
+
+    Parameters
+    ----------
+    nsamples: int, optional
+        number of samples to draw. Default 100000
+    seed: int, optional
+        seed for the random number generator. Default 1234
+
+    Returns
+    -------
+    samples: list
+        list containing arrays of chi_perp, chi_par, eta and Mtot
+    """
+    from bilby.gw.conversion import component_masses_to_symmetric_mass_ratio
+    from ..conversion import chi_par, chi_perp_from_tilts
+    from .pade_pade import FIT_DOMAIN
+    rng = np.random.default_rng(seed)
+    mass_1 = rng.uniform(*FIT_DOMAIN["mass_1"], nsamples)
+    mass_2 = mass_1 * rng.uniform(*FIT_DOMAIN["mass_ratio"], nsamples)
+    a_1, a_2 = rng.uniform(*FIT_DOMAIN["a_1"], (2, nsamples))
+    tilt_1, tilt_2 = np.arccos(rng.uniform(-1, 1, (2, nsamples)))
+    phi_12 = rng.uniform(0, 2 * np.pi, nsamples)
+    return [
+        chi_perp_from_tilts(mass_1, mass_2, a_1, tilt_1, a_2, tilt_2, phi_12),
+        chi_par(mass_1, mass_2, a_1, tilt_1, a_2, tilt_2),
+        component_masses_to_symmetric_mass_ratio(mass_1, mass_2),
+        mass_1 + mass_2,
+    ]
+
+
+def truncate_interpolant(
+    interpolant, tolerance=DEFAULT_TOLERANCE, nsamples=100000, seed=1234
+):
+    """Produce a reduced-order Pade-Pade interpolant by dropping or merging
+    rational terms which have little impact over the domain of the fit. Each
+    term X^i Y^j N_ij / D_ij is (in order of increasing impact) either
+    removed, replaced by the constant which best approximates N_ij / D_ij
+    over the validation set, or retained. A term is only removed or merged
+    if the maximum difference in log10 mismatch between the truncated and
+    full interpolant over a dense validation set remains below the
+    tolerance. The truncated interpolant is then checked against an
+    independent set of samples. If the error over the independent samples
+    still exceeds the tolerance after 10 attempts with successively smaller
+    working tolerances, all terms are retained, i.e. the untruncated fit is
+    returned
+
+    Parameters
+    ----------
+    interpolant: bilby_nr.interp.pade_pade.PadePadeInterpolant
+        the full interpolant to truncate
+    tolerance: float, optional
+        maximum allowed difference in log10 mismatch. Default 0.01
+    nsamples: int, optional
+        number of samples in the validation set. Default 100000
+    seed: int, optional
+        seed used to draw the validation set. The independent check uses
+        seed + 1. Default 1234
+
+    Returns
+    -------
+    truncated: bilby_nr.interp.pade_pade.TruncatedPadePadeInterpolant
+        the truncated interpolant
+    report: dict
+        dictionary containing the number of retained, merged and dropped
+        terms, the number of coefficients, the worst-case error over the
+        validation set and the independent set and the speed-up
+    """
+    from .pade_pade import TruncatedPadePadeInterpolant
+    samples = validation_samples(nsamples=nsamples, seed=seed)
+    X, Y, Z, V = interpolant._fit_variables(*samples)
+    I, J, K, L = interpolant.numerator.shape
+    Xp = X[:, None]**np.arange(I)
+    Yp = Y[:, None]**np.arange(J)
+    Zp = Z[:, None]**np.arange(K)
+    Vp = V[:, None]**np.arange(L)
+    ratio = (
+        np.einsum("nk,nl,ijkl->nij", Zp, Vp, interpolant.numerator) /
+        np.einsum("nk,nl,ijkl->nij", Zp, Vp, interpolant.denominator)
+    )
+    basis = Xp[:, :, None] * Yp[:, None, :]
+    # least squares estimate of the constant which best replaces each ratio
+    constants = (
+        np.sum(basis**2 * ratio, axis=0) /
+        np.maximum(np.sum(basis**2, axis=0), np.finfo(float).tiny)
+    )
+    drop_errors = -basis * ratio
+    merge_errors = basis * (constants - ratio)
+    impact = np.minimum(
+        np.max(np.abs(drop_errors), axis=0),
+        np.max(np.abs(merge_errors), axis=0)
+    )
+    full = interpolant.log10_mismatch(*samples)
+    holdout = validation_samples(nsamples=nsamples, seed=seed + 1)
+    holdout_full = interpolant.log10_mismatch(*holdout)
+    # the truncation is repeated with a smaller working tolerance if the
+    # error over the independent samples exceeds the requested tolerance
+    working_tolerance = tolerance
+    for attempt in range(11):
+        if attempt < 10:
+            status = _select_terms(
+                drop_errors, merge_errors, impact, working_tolerance
+            )
+        else:
+            logger.warning(
+                f"Unable to truncate the Pade-Pade interpolant while keeping "
+                f"the error below a tolerance of {tolerance:.2e}. Using the "
+                f"untruncated fit"
+            )
+            status = np.full(impact.shape, "retained", dtype=object)
+        blocks = np.argwhere(status == "retained")
+        polynomial = np.where(status == "merged", constants, 0.)
+        truncated = TruncatedPadePadeInterpolant(
+            interpolant.numerator[blocks[:, 0], blocks[:, 1]],
+            interpolant.denominator[blocks[:, 0], blocks[:, 1]],
+            blocks, polynomial, transforms=interpolant.transforms
+        )
+        holdout_error = float(np.max(np.abs(
+            truncated.log10_mismatch(*holdout) - holdout_full
+        )))
+        if holdout_error <= tolerance:
+            break
+        working_tolerance /= 2.
+
+    report = {
+        "tolerance": tolerance,
+        "retained": int(np.sum(status == "retained")),
+        "merged": int(np.sum(status == "merged")),
+        "dropped": int(np.sum(status == "dropped")),
+        "coefficients": [
+            int(2 * interpolant.numerator.size),
+            int(2 * truncated.numerator.size + np.sum(polynomial != 0)),
+        ],
+        "max_error": float(
+            np.max(np.abs(truncated.log10_mismatch(*samples) - full))
+        ),
+        "holdout_max_error": holdout_error,
+        "speedup": _time(interpolant, samples) / _time(truncated, samples),
+    }
+    return truncated, report
+
+
+def _select_terms(drop_errors, merge_errors, impact, tolerance):
+    """Greedily decide whether each rational term should be dropped, merged
+    into a constant or retained, in order of increasing impact
+
+    Parameters
+    ----------
+    drop_errors: np.ndarray
+        array of shape (n, I, J) containing the change in log10 mismatch
+        for each sample if each term is dropped
+    merge_errors: np.ndarray
+        array of shape (n, I, J) containing the change in log10 mismatch
+        for each sample if each term is replaced by a constant
+    impact: np.ndarray
+        array of shape (I, J) used to order the terms
+    tolerance: float
+        maximum allowed difference in log10 mismatch
+
+    Returns
+    -------
+    status: np.ndarray
+        array of shape (I, J) containing either 'dropped', 'merged' or
+        'retained' for each term
+    """
+    error = np.zeros(len(drop_errors))
+    status = np.full(impact.shape, "retained", dtype=object)
+    for flat in np.argsort(impact, axis=None):
+        i, j = np.unravel_index(flat, impact.shape)
+        options = [
+            (np.max(np.abs(error + drop_errors[:, i, j])), "dropped"),
+            (np.max(np.abs(error + merge_errors[:, i, j])), "merged"),
+        ]
+        worst, option = min(options)
+        if worst <= tolerance:
+            status[i, j] = option
+            error += (
+                drop_errors if option == "dropped" else merge_errors
+            )[:, i, j]
+    return status
+
+
+def format_report(report):
+    """Return a human readable summary of a truncation report
+
+    Parameters
+    ----------
+    report: dict
+        report returned by `truncate_interpolant`
+    """
+    return (
+        f"Truncated Pade-Pade interpolant: retained {report['retained']}, "
+        f"merged {report['merged']} and dropped {report['dropped']} terms "
+        f"({report['coefficients'][0]} -> {report['coefficients'][1]} "
+        f"coefficients). Worst-case error in log10 mismatch: "
+        f"{report['max_error']:.2e} (validation), "
+        f"{report['holdout_max_error']:.2e} (independent) for a tolerance "
+        f"of {report['tolerance']:.2e}. Speed-up: {report['speedup']:.2f}x"
+    )
+
+
+def _time(interpolant, samples, repeats=3):
+    """Return the minimum time taken to evaluate an interpolant for a set of
+    samples
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        interpolant.log10_mismatch(*samples)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@lru_cache(maxsize=None)
+def load_truncated_interpolant(
+    waveform_approximant, tolerance=DEFAULT_TOLERANCE
+):
+    """Return the truncated Pade-Pade interpolant for a given waveform
+    approximant. If the truncated interpolant is stored in the interpolant
+    bundle (see bilby_nr.interp.pade_pade.save_bundle), the stored
+    coefficients are used. Otherwise the interpolant is truncated, which is
+    only done once per process
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        Name of waveform approximant
+    tolerance: float, optional
+        maximum allowed difference in log10 mismatch. Default 0.01
+    """
+    from .pade_pade import _bundled_truncated_interpolants, load_interpolant
+    bundled = _bundled_truncated_interpolants.get(
+        (waveform_approximant, float(tolerance))
+    )
+    if bundled is not None:
+        truncated, report = bundled
+    else:
+        truncated, report = truncate_interpolant(
+            load_interpolant(waveform_approximant), tolerance=tolerance
+        )
+    logger.info(f"{waveform_approximant}: {format_report(report)}")
+    return truncated
+
+
+def match_interpolant(
+    waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2,
+    phi_jl, theta_jn, phase, tolerance=DEFAULT_TOLERANCE
+):
+    """Evaluate the truncated match interpolant. See
+    bilby_nr.interp.pade_pade.match_interpolant
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        Name of waveform approximant you wish to evaluate the interpolant for
+    mass_1: float, np.ndarray
+        Detector-frame primary mass of the binary black hole
+    mass_2: float, np.ndarray
+        Detector-frame secondary mass of the binary black hole
+    a_1: float, np.ndarray
+        Magnitude of the primary spin
+    tilt_1: float, np.ndarray
+        Polar angle of the primary spin
+    phi_12: float, np.ndarray
+        Azimuthal angle between the primary spin and secondary spin vector
+    a_2: float, np.ndarray
+        Magnitude of the secondary spin
+    tilt_2: float, np.ndarray
+        Polar angle of the secondary spin
+    phi_jl: float, np.ndarray
+        Azimuthal angle between the total and orbital angular momentum
+    theta_jn: float, np.ndarray
+        Inclination angle of the binary
+    phase: float, np.ndarray
+        The phase of the binary black hole
+    tolerance: float, optional
+        maximum allowed difference in log10 mismatch from the full
+        interpolant. Default 0.01
+
+    Returns
+    -------
+    match: float, np.ndarray
+        An approximate match for a given model
+    """
+    from .pade_pade import _check_inputs, _evaluate
+    _check_inputs(waveform_approximant, mass_1, mass_2)
+    log10_mismatch = _evaluate(
+        waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2,
+        tilt_2, interpolant=load_truncated_interpolant(
+            waveform_approximant, tolerance=tolerance
+        )
+    )
+    return 1 - 10**log10_mismatch
@@ -1,6 +1,7 @@
 # Licensed under an MIT style license -- see LICENSE.md
 
 import numpy as np
+from .instrumentation import instrumentation
 
 __author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
 
@@ -67,20 +68,88 @@ def match_from_pade_pade_interpolant(
     """
     from .interp.pade_pade import match_interpolant
     if isinstance(mass_1, (np.ndarray, list)):
-        matches = np.zeros(len(mass_1))
-        for ii in range(len(mass_1)):
-            matches[ii] = match_interpolant(
-                waveform_approximant, mass_1[ii], mass_2[ii], a_1[ii],
-                tilt_1[ii], phi_12[ii], a_2[ii], tilt_2[ii], phi_jl[ii],
-                theta_jn[ii], phase[ii]
-            )
+        args = [
+            np.asarray(_, dtype=float) for _ in
+            [mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2, phi_jl,
+             theta_jn, phase]
+        ]
+        _timer = instrumentation.timer(
+            "pade_pade", approximant=waveform_approximant
+        )
+        with _timer:
+            matches = match_interpolant(waveform_approximant, *args)
+        instrumentation.increment(
+            "pade_pade_samples", approximant=waveform_approximant,
+            value=len(mass_1)
+        )
         return matches
-    return match_interpolant(
-        waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2,
-        tilt_2, phi_jl, theta_jn, phase
+    with instrumentation.timer("pade_pade", approximant=waveform_approximant):
+        match = match_interpolant(
+            waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2,
+            tilt_2, phi_jl, theta_jn, phase
+        )
+    instrumentation.increment(
+        "pade_pade_samples", approximant=waveform_approximant
+    )
+    return match
+
+
+def match_from_truncated_pade_pade_interpolant(
+    waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2,
+    phi_jl, theta_jn, phase,
+):
+    """Return an estimate for the match based on a truncated Pade-Pade fit.
+    Terms in the Pade-Pade fit which have little impact over the domain of
+    the fit are dropped or replaced by constants such that the log10
+    mismatch differs from the full fit by less than 0.01, see
+    bilby_nr.interp.truncate.truncate_interpolant
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        The waveform approximant to use
+    mass_1: float, np.ndarray
+        The mass of the primary black hole
+    mass_2: float, np.ndarray
+        The mass of the secondary black hole
+    a_1: float, np.ndarray
+        The dimensionless spin magnitude of the primary black hole
+    tilt_1: float, np.ndarray
+        The tilt angle of the primary black hole spin
+    phi_12: float, np.ndarray
+        The difference in azimuthal angle between the two spins
+    a_2: float, np.ndarray
+        The dimensionless spin magnitude of the secondary black hole
+    tilt_2: float, np.ndarray
+        The tilt angle of the secondary black hole spin
+    phi_jl: float, np.ndarray
+        The azimuthal angle of the total angular momentum
+    theta_jn: float, np.ndarray
+        The angle between the total angular momentum and the line of sight
+    phase: float, np.ndarray
+        The phase of the gravitational wave
+
+    Returns
+    -------
+    match: float, np.ndarray
+        The estimated match
+    """
+    from .interp.truncate import match_interpolant
+    with instrumentation.timer(
+        "pade_pade_fast", approximant=waveform_approximant
+    ):
+        match = match_interpolant(
+            waveform_approximant, mass_1, mass_2, a_1, tilt_1, phi_12, a_2,
+            tilt_2, phi_jl, theta_jn, phase
+        )
+    instrumentation.increment(
+        "pade_pade_fast_samples", approximant=waveform_approximant,
+        value=np.size(mass_1)
     )
+    return match
 
 
 interpolant_map = {
     "pade_pade": match_from_pade_pade_interpolant,
+    "pade_pade_fast": match_from_truncated_pade_pade_interpolant,
 }
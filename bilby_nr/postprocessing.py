@@ -0,0 +1,506 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import os
+import time
+import numpy as np
+from bilby.core.utils import logger
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+
+def generate_all_bbh_parameters_in_chunks(
+    filename, outfile, likelihood=None, priors=None, chunk_size=10000,
+    npool=1, checkpoint_interval=None, checkpoint_time=None, resume=True,
+    concurrent=False, max_workers=None
+):
+    """Generate all BBH parameters for a (potentially very large) posterior
+    stored in a bilby HDF5 result file. Samples are read in chunks, each
+    sample is attributed to the waveform approximant that evaluated its
+    likelihood, derived parameters are generated for each chunk and the
+    output is appended to a new HDF5 result file. Peak memory usage is
+    therefore bounded by the chunk size rather than the size of the
+    posterior.
+
+    The number of completed samples is periodically checkpointed in the
+    output file. If the output file already exists and `resume` is True,
+    post-processing resumes from the last checkpoint
+
+    Parameters
+    ----------
+    filename: str
+        path to the bilby HDF5 result file to read
+    outfile: str
+        path to the bilby HDF5 result file to write. All entries other than
+        the posterior are copied from `filename`
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling, used for model
+        attribution, waveform and likelihood.interferometers.
+    priors: dict, optional
+        Dictionary of prior objects, used to fill in non-sampled parameters.
+    chunk_size: int, optional
+        number of samples to process at once. Default 10000
+    npool: int, optional
+        Number of processes to use for the conversion. Default 1
+    checkpoint_interval: int, optional
+        minimum number of samples to process between checkpoints. Default
+        None
+    checkpoint_time: float, optional
+        minimum time in seconds between checkpoints. Default None. If
+        neither checkpoint_interval nor checkpoint_time are provided, a
+        checkpoint is written after every chunk
+    resume: bool, optional
+        if True, resume from the checkpoint stored in `outfile` (if it
+        exists). Default True
+    concurrent: bool, optional
+        if True, evaluate the likelihood for all waveform approximants
+        concurrently when attributing each sample to a waveform
+        approximant. A single executor is used for all samples, see
+        bilby_nr.conversion.attribution_executor. Default False
+    max_workers: int, optional
+        maximum number of workers to use when concurrent=True. Default the
+        number of waveform approximants
+    """
+    import h5py
+    with h5py.File(filename, "r") as f:
+        posterior = f["posterior"]
+        columns = list(posterior.keys())
+        nsamples = len(posterior[columns[0]])
+        completed = _read_checkpoint(outfile, nsamples) if resume else 0
+        if completed == nsamples:
+            logger.info(
+                f"All samples have already been processed in {outfile}"
+            )
+            return
+        mode = "a" if completed else "w"
+        with h5py.File(outfile, mode) as g:
+            if not completed:
+                for key in f.keys():
+                    if key != "posterior":
+                        f.copy(f[key], g, name=key)
+                output = g.create_group("posterior")
+                output.attrs["bilby_nr_nsamples"] = nsamples
+            else:
+                logger.info(
+                    f"Resuming from checkpoint: {completed}/{nsamples} "
+                    f"samples have already been processed"
+                )
+                output = g["posterior"]
+                # remove any samples written after the last checkpoint
+                for dataset in output.values():
+                    dataset.resize((completed,))
+            last_checkpoint, last_time = completed, time.monotonic()
+            with _executor(likelihood, concurrent, max_workers) as executor:
+                for start in range(completed, nsamples, chunk_size):
+                    stop = min(start + chunk_size, nsamples)
+                    chunk = _read_chunk(posterior, columns, start, stop)
+                    chunk = _generate_all_bbh_parameters_for_chunk(
+                        chunk, likelihood=likelihood, priors=priors,
+                        npool=npool, executor=executor
+                    )
+                    _append_chunk(output, chunk, start)
+                    if _checkpoint_due(
+                        stop, nsamples, last_checkpoint, last_time,
+                        checkpoint_interval, checkpoint_time
+                    ):
+                        output.attrs["bilby_nr_completed"] = stop
+                        g.flush()
+                        last_checkpoint, last_time = stop, time.monotonic()
+                        logger.info(
+                            f"Generated parameters for {stop}/{nsamples} "
+                            f"samples"
+                        )
+
+
+def generate_all_cbc_parameters_with_checkpoint(
+    sample, checkpoint_file, defaults=None, base_conversion=None,
+    likelihood=None, priors=None, npool=1, chunk_size=1000,
+    checkpoint_interval=None, checkpoint_time=None, concurrent=False,
+    max_workers=None
+):
+    """Generate all CBC parameters for an in-memory posterior, e.g. the
+    posterior passed to the bilby conversion function at the end of
+    sampling, while periodically checkpointing the completed samples. Each
+    sample is attributed to the waveform approximant that evaluated its
+    likelihood. Converted samples are appended to `checkpoint_file` in
+    chunks, along with the number of completed samples. If the conversion
+    is interrupted, it resumes from the last checkpoint the next time it is
+    called with the same posterior. The checkpoint file is removed once all
+    samples have been converted
+
+    Parameters
+    ----------
+    sample: pandas.DataFrame
+        Samples to fill in with extra parameters
+    checkpoint_file: str
+        path to the HDF5 file used to store the converted samples
+    defaults: dict, optional
+        default waveform arguments. Default the defaults used by
+        bilby.gw.conversion.generate_all_bbh_parameters
+    base_conversion: func, optional
+        function to convert the samples to the parameters required by the
+        source model. Default
+        bilby.gw.conversion.convert_to_lal_binary_black_hole_parameters
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling, used for model
+        attribution, waveform and likelihood.interferometers.
+    priors: dict, optional
+        Dictionary of prior objects, used to fill in non-sampled parameters.
+    npool: int, optional
+        Number of processes to use for the conversion. Default 1
+    chunk_size: int, optional
+        number of samples to convert at once. Default 1000
+    checkpoint_interval: int, optional
+        minimum number of samples to process between checkpoints. Default
+        None
+    checkpoint_time: float, optional
+        minimum time in seconds between checkpoints. Default None. If
+        neither checkpoint_interval nor checkpoint_time are provided, a
+        checkpoint is written after every chunk
+    concurrent: bool, optional
+        if True, evaluate the likelihood for all waveform approximants
+        concurrently when attributing each sample to a waveform
+        approximant. Default False
+    max_workers: int, optional
+        maximum number of workers to use when concurrent=True. Default the
+        number of waveform approximants
+
+    Returns
+    -------
+    sample: pandas.DataFrame
+        the converted samples
+    """
+    import h5py
+    nsamples = len(sample)
+    fingerprint = _fingerprint(sample)
+    completed = _read_checkpoint(checkpoint_file, nsamples, fingerprint)
+    with h5py.File(checkpoint_file, "a" if completed else "w") as g:
+        if not completed:
+            output = g.create_group("posterior", track_order=True)
+            output.attrs["bilby_nr_nsamples"] = nsamples
+            output.attrs["bilby_nr_fingerprint"] = fingerprint
+        else:
+            logger.info(
+                f"Resuming conversion from checkpoint: {completed}/{nsamples} "
+                f"samples have already been converted"
+            )
+            output = g["posterior"]
+            # remove any samples written after the last checkpoint
+            for dataset in output.values():
+                dataset.resize((completed,))
+        last_checkpoint, last_time = completed, time.monotonic()
+        with _executor(likelihood, concurrent, max_workers) as executor:
+            for start in range(completed, nsamples, chunk_size):
+                stop = min(start + chunk_size, nsamples)
+                chunk = _generate_all_bbh_parameters_for_chunk(
+                    sample.iloc[start:stop].copy(), likelihood=likelihood,
+                    priors=priors, npool=npool, executor=executor,
+                    defaults=defaults, base_conversion=base_conversion
+                )
+                chunk.index = np.arange(start, stop)
+                _append_chunk(output, chunk, start)
+                if _checkpoint_due(
+                    stop, nsamples, last_checkpoint, last_time,
+                    checkpoint_interval, checkpoint_time
+                ):
+                    output.attrs["bilby_nr_completed"] = stop
+                    g.flush()
+                    last_checkpoint, last_time = stop, time.monotonic()
+                    logger.info(
+                        f"Generated parameters for {stop}/{nsamples} samples"
+                    )
+        converted = _read_chunk(output, list(output.keys()), 0, nsamples)
+    converted.index = sample.index
+    os.remove(checkpoint_file)
+    return converted
+
+
+def _checkpoint_due(stop, nsamples, last_checkpoint, last_time,
+                    checkpoint_interval=None, checkpoint_time=None):
+    """Return True if a checkpoint should be written after processing
+    `stop` samples
+
+    Parameters
+    ----------
+    stop: int
+        number of samples that have been processed
+    nsamples: int
+        total number of samples
+    last_checkpoint: int
+        number of samples that had been processed at the last checkpoint
+    last_time: float
+        time.monotonic() at the last checkpoint
+    checkpoint_interval: int, optional
+        minimum number of samples to process between checkpoints
+    checkpoint_time: float, optional
+        minimum time in seconds between checkpoints. If neither
+        checkpoint_interval nor checkpoint_time are provided, a checkpoint
+        is always due
+    """
+    return (
+        stop == nsamples or (
+            checkpoint_interval is None and checkpoint_time is None
+        ) or (
+            checkpoint_interval is not None and
+            stop - last_checkpoint >= checkpoint_interval
+        ) or (
+            checkpoint_time is not None and
+            time.monotonic() - last_time >= checkpoint_time
+        )
+    )
+
+
+def _fingerprint(sample):
+    """Return a hash of the numeric columns of a posterior. This is used to
+    check that a checkpoint was produced from the same posterior
+
+    Parameters
+    ----------
+    sample: pandas.DataFrame
+        the posterior
+    """
+    import hashlib
+    import pandas as pd
+    numeric = sample.select_dtypes(include=[np.number])
+    hashed = pd.util.hash_pandas_object(numeric, index=False).values
+    return hashlib.sha256(
+        np.ascontiguousarray(hashed).tobytes() +
+        ",".join(numeric.columns).encode()
+    ).hexdigest()
+
+
+def _executor(likelihood, concurrent=False, max_workers=None):
+    """Return a context manager providing the executor used to attribute
+    samples to a waveform approximant, or None if the likelihood evaluations
+    should not be run concurrently
+
+    Parameters
+    ----------
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient
+        GravitationalWaveTransient used for sampling
+    concurrent: bool, optional
+        if True, create an executor. Default False
+    max_workers: int, optional
+        maximum number of workers. Default the number of waveform
+        approximants
+    """
+    from .conversion import attribution_executor
+    waveform_approximant_list = []
+    if likelihood is not None:
+        waveform_approximant_list = \
+            likelihood.waveform_generator.waveform_arguments.get(
+                "waveform_approximant_list", None
+            ) or []
+    return attribution_executor(
+        waveform_approximant_list,
+        concurrent=concurrent and len(waveform_approximant_list) > 0,
+        max_workers=max_workers, likelihood=likelihood
+    )
+
+
+def _read_checkpoint(outfile, nsamples, fingerprint=None):
+    """Return the number of samples that have been processed according to
+    the checkpoint stored in an output file. 0 is returned if the file does
+    not exist, does not contain a checkpoint or was produced from a
+    different posterior
+
+    Parameters
+    ----------
+    outfile: str
+        path to the output file
+    nsamples: int
+        number of samples in the posterior being processed
+    fingerprint: str, optional
+        hash of the posterior being processed, see `_fingerprint`. If
+        provided, the checkpoint is only used if it was produced from a
+        posterior with the same hash. Default None
+    """
+    import h5py
+    if not os.path.isfile(outfile):
+        return 0
+    try:
+        with h5py.File(outfile, "r") as g:
+            attrs = g["posterior"].attrs
+            if int(attrs["bilby_nr_nsamples"]) != nsamples:
+                logger.warning(
+                    f"Ignoring checkpoint in {outfile} because it was "
+                    f"produced from a posterior with a different number of "
+                    f"samples"
+                )
+                return 0
+            if fingerprint is not None and (
+                attrs.get("bilby_nr_fingerprint", None) != fingerprint
+            ):
+                logger.warning(
+                    f"Ignoring checkpoint in {outfile} because it was "
+                    f"produced from a different posterior"
+                )
+                return 0
+            return int(attrs.get("bilby_nr_completed", 0))
+    except (OSError, KeyError):
+        return 0
+
+
+def _read_chunk(posterior, columns, start, stop):
+    """Read a chunk of samples from the posterior group of a bilby HDF5
+    result file
+
+    Parameters
+    ----------
+    posterior: h5py.Group
+        the posterior group
+    columns: list
+        list of columns to read
+    start: int
+        index of the first sample to read
+    stop: int
+        index after the last sample to read
+    """
+    import h5py
+    import pandas as pd
+    data = {}
+    for key in columns:
+        dataset = posterior[key]
+        if h5py.check_string_dtype(dataset.dtype) is not None:
+            data[key] = dataset.asstr()[start:stop]
+        else:
+            data[key] = dataset[start:stop]
+    return pd.DataFrame(data, index=np.arange(start, stop))
+
+
+def _append_chunk(output, chunk, start):
+    """Append a chunk of samples to the posterior group of a bilby HDF5
+    result file. Columns which are missing from the chunk are filled with
+    nan and columns which were missing from previous chunks are back-filled
+    with nan
+
+    Parameters
+    ----------
+    output: h5py.Group
+        the posterior group to append to
+    chunk: pandas.DataFrame
+        the samples to append
+    start: int
+        index of the first sample in the chunk
+    """
+    import h5py
+    stop = start + len(chunk)
+    for key in chunk.keys():
+        if key in output:
+            continue
+        values = chunk[key].values
+        if values.dtype.kind in "OUS":
+            dtype, fill = h5py.string_dtype(), ""
+        else:
+            dtype, fill = values.dtype, np.nan
+        dataset = output.create_dataset(
+            key, shape=(start,), maxshape=(None,), dtype=dtype, chunks=True
+        )
+        if start:
+            dataset[:] = fill
+    for key, dataset in output.items():
+        dataset.resize((stop,))
+        if key in chunk:
+            values = chunk[key].values
+            if h5py.check_string_dtype(dataset.dtype) is not None:
+                values = values.astype(str).astype(object)
+            dataset[start:stop] = values
+        elif h5py.check_string_dtype(dataset.dtype) is not None:
+            dataset[start:stop] = ""
+        else:
+            dataset[start:stop] = np.nan
+
+
+def _generate_all_bbh_parameters_for_chunk(
+    chunk, likelihood=None, priors=None, npool=1, executor=None,
+    defaults=None, base_conversion=None
+):
+    """Attribute each sample in a chunk to a waveform approximant and
+    generate all BBH parameters
+
+    Parameters
+    ----------
+    chunk: pandas.DataFrame
+        the samples to generate parameters for
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling
+    priors: dict, optional
+        Dictionary of prior objects, used to fill in non-sampled parameters.
+    npool: int, optional
+        Number of processes to use for the conversion. Default 1
+    executor: concurrent.futures.Executor, optional
+        executor used to evaluate the likelihood for all waveform
+        approximants concurrently when attributing the samples. Default None
+    defaults: dict, optional
+        default waveform arguments. Default the defaults used by
+        bilby.gw.conversion.generate_all_bbh_parameters
+    base_conversion: func, optional
+        function to convert the samples to the parameters required by the
+        source model. Default
+        bilby.gw.conversion.convert_to_lal_binary_black_hole_parameters
+    """
+    import pandas as pd
+    from bilby.gw.conversion import convert_to_lal_binary_black_hole_parameters
+    from .conversion import _generate_all_cbc_parameters_for_model
+    from .statistics import statistics
+    models = _attribute_chunk(chunk, likelihood, executor=executor)
+    if defaults is None:
+        defaults = {
+            "reference_frequency": 50.0,
+            "waveform_approximant": "IMRPhenomPv2",
+            "minimum_frequency": 20.0
+        }
+    if base_conversion is None:
+        base_conversion = convert_to_lal_binary_black_hole_parameters
+    converted = []
+    with statistics.paused():
+        for model in pd.unique(models):
+            converted.append(
+                _generate_all_cbc_parameters_for_model(
+                    chunk[models == model].copy(), model, defaults,
+                    base_conversion, likelihood=likelihood, priors=priors,
+                    npool=npool
+                )
+            )
+    return pd.concat(converted).sort_index()
+
+
+def _attribute_chunk(chunk, likelihood=None, executor=None):
+    """Return the waveform approximant used to evaluate the likelihood for
+    each sample in a chunk. If the likelihood does not sample over multiple
+    models or the samples do not contain the log likelihood, the
+    `waveform_approximant` column is used if present, otherwise all samples
+    are assigned the default model 'IMRPhenomTPHM'. If the waveform
+    approximant was sampled, the `waveform_index` column is used
+
+    Parameters
+    ----------
+    chunk: pandas.DataFrame
+        the samples to attribute
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient, optional
+        GravitationalWaveTransient used for sampling
+    executor: concurrent.futures.Executor, optional
+        executor used to evaluate the likelihood for all waveform
+        approximants concurrently. Default None
+    """
+    from .conversion import determine_waveform_approximant_from_likelihood
+    waveform_approximant_list = None
+    if likelihood is not None:
+        waveform_approximant_list = \
+            likelihood.waveform_generator.waveform_arguments.get(
+                "waveform_approximant_list", None
+            )
+    if waveform_approximant_list is not None and "waveform_index" in chunk:
+        from .source import waveform_approximant_from_index
+        return waveform_approximant_from_index(
+            chunk["waveform_index"].values, waveform_approximant_list
+        )
+    if waveform_approximant_list is None or "log_likelihood" not in chunk:
+        if "waveform_approximant" in chunk:
+            return chunk["waveform_approximant"].values.astype(str)
+        return np.full(len(chunk), "IMRPhenomTPHM")
+    numeric = chunk.select_dtypes(include=[np.number])
+    return np.array([
+        determine_waveform_approximant_from_likelihood(
+            sample, waveform_approximant_list, likelihood, executor=executor
+        ) for sample in numeric.to_dict(orient="records")
+    ])
@@ -0,0 +1,246 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import resource
+import sys
+import time
+import tracemalloc
+import numpy as np
+from bilby.core.utils import logger
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+
+def estimate_cost(
+    priors, waveform_approximant_list, frequency_array, waveform_arguments,
+    nsamples=1000, ntimings=3, likelihood_evaluations=2e7,
+    target_wall_time=48 * 3600., max_cpus=64
+):
+    """Estimate the expected cost of a multi-model analysis before it is
+    submitted. Samples are drawn from the prior to estimate how often each
+    waveform approximant is drawn (from the interpolant weights), a few
+    waveform evaluations are timed for each approximant and the expected
+    cost per likelihood call is reported. Resource requests are then
+    suggested based on the expected number of likelihood evaluations
+
+    Parameters
+    ----------
+    priors: bilby.gw.prior.BBHPriorDict
+        the prior used for the analysis
+    waveform_approximant_list: list
+        list of waveform approximants to sample over
+    frequency_array: np.ndarray
+        the frequency array used for the analysis
+    waveform_arguments: dict
+        the waveform arguments used for the analysis, including the
+        match_interpolant (if any)
+    nsamples: int, optional
+        number of prior samples used to estimate the draw fraction of each
+        approximant. Default 1000
+    ntimings: int, optional
+        number of waveform evaluations to time for each approximant. At most
+        nsamples evaluations are timed. Default 3
+    likelihood_evaluations: float, optional
+        expected number of likelihood evaluations for the analysis. Default
+        2e7
+    target_wall_time: float, optional
+        desired wall time of the analysis in seconds. Used to suggest npool.
+        Default 48 hours
+    max_cpus: int, optional
+        maximum number of CPUs to suggest. Default 64
+
+    Returns
+    -------
+    report: dict
+        dictionary containing the draw fraction, median waveform time and peak
+        waveform memory for each approximant, the expected cost per
+        likelihood call and the suggested resources. The peak waveform memory
+        is the larger of the memory allocated by python and the growth of
+        the peak resident set size of the process. Memory allocated in C
+        which does not raise the peak resident set size, e.g. because it
+        reuses memory freed by an earlier evaluation, is not captured
+    """
+    from bilby.gw.conversion import convert_to_lal_binary_black_hole_parameters
+    from .source import (
+        _weights_for_samples, _generate_polarizations, _use_interpolant_bundle
+    )
+    if int(nsamples) < 1 or int(ntimings) < 1:
+        raise ValueError(
+            "Please provide a positive number of samples and timings for the "
+            "pre-flight check"
+        )
+    nsamples = int(nsamples)
+    # each timing uses a different prior sample
+    ntimings = min(int(ntimings), nsamples)
+    waveform_arguments = waveform_arguments.copy()
+    for key in ["waveform_approximant_list", "catch_waveform_errors"]:
+        waveform_arguments.pop(key, None)
+    interpolant = waveform_arguments.pop("match_interpolant", None)
+    _use_interpolant_bundle(waveform_arguments)
+    use_best = waveform_arguments.pop("use_best_match", False)
+    mapping = waveform_arguments.pop("match_to_weight", None)
+    for key in [
+        "weight_cache_size", "weight_cache_tolerance", "waveform_fallback",
+        "max_waveform_attempts"
+    ]:
+        waveform_arguments.pop(key, None)
+    samples, _ = convert_to_lal_binary_black_hole_parameters(
+        priors.sample(nsamples)
+    )
+    samples = {key: np.atleast_1d(value) for key, value in samples.items()}
+    weights = _weights_for_samples(
+        waveform_approximant_list, samples, match_interpolant=interpolant,
+        use_best=use_best, mapping=mapping
+    )
+    draw_fractions = np.mean(weights, axis=0)
+    start = time.perf_counter()
+    for idx in range(ntimings):
+        _weights_for_samples(
+            waveform_approximant_list,
+            {key: value[idx:idx + 1] for key, value in samples.items()},
+            match_interpolant=interpolant, use_best=use_best, mapping=mapping
+        )
+    interpolant_time = (time.perf_counter() - start) / ntimings
+
+    parameters = [
+        "mass_1", "mass_2", "luminosity_distance", "a_1", "tilt_1", "phi_12",
+        "a_2", "tilt_2", "phi_jl", "theta_jn", "phase"
+    ]
+    waveform_time, waveform_memory = {}, {}
+    for approximant in waveform_approximant_list:
+        timings, peak = [], 0
+        for idx in range(ntimings):
+            kwargs = dict(waveform_arguments, waveform_approximant=approximant)
+            rss = _max_rss()
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                _generate_polarizations(
+                    frequency_array,
+                    *[samples[key][idx] for key in parameters], **kwargs
+                )
+            except Exception as e:
+                logger.debug(
+                    f"Waveform evaluation failed during pre-flight check: {e}"
+                )
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+                # tracemalloc only sees memory allocated by python, so we also
+                # use the growth of the peak resident set size of the process
+                # to capture memory allocated in C, e.g. by LAL
+                peak = max(
+                    peak, tracemalloc.get_traced_memory()[1],
+                    _max_rss() - rss
+                )
+                tracemalloc.stop()
+            timings.append(elapsed)
+        if not len(timings):
+            logger.warning(
+                f"Unable to evaluate {approximant} during the pre-flight "
+                f"check. The expected cost per likelihood call will be "
+                f"underestimated"
+            )
+        waveform_time[approximant] = (
+            float(np.median(timings)) if len(timings) else np.nan
+        )
+        waveform_memory[approximant] = int(peak)
+
+    cost = interpolant_time + float(np.nansum([
+        fraction * waveform_time[approximant] for approximant, fraction in
+        zip(waveform_approximant_list, draw_fractions)
+    ]))
+    report = {
+        "draw_fractions": {
+            approximant: float(fraction) for approximant, fraction in
+            zip(waveform_approximant_list, draw_fractions)
+        },
+        "waveform_time": waveform_time,
+        "waveform_memory": waveform_memory,
+        "interpolant_time": interpolant_time,
+        "cost_per_likelihood": cost,
+    }
+    report["suggested"] = _suggest_resources(
+        cost, max(waveform_memory.values()), likelihood_evaluations,
+        target_wall_time, max_cpus
+    )
+    return report
+
+
+def _suggest_resources(
+    cost, waveform_memory, likelihood_evaluations, target_wall_time, max_cpus
+):
+    """Suggest npool, request_cpus and request_memory for an analysis
+
+    Parameters
+    ----------
+    cost: float
+        expected cost per likelihood call in seconds
+    waveform_memory: int
+        peak memory (in bytes) required to generate a single waveform
+    likelihood_evaluations: float
+        expected number of likelihood evaluations for the analysis
+    target_wall_time: float
+        desired wall time of the analysis in seconds
+    max_cpus: int
+        maximum number of CPUs to suggest
+
+    Returns
+    -------
+    suggested: dict
+        dictionary containing the suggested npool, request_cpus and
+        request_memory (in GB)
+    """
+    npool = int(np.clip(
+        np.ceil(likelihood_evaluations * cost / target_wall_time), 1, max_cpus
+    ))
+    # each pool worker is forked from the parent process so we assume that
+    # every process requires the memory currently used by this process plus
+    # a safety factor of 2 for each waveform evaluation
+    baseline = _max_rss()
+    memory = (baseline + npool * 2 * waveform_memory) / 1024**3
+    return {
+        "npool": npool,
+        "request_cpus": npool,
+        "request_memory": float(max(np.ceil(memory * 2) / 2, 1.)),
+        "expected_wall_time": likelihood_evaluations * cost / npool,
+    }
+
+
+def _max_rss():
+    """Return the peak resident set size of the current process in bytes"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def format_report(report):
+    """Return a human readable summary of a pre-flight report
+
+    Parameters
+    ----------
+    report: dict
+        report returned by `estimate_cost`
+    """
+    lines = ["bilby_nr pre-flight cost estimate:"]
+    for approximant, fraction in report["draw_fractions"].items():
+        lines.append(
+            f"    {approximant}: drawn {100 * fraction:.1f}% of the time, "
+            f"{report['waveform_time'][approximant]:.4f}s and "
+            f"{report['waveform_memory'][approximant] / 1024**2:.1f}MB per "
+            f"waveform"
+        )
+    lines.append(
+        f"    interpolant: {report['interpolant_time']:.2e}s per call"
+    )
+    lines.append(
+        f"    expected cost per likelihood call: "
+        f"{report['cost_per_likelihood']:.4f}s"
+    )
+    suggested = report["suggested"]
+    lines.append(
+        f"    suggested resources: request-cpus={suggested['request_cpus']}, "
+        f"request-memory={suggested['request_memory']}GB, "
+        f"npool={suggested['npool']} (expected sampling time "
+        f"{suggested['expected_wall_time'] / 3600:.1f} hours)"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,254 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import numpy as np
+from bilby.core.prior import Prior
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+_DEFAULT_REQUIRED_VARIABLES = [
+    "chirp_mass", "mass_ratio", "a_1", "a_2", "tilt_1", "tilt_2", "phi_12"
+]
+
+
+class ModelIndexPrior(Prior):
+    """Categorical prior for the index of the waveform approximant used to
+    evaluate the likelihood, conditioned on the masses and spins through the
+    interpolant weights, i.e. p(waveform_index = i | theta) = w_i(theta).
+    This should be used with the
+    bilby_nr.source.indexed_multi_model_binary_black_hole source model and
+    a bilby.core.prior.ConditionalPriorDict (e.g. a
+    bilby.gw.prior.BBHPriorDict)
+
+    Parameters
+    ----------
+    waveform_approximant_list: list
+        list of waveform approximants that are indexed
+    match_interpolant: str, optional
+        the interpolant used to estimate the match. If None, all
+        approximants are given equal weight. Default None
+    use_best_match: bool, optional
+        if True, give all weight to the approximant with the highest match.
+        Default False
+    match_to_weight: str, optional
+        a string that can be evaluated to map an array of matches to a series
+        of weights. See bilby_nr.source._weights_from_matches
+    required_variables: list, optional
+        the sampled parameters which the weights depend on. Component masses
+        and spins are constructed from these parameters. Default
+        ['chirp_mass', 'mass_ratio', 'a_1', 'a_2', 'tilt_1', 'tilt_2',
+        'phi_12']
+    name: str, optional
+        name of the parameter. Default 'waveform_index'
+    latex_label: str, optional
+        latex label of the parameter
+    unit: str, optional
+        unit of the parameter
+    boundary: str, optional
+        boundary condition of the parameter. The index is categorical so
+        neither periodic nor reflective boundaries are meaningful. Default
+        None
+    """
+    def __init__(
+        self, waveform_approximant_list, match_interpolant=None,
+        use_best_match=False, match_to_weight=None, required_variables=None,
+        name="waveform_index", latex_label=None, unit=None, boundary=None
+    ):
+        from .utils import convert_waveform_list_from_input
+        waveform_approximant_list = convert_waveform_list_from_input(
+            waveform_approximant_list
+        )
+        if isinstance(waveform_approximant_list, str):
+            waveform_approximant_list = [waveform_approximant_list]
+        if len(waveform_approximant_list) < 2:
+            raise ValueError(
+                "Please provide at least two waveform approximants. If only "
+                "a single approximant is used, the waveform index should be "
+                "fixed with bilby.core.prior.DeltaFunction(0)"
+            )
+        if latex_label is None:
+            latex_label = "$\\mathrm{waveform\\,index}$"
+        super().__init__(
+            name=name, latex_label=latex_label, unit=unit, minimum=0,
+            # small delta to ensure the largest index is within the prior
+            maximum=(len(waveform_approximant_list) - 1) * (1 + 1e-15),
+            boundary=boundary
+        )
+        self.waveform_approximant_list = list(waveform_approximant_list)
+        self.match_interpolant = match_interpolant
+        self.use_best_match = use_best_match
+        self.match_to_weight = match_to_weight
+        if required_variables is None:
+            required_variables = _DEFAULT_REQUIRED_VARIABLES
+        self._required_variables = list(required_variables)
+        nmodels = len(self.waveform_approximant_list)
+        self._weights = np.ones((1, nmodels)) / nmodels
+
+    @property
+    def required_variables(self):
+        """The sampled parameters which the weights depend on"""
+        return self._required_variables
+
+    def condition_func(self, reference_params, **required_variables):
+        """Return the interpolant weights for the required variables. The
+        existence of this method marks the prior as conditional for
+        bilby.core.prior.ConditionalPriorDict
+        """
+        from .source import _weights_for_samples
+        samples = _component_parameters(required_variables)
+        return dict(
+            _weights=_weights_for_samples(
+                self.waveform_approximant_list, samples,
+                match_interpolant=self.match_interpolant,
+                use_best=self.use_best_match, mapping=self.match_to_weight
+            )
+        )
+
+    def update_conditions(self, **required_variables):
+        """Update the weights for the required variables. If no variables are
+        given, the most recently used weights are kept
+
+        Parameters
+        ----------
+        required_variables:
+            the values of the required variables
+        """
+        if not len(required_variables):
+            return
+        missing = set(self.required_variables) - set(required_variables)
+        if missing:
+            raise ValueError(
+                f"Unable to calculate the weights for {self.name} as the "
+                f"required variables {sorted(missing)} were not provided"
+            )
+        for key, value in self.condition_func({}, **required_variables).items():
+            setattr(self, key, value)
+
+    def sample(self, size=None, **required_variables):
+        """Draw a sample from the prior
+
+        Parameters
+        ----------
+        size: int, optional
+            number of samples to draw. Default None
+        required_variables:
+            the values of the required variables
+        """
+        from bilby.core.utils import random
+        self.least_recently_sampled = self.rescale(
+            random.rng.uniform(0, 1, size), **required_variables
+        )
+        return self.least_recently_sampled
+
+    def rescale(self, val, **required_variables):
+        """Map a sample from the unit interval to a waveform index with the
+        inverse cumulative distribution of the weights
+
+        Parameters
+        ----------
+        val: float, np.ndarray
+            uniform probability
+        required_variables:
+            the values of the required variables
+        """
+        self.update_conditions(**required_variables)
+        cumulative = np.cumsum(self._weights, axis=-1)
+        cumulative /= cumulative[..., -1:]
+        index = np.sum(
+            np.atleast_1d(val)[..., None] > cumulative, axis=-1
+        )
+        index = np.clip(index, 0, len(self.waveform_approximant_list) - 1)
+        if np.ndim(val) == 0 and index.size == 1:
+            return int(index[0])
+        return index
+
+    def prob(self, val, **required_variables):
+        """Return the prior probability of val
+
+        Parameters
+        ----------
+        val: int, np.ndarray
+            the waveform index
+        required_variables:
+            the values of the required variables
+        """
+        self.update_conditions(**required_variables)
+        val = np.asarray(val, dtype=float)
+        index = np.clip(
+            np.round(val).astype(int), 0, len(self.waveform_approximant_list) - 1
+        )
+        weights = self._weights / np.sum(self._weights, axis=-1, keepdims=True)
+        index, rows = np.broadcast_arrays(
+            np.atleast_1d(index), np.arange(len(weights))
+        )
+        probability = np.where(
+            np.atleast_1d(val) == index, weights[rows, index], 0.
+        )
+        if val.ndim == 0 and probability.size == 1:
+            return float(probability[0])
+        return probability
+
+    def ln_prob(self, val, **required_variables):
+        """Return the natural log prior probability of val
+
+        Parameters
+        ----------
+        val: int, np.ndarray
+            the waveform index
+        required_variables:
+            the values of the required variables
+        """
+        with np.errstate(divide="ignore"):
+            return np.log(self.prob(val, **required_variables))
+
+    def cdf(self, val, **required_variables):
+        """Return the cumulative prior probability of val
+
+        Parameters
+        ----------
+        val: int, np.ndarray
+            the waveform index
+        required_variables:
+            the values of the required variables
+        """
+        self.update_conditions(**required_variables)
+        cumulative = np.cumsum(self._weights, axis=-1)
+        cumulative /= cumulative[..., -1:]
+        index = np.floor(np.asarray(val, dtype=float)).astype(int)
+        index, rows = np.broadcast_arrays(
+            np.atleast_1d(index), np.arange(len(cumulative))
+        )
+        probability = np.where(
+            index < 0, 0.,
+            cumulative[rows, np.clip(index, 0, cumulative.shape[-1] - 1)]
+        )
+        if np.ndim(val) == 0 and probability.size == 1:
+            return float(probability[0])
+        return probability
+
+
+def _component_parameters(parameters):
+    """Return the component masses, spins and angles required to calculate
+    the interpolant weights. Angles which do not affect the weights are set
+    to 0
+
+    Parameters
+    ----------
+    parameters: dict
+        dictionary of sampled parameters
+    """
+    from bilby.gw.conversion import convert_to_lal_binary_black_hole_parameters
+    required = [
+        "mass_1", "mass_2", "a_1", "tilt_1", "phi_12", "a_2", "tilt_2",
+        "phi_jl", "theta_jn", "phase"
+    ]
+    parameters = {
+        key: np.atleast_1d(np.asarray(value, dtype=float)) for key, value in
+        parameters.items()
+    }
+    if not all(key in parameters for key in required[:7]):
+        parameters, _ = convert_to_lal_binary_black_hole_parameters(parameters)
+    nsamples = len(parameters["mass_1"])
+    return {
+        key: parameters[key] if key in parameters else np.zeros(nsamples)
+        for key in required
+    }
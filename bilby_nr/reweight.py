@@ -0,0 +1,399 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import copy
+import multiprocessing
+import numpy as np
+from scipy.special import logsumexp
+from bilby.core.utils import logger
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+_likelihoods = {}
+
+
+def reweight(
+    results, likelihood, waveform_approximant_list=None,
+    waveform_approximants=None, weight_threshold=1e-4, npool=1,
+    chunk_size=100, label=None
+):
+    """Reweight one or more single-model posteriors into a multi-model
+    posterior, following https://arxiv.org/abs/2208.00106. The multi-model
+    likelihood is the weighted sum over models, L(theta) = sum_m w_m(theta)
+    L_m(theta), where the weights w_m are calculated from the match
+    interpolant (or are equal if no interpolant is specified). When several
+    single-model results are provided, they are combined with multiple
+    importance sampling (balance heuristic), i.e. the samples are treated
+    as draws from the mixture of the single-model posteriors. All results
+    must have been produced with the same prior and data. The likelihood
+    for each model is only evaluated where its weight exceeds
+    `weight_threshold` (and for the models used to produce the results)
+
+    Parameters
+    ----------
+    results: list
+        list of bilby.core.result.Result objects to reweight
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient
+        likelihood with the `multi_model_binary_black_hole` source model. The
+        waveform arguments are used to determine the waveform approximant
+        list and weights
+    waveform_approximant_list: list, optional
+        list of waveform approximants to include in the multi-model
+        posterior. Default taken from the likelihood waveform arguments
+    waveform_approximants: list, optional
+        the waveform approximant used to produce each result. Default taken
+        from the result meta data
+    weight_threshold: float, optional
+        likelihoods are only evaluated for models with a weight above this
+        threshold. Models with a smaller weight are neglected. Default 1e-4
+    npool: int, optional
+        number of processes to use when evaluating the likelihood. Default 1
+    chunk_size: int, optional
+        number of samples to send to each process at once. Default 100
+    label: str, optional
+        label to give the reweighted result. Default label of the first result
+        with '_multi_model' appended
+
+    Returns
+    -------
+    result: bilby.core.result.Result
+        the multi-model result. The reweighting diagnostics are stored in the
+        meta data under the key 'bilby_nr_reweighting'
+    """
+    import pandas as pd
+    from .source import _weights_for_samples
+    from .utils import convert_waveform_list_from_input
+    if not isinstance(results, (list, tuple)):
+        results = [results]
+    waveform_arguments = likelihood.waveform_generator.waveform_arguments
+    if waveform_approximant_list is None:
+        waveform_approximant_list = waveform_arguments.get(
+            "waveform_approximant_list", None
+        )
+    if waveform_approximant_list is None:
+        raise ValueError(
+            "Please provide a list of waveforms to reweight to, either "
+            "directly or via the waveform_approximant_list waveform argument"
+        )
+    waveform_approximant_list = convert_waveform_list_from_input(
+        waveform_approximant_list
+    )
+    if waveform_approximants is None:
+        waveform_approximants = [
+            _waveform_approximant_from_result(result) for result in results
+        ]
+    if len(waveform_approximants) != len(results):
+        raise ValueError(
+            "Please provide the waveform approximant used for each result"
+        )
+    models = list(waveform_approximant_list)
+    for approximant in waveform_approximants:
+        if approximant not in models:
+            models.append(approximant)
+
+    posterior = pd.concat(
+        [result.posterior for result in results], ignore_index=True
+    )
+    nsamples = len(posterior)
+    origin = np.concatenate([
+        np.full(len(result.posterior), num) for num, result in
+        enumerate(results)
+    ])
+    weights = np.zeros((nsamples, len(models)))
+    weights[:, :len(waveform_approximant_list)] = _weights_for_samples(
+        waveform_approximant_list, posterior,
+        match_interpolant=waveform_arguments.get("match_interpolant", None),
+        use_best=waveform_arguments.get("use_best_match", False),
+        mapping=waveform_arguments.get("match_to_weight", None)
+    )
+
+    # work out which likelihoods need to be evaluated. The likelihood of the
+    # model used to produce each result is already known for its own samples
+    log_likelihoods = np.full((nsamples, len(models)), np.nan)
+    required = weights > weight_threshold
+    for num, approximant in enumerate(waveform_approximants):
+        column = models.index(approximant)
+        required[:, column] = True
+        own = origin == num
+        log_likelihoods[own, column] = posterior["log_likelihood"][own]
+    required &= np.isnan(log_likelihoods)
+    logger.info(
+        f"Evaluating {np.sum(required)} likelihoods for "
+        f"{nsamples} samples and {len(models)} models"
+    )
+    samples = _samples_for_likelihood(posterior)
+    likelihoods = {
+        approximant: _single_model_likelihood(likelihood, approximant) for
+        approximant in models
+    }
+    tasks = []
+    for column, approximant in enumerate(models):
+        rows, = np.where(required[:, column])
+        for idx in range(0, len(rows), chunk_size):
+            _rows = rows[idx:idx + chunk_size]
+            tasks.append(
+                (column, _rows, approximant, [samples[row] for row in _rows])
+            )
+    if npool > 1:
+        with multiprocessing.Pool(
+            npool, initializer=_initialize_likelihoods,
+            initargs=(likelihoods,)
+        ) as pool:
+            evaluated = pool.map(_evaluate_chunk, tasks)
+    else:
+        _initialize_likelihoods(likelihoods)
+        evaluated = list(map(_evaluate_chunk, tasks))
+    for (column, rows, _, _), values in zip(tasks, evaluated):
+        log_likelihoods[rows, column] = values
+
+    # importance weights with respect to the mixture of single-model
+    # posteriors
+    log_bayes_factors = np.array([
+        result.log_bayes_factor for result in results
+    ])
+    fractions = np.array([
+        np.mean(origin == num) for num in range(len(results))
+    ])
+    columns = [
+        models.index(approximant) for approximant in waveform_approximants
+    ]
+    log_proposal = logsumexp(
+        np.log(fractions) + log_likelihoods[:, columns] - log_bayes_factors,
+        axis=1
+    )
+    with np.errstate(divide="ignore"):
+        log_terms = np.where(
+            weights > weight_threshold, np.log(weights) + log_likelihoods,
+            -np.inf
+        )
+    log_target = logsumexp(log_terms, axis=1)
+    ln_weights = log_target - log_proposal
+    ln_weights[~np.isfinite(ln_weights)] = -np.inf
+    diagnostics = _reweighting_diagnostics(ln_weights)
+
+    # draw a model for each sample in proportion to its contribution to the
+    # multi-model likelihood
+    model_probabilities = np.exp(log_terms - log_target[:, None])
+    model_probabilities[~np.isfinite(model_probabilities)] = 0.
+    cumulative = np.cumsum(model_probabilities, axis=1)
+    chosen = np.argmax(
+        np.random.uniform(size=(nsamples, 1)) * cumulative[:, -1:] <
+        cumulative, axis=1
+    )
+    posterior = posterior.copy()
+    posterior["log_likelihood"] = log_target
+    posterior["waveform_approximant"] = np.array(models)[chosen]
+    normalised = np.exp(ln_weights - np.max(ln_weights))
+    keep = normalised > np.random.uniform(0, 1, nsamples)
+    diagnostics["model_fractions"] = {
+        approximant: float(np.mean(chosen[keep] == column)) for
+        column, approximant in enumerate(models)
+    }
+    diagnostics["result_labels"] = [result.label for result in results]
+    diagnostics["waveform_approximants"] = list(waveform_approximants)
+
+    result = copy.copy(results[0])
+    result.label = label or f"{results[0].label}_multi_model"
+    result.posterior = posterior[keep].reset_index(drop=True)
+    result.log_bayes_factor = diagnostics["log_bayes_factor"]
+    result.log_evidence = (
+        diagnostics["log_bayes_factor"] + results[0].log_noise_evidence
+    )
+    result.log_evidence_err = diagnostics["log_bayes_factor_err"]
+    result.meta_data = copy.deepcopy(results[0].meta_data)
+    result.meta_data["bilby_nr_reweighting"] = diagnostics
+    logger.info(
+        f"Reweighted {nsamples} samples to {len(result.posterior)} samples. "
+        f"Effective sample size: {diagnostics['effective_sample_size']:.1f}. "
+        f"ln(BF): {diagnostics['log_bayes_factor']:.3f} +/- "
+        f"{diagnostics['log_bayes_factor_err']:.3f}"
+    )
+    return result
+
+
+def _reweighting_diagnostics(ln_weights):
+    """Return the effective sample size, efficiency and evidence estimate for
+    a set of log importance weights
+
+    Parameters
+    ----------
+    ln_weights: np.ndarray
+        array of natural log importance weights
+
+    Returns
+    -------
+    diagnostics: dict
+        dictionary containing the effective sample size (Kish), efficiency,
+        log Bayes factor and its statistical uncertainty
+    """
+    nsamples = len(ln_weights)
+    if not np.any(np.isfinite(ln_weights)):
+        raise ValueError("All importance weights are zero")
+    weights = np.exp(ln_weights - np.max(ln_weights))
+    ess = np.sum(weights)**2 / np.sum(weights**2)
+    log_bayes_factor = logsumexp(ln_weights) - np.log(nsamples)
+    mean = np.mean(weights)
+    log_bayes_factor_err = float(
+        np.std(weights) / (mean * np.sqrt(nsamples))
+    )
+    return {
+        "effective_sample_size": float(ess),
+        "efficiency": float(ess / nsamples),
+        "log_bayes_factor": float(log_bayes_factor),
+        "log_bayes_factor_err": log_bayes_factor_err,
+    }
+
+
+def _waveform_approximant_from_result(result):
+    """Return the waveform approximant used to produce a result
+
+    Parameters
+    ----------
+    result: bilby.core.result.Result
+        the result to inspect
+    """
+    try:
+        return result.meta_data["likelihood"]["waveform_arguments"][
+            "waveform_approximant"
+        ]
+    except (KeyError, TypeError):
+        raise ValueError(
+            f"Unable to determine the waveform approximant used for "
+            f"{result.label}. Please provide it explicitly"
+        )
+
+
+def _samples_for_likelihood(posterior):
+    """Convert a posterior table into a list of dictionaries which can be
+    passed to the likelihood. Non-numeric columns and the stored
+    likelihood and prior are removed
+
+    Parameters
+    ----------
+    posterior: pandas.DataFrame
+        table of posterior samples
+    """
+    keys = [
+        key for key in posterior.keys() if key not in
+        ["log_likelihood", "log_prior"] and
+        np.issubdtype(posterior[key].dtype, np.number)
+    ]
+    return posterior[keys].to_dict(orient="records")
+
+
+def _single_model_likelihood(likelihood, waveform_approximant):
+    """Return a copy of a multi-model likelihood which only uses a single
+    waveform approximant
+
+    Parameters
+    ----------
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient
+        the multi-model likelihood
+    waveform_approximant: str
+        the waveform approximant to use
+    """
+    _likelihood = copy.deepcopy(likelihood)
+    _likelihood.waveform_generator.waveform_arguments.update(
+        {
+            "waveform_approximant_list": [waveform_approximant],
+            "waveform_approximant": waveform_approximant
+        }
+    )
+    return _likelihood
+
+
+def _initialize_likelihoods(likelihoods):
+    """Pool initializer which stores the single-model likelihoods in the
+    worker
+    """
+    global _likelihoods
+    _likelihoods = likelihoods
+
+
+def _evaluate_chunk(args):
+    """Evaluate the log likelihood ratio for a chunk of samples
+
+    Parameters
+    ----------
+    args: tuple
+        tuple containing the column index, row indices, waveform approximant
+        and a list of samples
+
+    Returns
+    -------
+    log_likelihoods: np.ndarray
+        the log likelihood ratio for each sample. Samples where the
+        likelihood could not be evaluated are assigned -inf
+    """
+    from .statistics import statistics
+    _, _, approximant, samples = args
+    likelihood = _likelihoods[approximant]
+    log_likelihoods = np.zeros(len(samples))
+    with statistics.paused():
+        for num, sample in enumerate(samples):
+            try:
+                log_likelihoods[num] = likelihood.log_likelihood_ratio(
+                    parameters=sample.copy()
+                )
+            except Exception:
+                log_likelihoods[num] = -np.inf
+    return np.nan_to_num(log_likelihoods, nan=-np.inf)
+
+
+def create_parser():
+    """Create a parser for the bilby_nr_reweight executable. The parser
+    accepts all of the same arguments as bilby_pipe_analysis in addition to
+    the result files to reweight
+    """
+    from .bilby_pipe import create_parser as _create_parser
+    parser = _create_parser(top_level=False)
+    parser.add_argument(
+        "--result-files", type=str, nargs="+", required=True,
+        help="Single-model result files to reweight"
+    )
+    parser.add_argument(
+        "--result-waveform-approximants", type=str, nargs="+", default=None,
+        help=(
+            "Waveform approximant used to produce each result file. By "
+            "default this is read from the result meta data"
+        )
+    )
+    parser.add_argument(
+        "--weight-threshold", type=float, default=1e-4,
+        help=(
+            "Likelihoods are only evaluated for models with a weight above "
+            "this threshold"
+        )
+    )
+    return parser
+
+
+def main():
+    """Reweight existing single-model results into a multi-model result
+
+    .. code-block:: console
+
+        $ bilby_nr_reweight ini [options] \\
+                --result-files XPHM_result.hdf5 TPHM_result.hdf5 \\
+                --npool 8
+    """
+    import sys
+    import bilby
+    from bilby_pipe.utils import parse_args
+    from .bilby_pipe import DataAnalysisInput
+    args, unknown_args = parse_args(sys.argv[1:], create_parser())
+    analysis = DataAnalysisInput(args, unknown_args)
+    likelihood, _ = analysis.get_likelihood_and_priors()
+    results = [
+        bilby.core.result.read_in_result(filename) for filename in
+        args.result_files
+    ]
+    result = reweight(
+        results, likelihood,
+        waveform_approximants=args.result_waveform_approximants,
+        weight_threshold=args.weight_threshold, npool=analysis.npool,
+        label=f"{analysis.label}_multi_model"
+    )
+    result.save_to_file(
+        extension=analysis.result_format, overwrite=True,
+        outdir=analysis.result_directory
+    )
@@ -4,11 +4,55 @@ import numpy as np
 from bilby.gw import source
 from bilby.core.utils import logger
 import ast
+import collections
+import functools
+import time
+from .cache import LRUCache, get_disk_cache, quantise, waveform_key
+from .checkpoint import maybe_save_state
+from .instrumentation import instrumentation
+from .statistics import statistics
 from .utils import convert_waveform_list_from_input
 
 __author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
 
 
+class _RateLimitedWarning(object):
+    """Log a warning at most once every `interval` seconds. Warnings that are
+    suppressed are counted and reported the next time a warning is logged
+
+    Parameters
+    ----------
+    interval: float, optional
+        minimum time in seconds between warnings. Default 60
+    """
+    def __init__(self, interval=60.):
+        self.interval = interval
+        self._last = -np.inf
+        self._suppressed = 0
+
+    def __call__(self, message):
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            self._suppressed += 1
+            return
+        if self._suppressed:
+            message += (
+                f"\n{self._suppressed} further waveform failures were "
+                f"suppressed in the last {now - self._last:.0f}s."
+            )
+        logger.warning(message)
+        self._last = now
+        self._suppressed = 0
+
+
+_waveform_failure_warning = _RateLimitedWarning()
+_weight_cache = LRUCache(maxsize=0)
+# output buffers leased by _generate_into_buffers, oldest first
+_buffer_leases = collections.deque()
+# source functions which have been warned about not supporting reuse_buffers
+_unsupported_buffer_warnings = set()
+
+
 def multi_model_binary_black_hole(
     frequency_array, mass_1, mass_2, luminosity_distance, a_1, tilt_1,
     phi_12, a_2, tilt_2, phi_jl, theta_jn, phase, **kwargs
@@ -51,11 +95,60 @@ def multi_model_binary_black_hole(
               to use the Spin-Taylor (ST) variant of IMRPhenomXPHM.
             - match_interpolant: the interpolant you wish to use to estimate the
               match for a given region in the parameter space
+            - interpolant_bundle: path to a binary bundle of compiled
+              interpolants, see bilby_nr.interp.pade_pade.save_bundle. If
+              provided, the interpolants are loaded from the bundle rather
+              than parsed from the coefficient files. Populated
+              automatically when the analysis is set up with bilby_pipe
             - use_best_match: always use the model with the best match to
               evaluate the likelihood
             - match_to_weight: a string that can be evaluated to map an array
               of matches to a series of weights. The model will then be
               chosen probabilistically based on the weights.
+            - weight_cache_size: the maximum number of weights to store in
+              memory. Weights depend only on the masses and spins, meaning
+              that cached weights can be reused when the sampler only
+              changes other parameters. Default 0, i.e. no caching
+            - weight_cache_tolerance: masses and spins are rounded to the
+              nearest multiple of this tolerance before they are used as a
+              cache key, so weights for masses and spins which differ by at
+              most the tolerance may share a cache entry. Either a single
+              tolerance or a dictionary containing the tolerance for each of
+              'mass_1', 'mass_2', 'a_1', 'tilt_1', 'phi_12', 'a_2', 'tilt_2'
+              and 'phi_jl'. Tolerances for masses are relative and
+              tolerances for spins and angles are absolute. Parameters
+              without a tolerance must match exactly. Default 0, i.e.
+              masses and spins must match exactly
+            - waveform_fallback: if True and the drawn waveform approximant
+              fails to generate a waveform, the weights are renormalised
+              over the remaining models and another approximant is drawn.
+              Default False
+            - max_waveform_attempts: the maximum number of approximants to
+              try for a single likelihood call when waveform_fallback is
+              True. Default None, i.e. every approximant with a non-zero
+              weight is tried
+            - reuse_buffers: if True, the polarizations are written into
+              preallocated output buffers which are reused across calls
+              rather than allocating new arrays for each call. This only
+              applies to source functions which set `supports_out = True`
+              and accept an `out` argument, e.g. the synthetic backend. The
+              bilby LAL and gwsignal source functions allocate their own
+              arrays, so a warning is logged and new arrays are allocated
+              for each call if reuse_buffers is requested for them. The
+              returned
+              polarizations are read-only and may be overwritten by the
+              second subsequent call, so they must be copied if they are
+              needed for longer. Default False
+            - waveform_cache_directory: directory used to store generated
+              polarizations on disk. Polarizations are keyed by a hash of
+              the source function, parameters, waveform arguments and
+              frequency array, meaning that reruns of conversion, plotting
+              or reweighting on the same samples load the polarizations
+              rather than regenerating them. The cache may be shared by
+              several processes. Default None, i.e. no caching
+            - waveform_cache_max_size: maximum size of the on-disk cache in
+              GB. The least recently used entries are removed once the
+              maximum size is reached. Default 1
 
     Returns
     -------
@@ -72,20 +165,27 @@ def multi_model_binary_black_hole(
         waveform_approximant_list
     )
     match_interpolant = kwargs.pop("match_interpolant", None)
-    catch_waveform_errors = kwargs.get("catch_waveform_errors", False)
+    _use_interpolant_bundle(kwargs)
+    maybe_save_state()
+    # waveform errors are caught here rather than in bilby so that
+    # failures are aggregated and warnings are rate limited
+    catch_waveform_errors = kwargs.pop("catch_waveform_errors", False)
     try:
-        if match_interpolant is not None:
-            return _multi_model_match_informed_binary_black_hole(
-                match_interpolant, waveform_approximant_list, frequency_array,
-                mass_1, mass_2, luminosity_distance, a_1, tilt_1, phi_12, a_2,
-                tilt_2, phi_jl, theta_jn, phase, **kwargs
+        with instrumentation.timer("total"):
+            if match_interpolant is not None:
+                return _multi_model_match_informed_binary_black_hole(
+                    match_interpolant, waveform_approximant_list,
+                    frequency_array, mass_1, mass_2, luminosity_distance, a_1,
+                    tilt_1, phi_12, a_2, tilt_2, phi_jl, theta_jn, phase,
+                    **kwargs
+                )
+            return _multi_model_binary_black_hole(
+                np.ones(len(waveform_approximant_list)) /
+                len(waveform_approximant_list),
+                waveform_approximant_list, frequency_array, mass_1, mass_2,
+                luminosity_distance, a_1, tilt_1, phi_12, a_2, tilt_2, phi_jl,
+                theta_jn, phase, **kwargs
             )
-        return _multi_model_binary_black_hole(
-            np.ones(len(waveform_approximant_list)) / len(waveform_approximant_list),
-            waveform_approximant_list, frequency_array, mass_1, mass_2,
-            luminosity_distance, a_1, tilt_1, phi_12, a_2, tilt_2, phi_jl, theta_jn,
-            phase, **kwargs
-        )
     except Exception as e:
         if not catch_waveform_errors:
             raise
@@ -97,7 +197,7 @@ def multi_model_binary_black_hole(
             luminosity_distance=luminosity_distance,
             theta_jn=theta_jn, phase=phase,
         )
-        logger.warning(
+        _waveform_failure_warning(
             "Evaluating the waveform failed with error: {}\n".format(e) +
             "The parameters were {}\n".format(failed_parameters) +
             "Likelihood will be set to -inf."
@@ -105,6 +205,532 @@ def multi_model_binary_black_hole(
         return None
 
 
+def indexed_multi_model_binary_black_hole(
+    frequency_array, mass_1, mass_2, luminosity_distance, a_1, tilt_1,
+    phi_12, a_2, tilt_2, phi_jl, theta_jn, phase, waveform_index, **kwargs
+):
+    """Source model for a binary black hole with multiple models where the
+    waveform approximant is chosen by a sampled parameter, the
+    `waveform_index`, rather than drawn inside the source model, see
+    https://arxiv.org/abs/2208.00106. The likelihood is therefore
+    deterministic and the waveform approximant used for each posterior
+    sample is stored in the posterior. The interpolant weights should be
+    included through the prior on `waveform_index`, see
+    bilby_nr.prior.ModelIndexPrior
+
+    Parameters
+    ----------
+    frequency_array: np.ndarray
+        The frequency array
+    mass_1: float
+        The mass of the primary black hole
+    mass_2: float
+        The mass of the secondary black hole
+    luminosity_distance: float
+        The luminosity distance
+    a_1: float
+        The dimensionless spin magnitude of the primary black hole
+    tilt_1: float
+        The tilt angle of the primary black hole spin
+    phi_12: float
+        The difference in azimuthal angle between the two spins
+    a_2: float
+        The dimensionless spin magnitude of the secondary black hole
+    tilt_2: float
+        The tilt angle of the secondary black hole spin
+    phi_jl: float
+        The azimuthal angle of the total angular momentum
+    theta_jn: float
+        The angle between the total angular momentum and the line of sight
+    phase: float
+        The phase of the gravitational wave
+    waveform_index: int
+        The index of the waveform approximant in the waveform_approximant_list
+    kwargs: dict
+        Additional keyword arguments. The same arguments as
+        `multi_model_binary_black_hole` are supported. Arguments which are
+        used to weight the waveform approximants are ignored
+
+    Returns
+    -------
+    polarizations: dict
+        The polarizations
+    """
+    waveform_approximant_list = kwargs.pop("waveform_approximant_list", None)
+    if waveform_approximant_list is None:
+        raise ValueError(
+            "Please provide a list of waveforms to sample over via the "
+            "waveform_approximant_list waveform argument"
+        )
+    waveform_approximant_list = convert_waveform_list_from_input(
+        waveform_approximant_list
+    )
+    _use_interpolant_bundle(kwargs)
+    maybe_save_state()
+    for key in [
+        "match_interpolant", "use_best_match", "match_to_weight",
+        "weight_cache_size", "weight_cache_tolerance", "waveform_fallback",
+        "max_waveform_attempts"
+    ]:
+        kwargs.pop(key, None)
+    catch_waveform_errors = kwargs.pop("catch_waveform_errors", False)
+    waveform_approximant = waveform_approximant_from_index(
+        waveform_index, waveform_approximant_list
+    )
+    statistics.record_draw(waveform_approximant)
+    kwargs["waveform_approximant"] = waveform_approximant
+    polarizations = None
+    start = time.perf_counter()
+    try:
+        with instrumentation.timer("total"):
+            polarizations = _generate_polarizations(
+                frequency_array, mass_1, mass_2, luminosity_distance, a_1,
+                tilt_1, phi_12, a_2, tilt_2, phi_jl, theta_jn, phase, **kwargs
+            )
+    except Exception as e:
+        if not catch_waveform_errors:
+            raise
+        _waveform_failure_warning(
+            f"Evaluating the waveform with {waveform_approximant} failed "
+            f"with error: {e}\nLikelihood will be set to -inf."
+        )
+    finally:
+        elapsed = time.perf_counter() - start
+        statistics.record_waveform(
+            waveform_approximant, elapsed, failed=polarizations is None
+        )
+        instrumentation.record(
+            "waveform", elapsed, approximant=waveform_approximant
+        )
+    return polarizations
+
+
+def waveform_approximant_from_index(waveform_index, waveform_approximant_list):
+    """Return the waveform approximant for a given waveform index
+
+    Parameters
+    ----------
+    waveform_index: int, np.ndarray
+        the index of the waveform approximant in the list
+    waveform_approximant_list: list
+        list of waveform approximants
+
+    Returns
+    -------
+    waveform_approximant: str, np.ndarray
+        the waveform approximant for each index
+    """
+    index = np.round(np.asarray(waveform_index, dtype=float)).astype(int)
+    if np.any(index < 0) or np.any(index >= len(waveform_approximant_list)):
+        raise ValueError(
+            f"Waveform index {waveform_index} is outside of the range of "
+            f"the waveform approximant list {waveform_approximant_list}"
+        )
+    models = np.asarray(waveform_approximant_list)[index]
+    if np.ndim(models) == 0:
+        return str(models)
+    return models
+
+
+_BATCH_PARAMETERS = [
+    "mass_1", "mass_2", "luminosity_distance", "a_1", "tilt_1", "phi_12",
+    "a_2", "tilt_2", "phi_jl", "theta_jn", "phase"
+]
+
+
+def multi_model_binary_black_hole_batch(
+    frequency_array, parameters, npool=1, chunk_size=16,
+    record_statistics=False, **kwargs
+):
+    """Generate the polarizations for many parameter sets with multiple
+    models. The weights for all parameter sets are calculated with a single
+    (vectorized) interpolant call and the models are drawn in bulk. Rows are
+    then grouped by waveform approximant so that each model is evaluated
+    back-to-back with its waveform arguments prepared once. Results are
+    yielded as they are generated to keep memory usage bounded.
+
+    Parameters
+    ----------
+    frequency_array: np.ndarray
+        The frequency array
+    parameters: dict, pandas.DataFrame
+        table of parameters. Must contain the columns 'mass_1', 'mass_2',
+        'luminosity_distance', 'a_1', 'tilt_1', 'phi_12', 'a_2', 'tilt_2',
+        'phi_jl', 'theta_jn' and 'phase'. Additional columns are ignored
+    npool: int, optional
+        number of processes to use when generating the polarizations.
+        Default 1
+    chunk_size: int, optional
+        number of rows to send to each process at once. Only used when
+        npool > 1. Default 16
+    record_statistics: bool, optional
+        if True, record the weights, draws and waveform evaluations in the
+        model selection statistics, see bilby_nr.statistics. By default
+        batch evaluations, e.g. during post-processing, are not recorded so
+        that the statistics only describe the likelihood calls made by the
+        sampler. Default False
+    kwargs: dict
+        Additional keyword arguments. The same arguments as
+        `multi_model_binary_black_hole` are supported except
+        weight_cache_size, weight_cache_tolerance, waveform_fallback,
+        max_waveform_attempts and reuse_buffers. reuse_buffers is ignored
+        because each chunk is generated before any row is yielded, so
+        reused buffers would be overwritten before they are returned
+
+    Yields
+    ------
+    index: int
+        the row of the parameter table
+    waveform_approximant: str
+        the waveform approximant that was drawn for this row
+    polarizations: dict
+        The polarizations. None if the waveform generation failed and
+        catch_waveform_errors is True
+    """
+    waveform_approximant_list = kwargs.pop("waveform_approximant_list", None)
+    if waveform_approximant_list is None:
+        raise ValueError(
+            "Please provide a list of waveforms to sample over via the "
+            "waveform_approximant_list waveform argument"
+        )
+    waveform_approximant_list = convert_waveform_list_from_input(
+        waveform_approximant_list
+    )
+    columns = {
+        key: np.atleast_1d(np.asarray(parameters[key], dtype=float)) for key
+        in _BATCH_PARAMETERS
+    }
+    nrows = len(columns["mass_1"])
+    match_interpolant = kwargs.pop("match_interpolant", None)
+    _use_interpolant_bundle(kwargs)
+    use_best = kwargs.pop("use_best_match", False)
+    mapping = kwargs.pop("match_to_weight", None)
+    for key in [
+        "weight_cache_size", "weight_cache_tolerance", "waveform_fallback",
+        "max_waveform_attempts", "reuse_buffers"
+    ]:
+        kwargs.pop(key, None)
+    catch_waveform_errors = kwargs.pop("catch_waveform_errors", False)
+
+    with instrumentation.timer("batch_weights"):
+        weights = _weights_for_samples(
+            waveform_approximant_list, columns, match_interpolant=(
+                match_interpolant
+            ), use_best=use_best, mapping=mapping
+        )
+    if not np.all(np.any(weights, axis=1)):
+        raise ValueError(
+            "Input domain error. All weights are non-numeric. Please provide a "
+            "numeric weight for each approximant in the list"
+        )
+    with instrumentation.timer("batch_draw"):
+        cumulative = np.cumsum(weights, axis=1)
+        cumulative /= cumulative[:, -1:]
+        draws = np.argmax(
+            np.random.uniform(size=(nrows, 1)) < cumulative, axis=1
+        )
+    if record_statistics:
+        for row in range(nrows):
+            statistics.record_weights(waveform_approximant_list, weights[row])
+            statistics.record_draw(waveform_approximant_list[draws[row]])
+
+    pool = None
+    if npool > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(npool)
+    try:
+        for num, waveform_approximant in enumerate(waveform_approximant_list):
+            rows, = np.where(draws == num)
+            if not len(rows):
+                continue
+            function, _kwargs = _prepare_waveform_arguments(
+                **dict(kwargs, waveform_approximant=waveform_approximant)
+            )
+            chunks = [
+                (
+                    function, frequency_array, _kwargs, catch_waveform_errors,
+                    rows[idx:idx + chunk_size], [
+                        columns[key][rows[idx:idx + chunk_size]] for key in
+                        _BATCH_PARAMETERS
+                    ]
+                ) for idx in range(0, len(rows), chunk_size)
+            ]
+            if pool is None:
+                results = map(_generate_batch_chunk, chunks)
+            else:
+                results = pool.imap(_generate_batch_chunk, chunks)
+            for chunk in results:
+                for index, polarizations, elapsed in chunk:
+                    if record_statistics:
+                        statistics.record_waveform(
+                            waveform_approximant, elapsed,
+                            failed=polarizations is None
+                        )
+                    instrumentation.record(
+                        "waveform", elapsed, approximant=waveform_approximant
+                    )
+                    yield int(index), waveform_approximant, polarizations
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def _weights_for_samples(
+    waveform_approximant_list, samples, match_interpolant=None,
+    use_best=False, mapping=None
+):
+    """Calculate the weight assigned to each waveform approximant for many
+    samples at once. The interpolant is called once per approximant with
+    arrays of masses and spins
+
+    Parameters
+    ----------
+    waveform_approximant_list: list
+        list of waveform approximants
+    samples: dict, pandas.DataFrame
+        table of samples. Must contain the columns 'mass_1', 'mass_2',
+        'a_1', 'tilt_1', 'phi_12', 'a_2', 'tilt_2', 'phi_jl', 'theta_jn'
+        and 'phase'
+    match_interpolant: str, optional
+        the interpolant you wish to use to estimate the match. If None,
+        all approximants are given equal weight. Default None
+    use_best: bool, optional
+        if True, give all weight to the approximant with the highest match.
+        Default False
+    mapping: str, optional
+        a string that can be evaluated to map an array of matches to a series
+        of weights. See `_weights_from_matches`
+
+    Returns
+    -------
+    weights: np.ndarray
+        array of shape (nsamples, len(waveform_approximant_list)) containing
+        the weights
+    """
+    if match_interpolant is None:
+        nsamples = len(np.atleast_1d(samples["mass_1"]))
+        weights = np.ones((nsamples, len(waveform_approximant_list)))
+        return weights / len(waveform_approximant_list)
+    if isinstance(use_best, str):
+        use_best = ast.literal_eval(use_best)
+    _matches = _matches_for_samples(
+        waveform_approximant_list, samples, match_interpolant
+    )
+    # protect against negative matches
+    _matches[_matches < 0.] = 0.
+    return _weights_from_matches(_matches, use_best=use_best, mapping=mapping)
+
+
+def _use_interpolant_bundle(kwargs):
+    """Remove the interpolant_bundle entry from the waveform arguments and,
+    if provided, load the compiled interpolants from the bundle
+
+    Parameters
+    ----------
+    kwargs: dict
+        waveform arguments
+    """
+    filename = kwargs.pop("interpolant_bundle", None)
+    if filename is not None:
+        from .interp.pade_pade import use_bundle
+        use_bundle(filename)
+
+
+def validate_weight_arguments(
+    waveform_approximant_list, match_interpolant=None, use_best=False,
+    mapping=None
+):
+    """Check that the arguments used to weight the waveform approximants
+    can be used to calculate weights. The weights are calculated for a
+    single sample in the domain of the interpolant
+
+    Parameters
+    ----------
+    waveform_approximant_list: list
+        list of waveform approximants
+    match_interpolant: str, optional
+        the interpolant used to estimate the match. Default None
+    use_best: bool, str, optional
+        if True, give all weight to the approximant with the highest match.
+        Default False
+    mapping: str, optional
+        a string that can be evaluated to map an array of matches to a series
+        of weights. See `_weights_from_matches`
+
+    Raises
+    ------
+    ValueError
+        if the weights can not be calculated
+    """
+    if isinstance(use_best, str):
+        try:
+            use_best = ast.literal_eval(use_best)
+        except (ValueError, SyntaxError):
+            use_best = None
+    if not isinstance(use_best, bool):
+        raise ValueError(
+            f"use_best_match must be either True or False, not {use_best}"
+        )
+    if match_interpolant is not None:
+        _import_interpolant(match_interpolant)
+    sample = {
+        "mass_1": 60., "mass_2": 40., "a_1": 0.5, "tilt_1": 1., "phi_12": 1.,
+        "a_2": 0.5, "tilt_2": 1., "phi_jl": 1., "theta_jn": 1., "phase": 1.,
+    }
+    try:
+        weights = _weights_for_samples(
+            waveform_approximant_list, sample,
+            match_interpolant=match_interpolant, use_best=use_best,
+            mapping=mapping
+        )
+        if match_interpolant is None and mapping is not None:
+            weights = _weights_from_matches(
+                np.full((1, len(waveform_approximant_list)), 0.9),
+                use_best=use_best, mapping=mapping
+            )
+    except Exception as e:
+        raise ValueError(f"Unable to calculate weights because: {e}")
+    if not np.all(np.isfinite(weights)) or not np.any(weights):
+        raise ValueError(
+            f"Invalid weights {weights[0]} calculated for the waveform "
+            f"approximants {waveform_approximant_list}"
+        )
+
+
+def _matches_for_samples(waveform_approximant_list, samples, match_interpolant):
+    """Calculate the match for each waveform approximant for many samples at
+    once. The interpolant is called once per approximant with arrays of
+    masses and spins
+
+    Parameters
+    ----------
+    waveform_approximant_list: list
+        list of waveform approximants
+    samples: dict, pandas.DataFrame
+        table of samples. See `_weights_for_samples`
+    match_interpolant: str
+        the interpolant you wish to use to estimate the match
+
+    Returns
+    -------
+    matches: np.ndarray
+        array of shape (nsamples, len(waveform_approximant_list)) containing
+        the matches
+    """
+    columns = [
+        np.atleast_1d(np.asarray(samples[key], dtype=float)) for key in
+        _BATCH_PARAMETERS if key != "luminosity_distance"
+    ]
+    method = _import_interpolant(match_interpolant)
+    return np.array([
+        np.broadcast_to(method(wvf, *columns), columns[0].shape) for wvf in
+        waveform_approximant_list
+    ], dtype=float).T
+
+
+def _generate_batch_chunk(args):
+    """Generate the polarizations for a chunk of rows which share the same
+    waveform approximant
+
+    Parameters
+    ----------
+    args: tuple
+        tuple containing the source function, frequency array, waveform
+        arguments, whether or not to catch waveform errors, the row indices
+        and a list of parameter arrays ordered as _BATCH_PARAMETERS
+
+    Returns
+    -------
+    results: list
+        list of tuples containing the row index, polarizations and the time
+        taken to generate the polarizations
+    """
+    function, frequency_array, kwargs, catch_waveform_errors, rows, columns = (
+        args
+    )
+    results = []
+    for num, index in enumerate(rows):
+        start = time.perf_counter()
+        try:
+            polarizations = function(
+                frequency_array, *[column[num] for column in columns],
+                **kwargs.copy()
+            )
+        except Exception as e:
+            if not catch_waveform_errors:
+                raise
+            _waveform_failure_warning(
+                "Evaluating the waveform failed with error: {}\n".format(e) +
+                "The parameters were {}".format(
+                    dict(zip(
+                        _BATCH_PARAMETERS, [column[num] for column in columns]
+                    ))
+                )
+            )
+            polarizations = None
+        results.append((index, polarizations, time.perf_counter() - start))
+    return results
+
+
+_WEIGHT_CACHE_PARAMETERS = [
+    "mass_1", "mass_2", "a_1", "tilt_1", "phi_12", "a_2", "tilt_2", "phi_jl"
+]
+
+
+def _weight_cache_tolerance(tolerance):
+    """Return the tolerance used to quantise each parameter in the weight
+    cache key
+
+    Parameters
+    ----------
+    tolerance: float, str, dict
+        either a single tolerance or a dictionary containing the tolerance
+        for each parameter. Parameters which are not in the dictionary are
+        given a tolerance of 0
+
+    Returns
+    -------
+    tolerance: list
+        the tolerance for each parameter in `_WEIGHT_CACHE_PARAMETERS`
+    """
+    if isinstance(tolerance, str):
+        tolerance = ast.literal_eval(tolerance)
+    if isinstance(tolerance, dict):
+        unknown = set(tolerance) - set(_WEIGHT_CACHE_PARAMETERS)
+        if unknown:
+            raise ValueError(
+                f"Unable to set a weight cache tolerance for "
+                f"{', '.join(sorted(unknown))}. Tolerances can only be "
+                f"provided for {', '.join(_WEIGHT_CACHE_PARAMETERS)}"
+            )
+        return [
+            float(tolerance.get(key, 0.)) for key in _WEIGHT_CACHE_PARAMETERS
+        ]
+    return [float(tolerance)] * len(_WEIGHT_CACHE_PARAMETERS)
+
+
+def _import_interpolant(interpolant):
+    """Import and return an interpolant function from its full path
+
+    Parameters
+    ----------
+    interpolant: str
+        full path to the interpolant function, e.g.
+        'bilby_nr.match.match_from_pade_pade_interpolant'
+    """
+    import importlib
+    try:
+        _split = interpolant.split(".")
+        _module = ".".join(_split[:-1])
+        _function = _split[-1]
+        module = importlib.import_module(_module)
+        method = getattr(module, _function)
+    except Exception as e:
+        raise ValueError(f"Unable to import interpolant function because: {e}")
+    return method
+
+
 def _multi_model_match_informed_binary_black_hole(
     interpolant, waveform_approximant_list, frequency_array, mass_1, mass_2,
     luminosity_distance, a_1, tilt_1, phi_12, a_2, tilt_2, phi_jl, theta_jn,
@@ -153,31 +779,50 @@ def _multi_model_match_informed_binary_black_hole(
     polarizations: dict
         The polarizations
     """
-    import importlib
-    try:
-        _split = interpolant.split(".")
-        _module = ".".join(_split[:-1])
-        _function = _split[-1]
-        module = importlib.import_module(_module)
-        method = getattr(module, _function)
-    except Exception as e:
-        raise ValueError(f"Unable to import interpolant function because: {e}")
-
-    _matches = np.array(
-        [
-            method(
-                wvf, mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2, phi_jl,
-                theta_jn, phase, 
-            ) for wvf in waveform_approximant_list
-        ]
-    )
-    # protect against negative matches
-    _matches[_matches < 0.] = 0.
+    method = _import_interpolant(interpolant)
     use_best = kwargs.pop("use_best_match", False)
     mapping = kwargs.pop("match_to_weight", None)
+    cache_size = int(kwargs.pop("weight_cache_size", 0))
+    cache_tolerance = _weight_cache_tolerance(
+        kwargs.pop("weight_cache_tolerance", 0.)
+    )
     if isinstance(use_best, str):
         use_best = ast.literal_eval(use_best)
-    _weights = _weights_from_matches(_matches, use_best=use_best, mapping=mapping)
+    _weights, key = None, None
+    if cache_size > 0:
+        _weight_cache.maxsize = cache_size
+        key = (
+            interpolant, tuple(waveform_approximant_list), bool(use_best),
+            mapping
+        ) + quantise(
+            # masses are quantised in log space so that their tolerance is
+            # relative
+            [
+                np.log(mass_1), np.log(mass_2), a_1, tilt_1, phi_12, a_2,
+                tilt_2, phi_jl
+            ], tolerance=cache_tolerance
+        )
+        _weights = _weight_cache.get(key)
+        instrumentation.increment(
+            "weight_cache_hit" if _weights is not None else "weight_cache_miss"
+        )
+    if _weights is None:
+        _matches = np.zeros(len(waveform_approximant_list))
+        for num, wvf in enumerate(waveform_approximant_list):
+            with instrumentation.timer("interpolant", approximant=wvf):
+                _matches[num] = method(
+                    wvf, mass_1, mass_2, a_1, tilt_1, phi_12, a_2, tilt_2,
+                    phi_jl, theta_jn, phase,
+                )
+        # protect against negative matches
+        _matches[_matches < 0.] = 0.
+        with instrumentation.timer("weights"):
+            _weights = _weights_from_matches(
+                _matches, use_best=use_best, mapping=mapping
+            )
+        if key is not None:
+            _weights.flags.writeable = False
+            _weight_cache[key] = _weights
     return _multi_model_binary_black_hole(
         _weights, waveform_approximant_list, frequency_array, mass_1, mass_2,
         luminosity_distance, a_1, tilt_1, phi_12, a_2, tilt_2, phi_jl,
@@ -232,6 +877,10 @@ def _multi_model_binary_black_hole(
     polarizations: dict
         The polarizations
     """
+    fallback = kwargs.pop("waveform_fallback", False)
+    max_attempts = kwargs.pop("max_waveform_attempts", None)
+    if isinstance(fallback, str):
+        fallback = ast.literal_eval(fallback)
     if not np.any(weights):
         raise ValueError(
             "Input domain error. All weights are non-numeric. Please provide a "
@@ -241,33 +890,401 @@ def _multi_model_binary_black_hole(
         raise ValueError(
             "Please provide a weight for each approximant in the list"
         )
+    statistics.record_weights(waveform_approximant_list, weights)
+    if not fallback:
+        attempts = 1
+    elif max_attempts is None:
+        attempts = len(waveform_approximant_list)
     else:
-        waveform_approximant = np.random.choice(
-            waveform_approximant_list, p=weights
-        )
-    kwargs["waveform_approximant"] = waveform_approximant
-    # only use gwsignal for reviewed waveforms. This should be changed when
-    # bilby updates their review statement
-    if waveform_approximant in ["SEOBNRv5HM", "SEOBNRv5PHM"]:
-        return source.gwsignal_binary_black_hole(
-            frequency_array, mass_1, mass_2, luminosity_distance, a_1, tilt_1,
-            phi_12, a_2, tilt_2, phi_jl, theta_jn, phase, **kwargs
-        )
-    if waveform_approximant == "IMRPhenomXPHMST":
-        kwargs.update(
-            {
-                "waveform_approximant": "IMRPhenomXPHM",
-                "PhenomXPrecVersion": 320,
-                "PhenomXPFinalSpinMod": 2,
-                "PhenomXHMReleaseVersion": 122022
-            }
-        )
-    return source.lal_binary_black_hole(
+        attempts = max(int(max_attempts), 1)
+    # cached weights are read-only so we take a copy before renormalising
+    weights = np.array(weights, dtype=float)
+    for attempt in range(attempts):
+        with instrumentation.timer("draw"):
+            index = np.random.choice(len(waveform_approximant_list), p=weights)
+        waveform_approximant = waveform_approximant_list[index]
+        if not attempt:
+            statistics.record_draw(waveform_approximant)
+        kwargs["waveform_approximant"] = waveform_approximant
+        polarizations = None
+        start = time.perf_counter()
+        try:
+            polarizations = _generate_polarizations(
+                frequency_array, mass_1, mass_2, luminosity_distance, a_1,
+                tilt_1, phi_12, a_2, tilt_2, phi_jl, theta_jn, phase,
+                **kwargs.copy()
+            )
+        except Exception as e:
+            weights[index] = 0.
+            if attempt + 1 == attempts or not np.any(weights):
+                raise
+            weights /= np.sum(weights)
+            _waveform_failure_warning(
+                f"Evaluating the waveform with {waveform_approximant} failed "
+                f"with error: {e}\nFalling back to the remaining models."
+            )
+            continue
+        finally:
+            elapsed = time.perf_counter() - start
+            statistics.record_waveform(
+                waveform_approximant, elapsed, failed=polarizations is None
+            )
+            instrumentation.record(
+                "waveform", elapsed, approximant=waveform_approximant
+            )
+        if attempt:
+            statistics.record_fallback(waveform_approximant)
+        return polarizations
+
+
+def _generate_polarizations(
+    frequency_array, mass_1, mass_2, luminosity_distance, a_1, tilt_1, phi_12,
+    a_2, tilt_2, phi_jl, theta_jn, phase, **kwargs
+):
+    """Generate the GW polarizations for the waveform approximant stored in
+    kwargs['waveform_approximant']
+
+    Parameters
+    ----------
+    frequency_array: np.ndarray
+        The frequency array
+    mass_1: float
+        The mass of the primary black hole
+    mass_2: float
+        The mass of the secondary black hole
+    luminosity_distance: float
+        The luminosity distance
+    a_1: float
+        The dimensionless spin magnitude of the primary black hole
+    tilt_1: float
+        The tilt angle of the primary black hole spin
+    phi_12: float
+        The difference in azimuthal angle between the two spins
+    a_2: float
+        The dimensionless spin magnitude of the secondary black hole
+    tilt_2: float
+        The tilt angle of the secondary black hole spin
+    phi_jl: float
+        The azimuthal angle of the total angular momentum
+    theta_jn: float
+        The angle between the total angular momentum and the line of sight
+    phase: float
+        The phase of the gravitational wave
+    kwargs: dict
+        Additional keyword arguments. Must include 'waveform_approximant'
+
+    Returns
+    -------
+    polarizations: dict
+        The polarizations
+    """
+    function, kwargs = _prepare_waveform_arguments(**kwargs)
+    return function(
         frequency_array, mass_1, mass_2, luminosity_distance, a_1, tilt_1,
         phi_12, a_2, tilt_2, phi_jl, theta_jn, phase, **kwargs
     )
 
 
+def _prepare_waveform_arguments(**kwargs):
+    """Return the source function and waveform arguments required to
+    generate the GW polarizations for the waveform approximant stored in
+    kwargs['waveform_approximant']. The source function is looked up in the
+    backend registry, see `register_backend`
+
+    Parameters
+    ----------
+    kwargs: dict
+        Waveform arguments. Must include 'waveform_approximant'
+
+    Returns
+    -------
+    function: func
+        the source function to call
+    kwargs: dict
+        the waveform arguments to pass to the source function
+    """
+    reuse_buffers = kwargs.pop("reuse_buffers", False)
+    if isinstance(reuse_buffers, str):
+        reuse_buffers = ast.literal_eval(reuse_buffers)
+    cache_directory = kwargs.pop("waveform_cache_directory", None)
+    cache_size = float(kwargs.pop("waveform_cache_max_size", 1.))
+    function, waveform_arguments = get_backend(kwargs["waveform_approximant"])
+    kwargs.update(waveform_arguments)
+    name = (
+        f"{getattr(function, '__module__', '')}."
+        f"{getattr(function, '__qualname__', type(function).__name__)}"
+    )
+    if reuse_buffers and getattr(function, "supports_out", False):
+        function = functools.partial(_generate_into_buffers, function)
+    elif reuse_buffers and name not in _unsupported_buffer_warnings:
+        _unsupported_buffer_warnings.add(name)
+        logger.warning(
+            f"The source function {name} used for "
+            f"{kwargs['waveform_approximant']} does not support writing into "
+            f"preallocated buffers. reuse_buffers will be ignored and new "
+            f"arrays will be allocated for each call"
+        )
+    if cache_directory is not None:
+        function = functools.partial(
+            _generate_with_disk_cache,
+            get_disk_cache(cache_directory, max_size=cache_size), name,
+            function
+        )
+    return function, kwargs
+
+
+def _generate_with_disk_cache(cache, name, function, frequency_array, *args,
+                              **kwargs):
+    """Return the GW polarizations from an on-disk cache if they have been
+    generated before, otherwise generate and store them
+
+    Parameters
+    ----------
+    cache: bilby_nr.cache.DiskCache
+        the cache to use
+    name: str
+        full path to the source function, used to distinguish backends
+    function: func
+        the source function to call
+    frequency_array: np.ndarray
+        The frequency array
+    args: tuple
+        arguments to pass to the source function
+    kwargs: dict
+        keyword arguments to pass to the source function
+
+    Returns
+    -------
+    polarizations: dict
+        The polarizations. Polarizations loaded from the cache are read-only
+        memory-mapped arrays
+    """
+    key = waveform_key(name, args, kwargs, frequency_array)
+    polarizations = cache.get(key)
+    if polarizations is not None:
+        instrumentation.increment("disk_cache_hit")
+        return polarizations
+    instrumentation.increment("disk_cache_miss")
+    polarizations = function(frequency_array, *args, **kwargs)
+    if polarizations is not None:
+        try:
+            cache[key] = polarizations
+        except OSError as e:
+            logger.debug(f"Unable to store waveform in the disk cache: {e}")
+    return polarizations
+
+
+def _generate_into_buffers(function, frequency_array, *args, **kwargs):
+    """Generate the GW polarizations into preallocated output buffers. The
+    buffers are leased from `bilby_nr.buffers.buffers` and are marked as
+    read-only once they have been filled. The buffers returned by a call are
+    released, and may therefore be overwritten, by the second subsequent
+    call, i.e. the polarizations of the previous call are always intact.
+    Buffers are released immediately if the waveform could not be generated
+
+    Parameters
+    ----------
+    function: func
+        source function which accepts an `out` keyword argument. The source
+        function must write every element of the arrays in `out`
+    frequency_array: np.ndarray
+        The frequency array
+    args: tuple
+        arguments to pass to the source function
+    kwargs: dict
+        keyword arguments to pass to the source function
+
+    Returns
+    -------
+    polarizations: dict
+        The polarizations
+    """
+    from .buffers import buffers
+    if len(_buffer_leases) > 1:
+        buffers.release(_buffer_leases.popleft())
+    out = buffers.acquire(np.shape(frequency_array))
+    try:
+        polarizations = function(frequency_array, *args, out=out, **kwargs)
+    except Exception:
+        buffers.release(out)
+        raise
+    if polarizations is None:
+        buffers.release(out)
+    else:
+        _buffer_leases.append(out)
+        buffers.lock(polarizations)
+    return polarizations
+
+
+def register_backend(waveform_approximant, function, waveform_arguments=None):
+    """Register the source function used to generate the GW polarizations for
+    a given waveform approximant. Registering an approximant which is already
+    in the registry replaces the existing backend. Backends must be
+    registered before a pool is created with the 'spawn' start method for
+    them to be available in pool workers
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        Name of the waveform approximant
+    function: func
+        source function with the same signature as
+        bilby.gw.source.lal_binary_black_hole. If the function sets
+        `supports_out = True`, it must also accept an `out` argument, see
+        `reuse_buffers` in `multi_model_binary_black_hole`. If the function
+        sets `releases_gil = True`, waveforms may be generated from multiple
+        threads, see
+        bilby_nr.conversion.determine_waveform_approximant_from_likelihood
+    waveform_arguments: dict, optional
+        waveform arguments which are passed to the source function in
+        addition to those provided by the user. These take precedence over
+        the user provided arguments. Default None
+    """
+    _BACKENDS[waveform_approximant] = (
+        function, dict(waveform_arguments or {})
+    )
+
+
+def get_backend(waveform_approximant):
+    """Return the source function and additional waveform arguments for a
+    given waveform approximant. Approximants which are not in the registry
+    are generated with bilby.gw.source.lal_binary_black_hole
+
+    Parameters
+    ----------
+    waveform_approximant: str
+        Name of the waveform approximant
+
+    Returns
+    -------
+    function: func
+        the source function to call
+    waveform_arguments: dict
+        additional waveform arguments to pass to the source function
+    """
+    if waveform_approximant in _BACKENDS:
+        return _BACKENDS[waveform_approximant]
+    return source.lal_binary_black_hole, {}
+
+
+def synthetic_binary_black_hole(
+    frequency_array, mass_1, mass_2, luminosity_distance, a_1, tilt_1,
+    phi_12, a_2, tilt_2, phi_jl, theta_jn, phase, out=None, **kwargs
+):
+    """Cheap analytic stand-in for a waveform model which can be used to
+    benchmark and test bilby_nr without calling LAL or pyseobnr. The
+    polarizations are given by the leading order stationary phase
+    approximation to the inspiral, truncated at the innermost stable circular
+    orbit. Spins are ignored. An artificial cost can be added to mimic an
+    expensive waveform model
+
+    Parameters
+    ----------
+    frequency_array: np.ndarray
+        The frequency array
+    mass_1: float
+        The mass of the primary black hole
+    mass_2: float
+        The mass of the secondary black hole
+    luminosity_distance: float
+        The luminosity distance
+    a_1: float
+        The dimensionless spin magnitude of the primary black hole. Ignored
+    tilt_1: float
+        The tilt angle of the primary black hole spin. Ignored
+    phi_12: float
+        The difference in azimuthal angle between the two spins. Ignored
+    a_2: float
+        The dimensionless spin magnitude of the secondary black hole. Ignored
+    tilt_2: float
+        The tilt angle of the secondary black hole spin. Ignored
+    phi_jl: float
+        The azimuthal angle of the total angular momentum. Ignored
+    theta_jn: float
+        The angle between the total angular momentum and the line of sight
+    phase: float
+        The phase of the gravitational wave
+    out: dict, optional
+        dictionary of arrays to write the polarizations to. Default None
+    kwargs: dict
+        Additional keyword arguments. We support:
+
+            - minimum_frequency: frequency below which the polarizations
+              are zero. Default 20
+            - maximum_frequency: frequency above which the polarizations
+              are zero. Default the maximum of the frequency array
+            - synthetic_cost: time in seconds to spend busy-waiting for each
+              call, used to mimic the cost of a real waveform model.
+              Default 0
+
+    Returns
+    -------
+    polarizations: dict
+        The polarizations
+    """
+    from bilby.core.utils import (
+        gravitational_constant, parsec, solar_mass, speed_of_light
+    )
+    cost = float(kwargs.get("synthetic_cost", 0.))
+    if cost > 0:
+        # busy-wait rather than sleep so that the cost is CPU bound
+        end = time.perf_counter() + cost
+        while time.perf_counter() < end:
+            pass
+    if out is None:
+        out = {
+            "plus": np.zeros(np.shape(frequency_array), dtype=complex),
+            "cross": np.zeros(np.shape(frequency_array), dtype=complex),
+        }
+    total_mass = (mass_1 + mass_2) * solar_mass * gravitational_constant / (
+        speed_of_light**3
+    )
+    eta = mass_1 * mass_2 / (mass_1 + mass_2)**2
+    chirp_mass = eta**0.6 * total_mass
+    distance = luminosity_distance * 1e6 * parsec / speed_of_light
+    maximum_frequency = min(
+        float(kwargs.get("maximum_frequency", np.max(frequency_array))),
+        1. / (6**1.5 * np.pi * total_mass)
+    )
+    mask = (
+        (frequency_array >= float(kwargs.get("minimum_frequency", 20.))) &
+        (frequency_array <= maximum_frequency)
+    )
+    frequencies = frequency_array[mask]
+    amplitude = (
+        (5. / 24)**0.5 * np.pi**(-2. / 3) * chirp_mass**(5. / 6) *
+        frequencies**(-7. / 6) / distance
+    )
+    psi = (
+        -2 * phase - np.pi / 4 + 3. / (128 * eta) *
+        (np.pi * total_mass * frequencies)**(-5. / 3)
+    )
+    strain = amplitude * np.exp(-1j * psi)
+    cos_theta_jn = np.cos(theta_jn)
+    out["plus"][:] = 0.
+    out["cross"][:] = 0.
+    out["plus"][mask] = strain * (1 + cos_theta_jn**2) / 2
+    out["cross"][mask] = -1j * strain * cos_theta_jn
+    return out
+
+
+synthetic_binary_black_hole.supports_out = True
+_BACKENDS = {}
+# only use gwsignal for reviewed waveforms. This should be changed when
+# bilby updates their review statement
+register_backend("SEOBNRv5HM", source.gwsignal_binary_black_hole)
+register_backend("SEOBNRv5PHM", source.gwsignal_binary_black_hole)
+register_backend(
+    "IMRPhenomXPHMST", source.lal_binary_black_hole, waveform_arguments={
+        "waveform_approximant": "IMRPhenomXPHM",
+        "PhenomXPrecVersion": 320,
+        "PhenomXPFinalSpinMod": 2,
+        "PhenomXHMReleaseVersion": 122022
+    }
+)
+register_backend("Synthetic", synthetic_binary_black_hole)
+
+
 def _weights_from_matches(matches, use_best=False, mapping=None):
     """Calculate a weight based on the match to numerical relativity. If
     mapping is None, we use the recommendation from
@@ -277,7 +1294,8 @@ def _weights_from_matches(matches, use_best=False, mapping=None):
     Parameters
     ----------
     matches: np.ndarray
-        array of matches to calculate the weight for
+        array of matches to calculate the weight for. If a 2d array is
+        provided, weights are calculated for each row
     use_best: bool, optional
         if True, return a weight of 1 for the highest match and 0 for all other
         models. Default False
@@ -289,8 +1307,10 @@ def _weights_from_matches(matches, use_best=False, mapping=None):
         will be rescaled to be between 0 and 1.
     """
     if use_best:
-        weights = np.zeros(len(matches))
-        weights[np.argmax(matches)] = 1.
+        weights = np.zeros(np.shape(matches))
+        np.put_along_axis(
+            weights, np.argmax(matches, axis=-1)[..., None], 1., axis=-1
+        )
         return weights
     if mapping is None:
         weights = 1 / ((1 - matches)**4)
@@ -313,6 +1333,6 @@ def _weights_from_matches(matches, use_best=False, mapping=None):
                 f"Unable to generate weights from matches for the string "
                 f"{mapping}."
             )
-    weights /= np.sum(weights)
+    weights /= np.sum(weights, axis=-1, keepdims=True)
     weights[np.isnan(weights)] = 0.
     return weights
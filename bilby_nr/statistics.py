@@ -0,0 +1,428 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import atexit
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+_ENVIRONMENT_VARIABLE = "BILBY_NR_MODEL_STATISTICS"
+_FIELDS = ["draws", "failures", "waveform_time", "fallbacks"]
+
+
+class ModelStatistics(object):
+    """Class to aggregate model selection statistics across likelihood calls.
+    For each waveform approximant we store the number of times it was drawn,
+    the number of times it failed to generate a waveform, the cumulative
+    waveform generation time, the number of times it was used as a fallback
+    after another approximant failed and a histogram of the weights assigned to it.
+    All statistics are stored in a fixed-size array of shape
+    (nslots, max_models, nfields), with an additional overflow slot when the
+    array is shared.
+
+    By default the array lives in the memory of the current process. Calling
+    `share` moves the array into shared memory so that statistics recorded
+    by pool workers are visible to the parent process. Each process writes
+    to its own slot to avoid race conditions: the parent process writes to
+    slot 0 and each pool worker claims a free slot the first time that it
+    records a statistic. Slots are claimed under a file lock and the slots
+    of workers which have exited are reused, e.g. when the pool replaces
+    its workers. If no slot is free, the process writes to an additional
+    overflow slot under the same lock.
+
+    Parameters
+    ----------
+    max_models: int, optional
+        maximum number of waveform approximants to store statistics for.
+        Default 8
+    weight_bins: int, optional
+        number of equally spaced bins between 0 and 1 to use for the weight
+        histogram. Default 10
+    """
+    def __init__(self, max_models=8, weight_bins=10):
+        self.max_models = max_models
+        self.weight_bins = weight_bins
+        self.enabled = True
+        self.nslots = 1
+        self.models = {}
+        self._array = None
+        self._shared_memory = None
+        self._owner = None
+        self._owners = None
+        self._lock_file = None
+        self._pid = None
+        self._slot = 0
+
+    @property
+    def nfields(self):
+        return len(_FIELDS) + self.weight_bins
+
+    @property
+    def array(self):
+        """Array storing the statistics for all slots"""
+        if self._array is None:
+            spec = os.environ.get(_ENVIRONMENT_VARIABLE, None)
+            if spec is not None:
+                self.attach(spec)
+            else:
+                self._array = np.zeros(
+                    (self.nslots, self.max_models, self.nfields)
+                )
+        return self._array
+
+    @property
+    def slot(self):
+        """The slot that the current process writes to"""
+        pid = os.getpid()
+        if pid != self._pid:
+            # attach to the shared statistics before claiming a slot
+            self.array
+            self._pid = pid
+            self._slot = 0
+            if self._shared_memory is not None:
+                self._slot = self._claim_slot(pid)
+        return self._slot
+
+    def _claim_slot(self, pid):
+        """Return the slot owned by a process. If the process does not own a
+        slot, it claims a slot which is not owned by a running process, or
+        the overflow slot if all slots are in use
+
+        Parameters
+        ----------
+        pid: int
+            process ID of the process
+        """
+        with self._locked():
+            owners = self._owners
+            if pid in owners:
+                return int(np.argmax(owners == pid))
+            for slot in range(1, self.nslots):
+                if owners[slot] == 0 or not _process_exists(owners[slot]):
+                    owners[slot] = pid
+                    return slot
+        return self.nslots
+
+    @contextmanager
+    def _locked(self):
+        """Context manager which holds an exclusive lock on the shared
+        statistics. The lock file is opened once per process so that the
+        lock is not shared with the parent after a fork
+        """
+        import fcntl
+        pid = os.getpid()
+        if self._lock_file is None or self._lock_file[0] != pid:
+            self._lock_file = (
+                pid, open(_lock_filename(self._shared_memory.name), "a")
+            )
+        lock = self._lock_file[1]
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _slot_array(self):
+        """Context manager which provides the array that the current process
+        writes to. Writes to the overflow slot are made under a lock
+        """
+        array = self.array
+        slot = self.slot
+        if self._shared_memory is not None and slot == self.nslots:
+            with self._locked():
+                yield array[slot]
+        else:
+            yield array[slot]
+
+    def _row(self, approximant):
+        """Return the row associated with a given waveform approximant. If
+        the approximant has not been seen before, a new row is assigned
+        provided that the statistics are not shared and there is space
+        """
+        row = self.models.get(approximant, None)
+        if row is None and self._shared_memory is None:
+            if len(self.models) < self.max_models:
+                row = len(self.models)
+                self.models[approximant] = row
+        return row
+
+    def record_weights(self, waveform_approximant_list, weights):
+        """Record the weights assigned to each waveform approximant
+
+        Parameters
+        ----------
+        waveform_approximant_list: list
+            list of waveform approximants
+        weights: np.ndarray
+            the weight assigned to each waveform approximant
+        """
+        if not self.enabled:
+            return
+        bins = np.clip(
+            (np.asarray(weights, dtype=float) * self.weight_bins).astype(int),
+            0, self.weight_bins - 1
+        )
+        with self._slot_array() as array:
+            for approximant, _bin in zip(waveform_approximant_list, bins):
+                row = self._row(approximant)
+                if row is not None:
+                    array[row, len(_FIELDS) + _bin] += 1
+
+    def record_draw(self, approximant):
+        """Record that a waveform approximant was drawn
+
+        Parameters
+        ----------
+        approximant: str
+            the waveform approximant that was drawn
+        """
+        if not self.enabled:
+            return
+        row = self._row(approximant)
+        if row is not None:
+            with self._slot_array() as array:
+                array[row, 0] += 1
+
+    def record_waveform(self, approximant, elapsed, failed=False):
+        """Record the outcome of a waveform evaluation
+
+        Parameters
+        ----------
+        approximant: str
+            the waveform approximant that was evaluated
+        elapsed: float
+            time taken to evaluate the waveform in seconds
+        failed: bool, optional
+            whether or not the waveform evaluation failed. Default False
+        """
+        if not self.enabled:
+            return
+        row = self._row(approximant)
+        if row is not None:
+            with self._slot_array() as array:
+                array[row, 1] += int(failed)
+                array[row, 2] += elapsed
+
+    def record_fallback(self, approximant):
+        """Record that a waveform approximant successfully generated a
+        waveform after the drawn approximant failed
+
+        Parameters
+        ----------
+        approximant: str
+            the waveform approximant that was used as a fallback
+        """
+        if not self.enabled:
+            return
+        row = self._row(approximant)
+        if row is not None:
+            with self._slot_array() as array:
+                array[row, 3] += 1
+
+    @contextmanager
+    def paused(self):
+        """Context manager which stops statistics from being recorded inside
+        the context, e.g. when likelihoods are evaluated during
+        post-processing
+        """
+        enabled = self.enabled
+        self.enabled = False
+        try:
+            yield
+        finally:
+            self.enabled = enabled
+
+    def reset(self):
+        """Set all statistics to zero"""
+        self.array[:] = 0.
+
+    def totals(self):
+        """Return the statistics summed over all slots
+
+        Returns
+        -------
+        models: list
+            list of waveform approximants in the order of the rows
+        totals: np.ndarray
+            array of shape (len(models), nfields) containing the statistics
+        """
+        models = sorted(self.models, key=self.models.get)
+        total = np.sum(self.array, axis=0)
+        return models, total[[self.models[model] for model in models]]
+
+    def merge(self, models, totals):
+        """Add statistics, e.g. from a previous run, to the slot of the
+        current process
+
+        Parameters
+        ----------
+        models: list
+            list of waveform approximants in the order of the rows
+        totals: np.ndarray
+            array of shape (len(models), nfields) containing the statistics
+        """
+        totals = np.asarray(totals, dtype=float)
+        if totals.shape[-1] != self.nfields:
+            raise ValueError(
+                f"Unable to merge statistics with {totals.shape[-1]} fields "
+                f"into statistics with {self.nfields} fields"
+            )
+        with self._slot_array() as array:
+            for approximant, values in zip(models, totals):
+                row = self._row(approximant)
+                if row is not None:
+                    array[row] += values
+
+    def as_dict(self):
+        """Return the statistics summed over all slots as a dictionary"""
+        total = np.sum(self.array, axis=0)
+        models = {}
+        for approximant, row in self.models.items():
+            models[approximant] = {
+                "draws": int(total[row, 0]),
+                "failures": int(total[row, 1]),
+                "waveform_time": float(total[row, 2]),
+                "fallbacks": int(total[row, 3]),
+                "weight_histogram": [
+                    int(_) for _ in total[row, len(_FIELDS):]
+                ],
+            }
+        return {
+            "weight_bin_edges": np.linspace(
+                0, 1, self.weight_bins + 1
+            ).tolist(),
+            "models": models,
+        }
+
+    def share(self, waveform_approximant_list, nslots):
+        """Move the statistics into shared memory so that they can be
+        updated by pool workers. This must be called in the parent process
+        before the pool is created
+
+        Parameters
+        ----------
+        waveform_approximant_list: list
+            list of waveform approximants to store statistics for
+        nslots: int
+            number of slots to allocate. This should be the number of
+            pool workers + 1. An additional overflow slot is allocated for
+            processes which are unable to claim a slot
+        """
+        from .utils import create_shared_memory
+        if self._shared_memory is not None:
+            self.unshare()
+        self.models = {
+            approximant: row for row, approximant in
+            enumerate(waveform_approximant_list[:self.max_models])
+        }
+        self.nslots = max(int(nslots), 1)
+        shape = (self.nslots + 1, self.max_models, self.nfields)
+        self._shared_memory = create_shared_memory(
+            (np.prod(shape) + self.nslots) * 8
+        )
+        self._owner = os.getpid()
+        self._map_shared_memory()
+        self._array[:] = 0.
+        self._owners[:] = 0
+        self._owners[0] = self._owner
+        open(_lock_filename(self._shared_memory.name), "a").close()
+        self._pid = None
+        os.environ[_ENVIRONMENT_VARIABLE] = ":".join([
+            self._shared_memory.name, str(self.nslots), str(self.max_models),
+            str(self.weight_bins), ",".join(self.models.keys())
+        ])
+        atexit.register(self.unshare)
+
+    def attach(self, spec):
+        """Attach to statistics that have been shared by another process
+
+        Parameters
+        ----------
+        spec: str
+            specification of the shared statistics, as stored in the
+            BILBY_NR_MODEL_STATISTICS environment variable
+        """
+        from .utils import attach_shared_memory
+        name, nslots, max_models, weight_bins, models = spec.split(":")
+        self.nslots = int(nslots)
+        self.max_models = int(max_models)
+        self.weight_bins = int(weight_bins)
+        self.models = {
+            approximant: row for row, approximant in
+            enumerate(models.split(","))
+        }
+        self._shared_memory = attach_shared_memory(name)
+        self._owner = None
+        self._map_shared_memory()
+        self._pid = None
+
+    def _map_shared_memory(self):
+        """Create the arrays storing the statistics for each slot and the
+        process ID of the owner of each slot from the shared memory segment
+        """
+        shape = (self.nslots + 1, self.max_models, self.nfields)
+        self._array = np.ndarray(
+            shape, dtype=np.float64, buffer=self._shared_memory.buf
+        )
+        self._owners = np.ndarray(
+            (self.nslots,), dtype=np.int64, buffer=self._shared_memory.buf,
+            offset=int(np.prod(shape)) * 8
+        )
+
+    def unshare(self):
+        """Copy the statistics out of shared memory and release the shared
+        memory segment. The segment is only unlinked by the process that
+        created it
+        """
+        if self._shared_memory is None:
+            return
+        self._array = np.array(self._array)
+        self._owners = None
+        if self._lock_file is not None:
+            self._lock_file[1].close()
+            self._lock_file = None
+        self._shared_memory.close()
+        if self._owner == os.getpid():
+            try:
+                os.remove(_lock_filename(self._shared_memory.name))
+            except OSError:
+                pass
+            self._shared_memory.unlink()
+            os.environ.pop(_ENVIRONMENT_VARIABLE, None)
+        self._shared_memory = None
+        self._owner = None
+        self._pid = None
+
+
+def _lock_filename(name):
+    """Return the name of the file used to lock shared statistics
+
+    Parameters
+    ----------
+    name: str
+        name of the shared memory segment
+    """
+    return os.path.join(tempfile.gettempdir(), f"bilby_nr_{name}.lock")
+
+
+def _process_exists(pid):
+    """Return True if a process with the given process ID is running
+
+    Parameters
+    ----------
+    pid: int
+        process ID
+    """
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+statistics = ModelStatistics()
@@ -3,6 +3,7 @@ from bilby.gw.detector.networks import InterferometerList
 from bilby_pipe.utils import BilbyPipeError
 import os
 import pytest
+import shutil
 import tempfile
 
 tmpdir = tempfile.TemporaryDirectory(prefix=".", dir=".").name
@@ -211,3 +212,179 @@ class TestDataAnalysisInput(object):
         assert wvf_args["waveform_approximant"] == sorted([
             "IMRPhenomXPHMST", "IMRPhenomTPHM", "SEOBNRv5PHM"
         ])[0]
+
+
+    def test_single_model_analysis(self):
+        # the single-model analyses of a model-parallel run use the bilby_nr
+        # source model with a single waveform approximant
+        import bilby
+        import numpy as np
+        from bilby_nr.bilby_pipe import create_parser, DataAnalysisInput
+        from bilby_pipe.main import parse_args
+
+        args = [
+            "--ini",
+            os.path.join(
+                os.path.dirname(__file__),
+                "test_config_with_additional_arguments.ini"
+            ),
+            "--outdir", self.outdir,
+            "--waveform-approximant", "IMRPhenomXPHMST",
+        ]
+        inputs = DataAnalysisInput(
+            *parse_args(args, create_parser()), test=True
+        )
+        assert not inputs._sample_multiple_models
+        ifos = bilby.gw.detector.InterferometerList(["H1", "L1"])
+        ifos.set_strain_data_from_zero_noise(
+            sampling_frequency=4096, duration=4, start_time=-2
+        )
+        inputs._interferometers = ifos
+        wvf_args = inputs.get_default_waveform_arguments()
+        assert wvf_args["waveform_approximant_list"] == ["IMRPhenomXPHMST"]
+        assert "match_interpolant" not in wvf_args
+        likelihood = bilby.gw.likelihood.GravitationalWaveTransient(
+            ifos, inputs.waveform_generator
+        )
+        parameters = dict(
+            mass_1=36., mass_2=29., a_1=0.4, a_2=0.3, tilt_1=0.5, tilt_2=1.,
+            phi_12=1.7, phi_jl=0.3, luminosity_distance=2000., theta_jn=0.4,
+            psi=2.659, phase=1.3, geocent_time=0., ra=1.375, dec=-1.2108
+        )
+        assert np.isfinite(
+            likelihood.log_likelihood_ratio(parameters=parameters)
+        )
+
+
+class TestStageInterpolants(object):
+    def setup_method(self):
+        self.outdir = tempfile.TemporaryDirectory(prefix=".", dir=".").name
+        self.args = [
+            os.path.join(
+                os.path.dirname(__file__),
+                "test_config_with_additional_arguments.ini"
+            ),
+            "--outdir", self.outdir,
+        ]
+
+    def teardown_method(self):
+        if os.path.isdir(self.outdir):
+            shutil.rmtree(self.outdir)
+
+    def test_stage_interpolants(self):
+        from bilby_nr.bilby_pipe import create_parser, MainInput
+        from bilby_pipe.main import parse_args
+        from bilby_pipe.utils import convert_string_to_dict
+        inputs = MainInput(
+            *parse_args(self.args, create_parser(top_level=True))
+        )
+        filename = os.path.join(
+            self.outdir, "data", "bilby_nr_interpolants.npz"
+        )
+        assert os.path.isfile(filename)
+        waveform_arguments = convert_string_to_dict(
+            inputs.known_args.waveform_arguments_dict
+        )
+        assert waveform_arguments["interpolant_bundle"] == (
+            os.path.abspath(filename)
+        )
+
+    def test_stage_truncated_interpolants(self):
+        from bilby_nr.bilby_pipe import create_parser, MainInput
+        from bilby_nr.interp.pade_pade import load_bundle
+        from bilby_pipe.main import parse_args
+        args = self.args + [
+            "--waveform-arguments-dict", (
+                "{'match_interpolant': "
+                "'bilby_nr.match.match_from_truncated_pade_pade_interpolant'}"
+            )
+        ]
+        inputs = MainInput(*parse_args(args, create_parser(top_level=True)))
+        bundle = load_bundle(
+            os.path.join(self.outdir, "data", "bilby_nr_interpolants.npz"),
+            truncated=True
+        )
+        assert sorted(key[0] for key in bundle.keys()) == sorted(
+            inputs.waveform_approximant
+        )
+
+    @pytest.mark.parametrize("waveform_arguments", [
+        "{'match_interpolant': 'bilby_nr.match.does_not_exist'}",
+        "{'match_to_weight': '1 / (1 - x)'}",
+        "{'use_best_match': 'maybe'}",
+    ])
+    def test_invalid_waveform_arguments(self, waveform_arguments):
+        from bilby_nr.bilby_pipe import create_parser, MainInput
+        from bilby_pipe.main import parse_args
+        args = self.args + ["--waveform-arguments-dict", waveform_arguments]
+        with pytest.raises(BilbyPipeError):
+            MainInput(*parse_args(args, create_parser(top_level=True)))
+
+
+class TestGenerateDag(object):
+    def setup_method(self):
+        self.outdir = tempfile.TemporaryDirectory(prefix=".", dir=".").name
+
+    def teardown_method(self):
+        if os.path.isdir(self.outdir):
+            shutil.rmtree(self.outdir)
+
+    def test_model_parallel(self, monkeypatch):
+        from bilby_nr.bilby_pipe import create_parser, MainInput, generate_dag
+        from bilby_pipe.main import parse_args
+        monkeypatch.setattr(shutil, "which", lambda exe: f"/usr/bin/{exe}")
+        args = [
+            os.path.join(
+                os.path.dirname(__file__),
+                "test_config_with_additional_arguments.ini"
+            ),
+            "--outdir", self.outdir, "--gaussian-noise", "True",
+            "--webdir", os.path.join(self.outdir, "webdir"),
+            "--bilby-nr-model-parallel", "True",
+        ]
+        inputs = MainInput(*parse_args(args, create_parser(top_level=True)))
+        inputs.create_summary = False
+        generate_dag(inputs)
+        with open(os.path.join(self.outdir, "submit", "dag_label.submit")) as f:
+            dag = f.read()
+        base = "label_data0_0_analysis_H1"
+        for approx in inputs.waveform_approximant:
+            assert f"JOB {base}_{approx}_arg_0" in dag
+            assert f"--waveform-approximant {approx}" in dag
+        combine = [
+            line for line in dag.split("\n") if line.startswith("Parent") and
+            line.endswith(f"Child {base}_combine_arg_0")
+        ]
+        assert len(combine) == 1
+        for approx in inputs.waveform_approximant:
+            assert f"{base}_{approx}_arg_0" in combine[0]
+
+    def test_main(self, monkeypatch):
+        import sys
+        import bilby_pipe.main
+        from bilby_pipe.job_creation import generate_dag
+        from bilby_nr.bilby_pipe import main
+        monkeypatch.setattr(shutil, "which", lambda exe: f"/usr/bin/{exe}")
+        with open(os.path.join(
+            os.path.dirname(__file__),
+            "test_config_with_additional_arguments.ini"
+        ), "r") as f:
+            config = f.read().replace(
+                "create-summary = True", "create-summary = False"
+            )
+        os.makedirs(self.outdir)
+        ini = os.path.join(self.outdir, "config.ini")
+        with open(ini, "w") as f:
+            f.write(config)
+        monkeypatch.setattr(sys, "argv", [
+            "bilby_nr_pipe", ini, "--outdir", self.outdir,
+            "--gaussian-noise", "True", "--overwrite-outdir", "True",
+            "--webdir", os.path.join(self.outdir, "webdir"),
+            "--bilby-nr-model-parallel", "True",
+        ])
+        main()
+        # bilby_pipe itself should be unchanged
+        assert bilby_pipe.main.generate_dag is generate_dag
+        with open(os.path.join(self.outdir, "submit", "dag_label.submit")) as f:
+            dag = f.read()
+        assert "JOB label_data0_0_analysis_H1_combine_arg_0" in dag
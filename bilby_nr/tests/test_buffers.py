@@ -0,0 +1,63 @@
+from bilby_nr.buffers import BufferPool
+import numpy as np
+import pytest
+
+
+class TestBufferPool(object):
+    def setup_method(self):
+        self.pool = BufferPool(nbuffers=2)
+
+    def test_reuse(self):
+        out = self.pool.acquire((16,))
+        assert sorted(out.keys()) == ["cross", "plus"]
+        assert out["plus"].shape == (16,)
+        assert out["plus"].dtype == complex
+        address = id(out["plus"])
+        self.pool.release(out)
+        assert len(self.pool) == 1
+        assert id(self.pool.acquire((16,))["plus"]) == address
+        assert len(self.pool) == 0
+
+    def test_no_aliasing(self):
+        first = self.pool.acquire((16,))
+        second = self.pool.acquire((16,))
+        assert not np.shares_memory(first["plus"], second["plus"])
+        # leased buffers are never handed out again, even if no reference
+        # is held
+        address = id(second["plus"])
+        del second
+        third = self.pool.acquire((16,))
+        assert id(third["plus"]) != address
+        assert not np.shares_memory(third["plus"], first["plus"])
+
+    def test_release(self):
+        out = self.pool.acquire((16,))
+        self.pool.release(out)
+        # buffers can only be released once
+        with pytest.raises(ValueError):
+            self.pool.release(out)
+        with pytest.raises(ValueError):
+            self.pool.release({"plus": np.empty(16, dtype=complex)})
+        # at most nbuffers released buffers are stored
+        leased = [self.pool.acquire((16,)) for _ in range(4)]
+        for out in leased:
+            self.pool.release(out)
+        assert len(self.pool) == 2
+
+    def test_borrow(self):
+        with self.pool.borrow((16,)) as out:
+            address = id(out["plus"])
+            assert len(self.pool) == 0
+        assert len(self.pool) == 1
+        with pytest.raises(RuntimeError):
+            with self.pool.borrow((16,)) as out:
+                raise RuntimeError()
+        assert id(self.pool.acquire((16,))["plus"]) == address
+
+    def test_lock(self):
+        out = self.pool.lock(self.pool.acquire((16,)))
+        with pytest.raises(ValueError):
+            out["plus"][0] = 1.
+        self.pool.release(out)
+        out = self.pool.acquire((16,))
+        out["plus"][0] = 1.
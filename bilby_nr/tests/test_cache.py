@@ -0,0 +1,105 @@
+import numpy as np
+from bilby_nr.cache import LRUCache, quantise
+
+
+class TestLRUCache(object):
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        assert cache.get("a") == 1
+        cache["c"] = 3
+        assert "b" not in cache
+        assert "a" in cache and "c" in cache
+        assert len(cache) == 2
+
+    def test_hits_and_misses(self):
+        cache = LRUCache(maxsize=2)
+        cache["a"] = 1
+        cache.get("a")
+        cache.get("b")
+        assert cache.hits == 1
+        assert cache.misses == 1
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.hits == 0
+
+    def test_disabled(self):
+        cache = LRUCache(maxsize=0)
+        cache["a"] = 1
+        assert cache.get("a") is None
+
+
+def test_quantise():
+    assert quantise([1.0, 2.0]) == (1.0, 2.0)
+    assert quantise([1.0, 2.0]) != quantise([1.0, 2.0 + 1e-12])
+    assert quantise([1.0, 2.0], 1e-3) == quantise([1.0, 2.0 + 1e-5], 1e-3)
+    assert quantise([1.0, 2.0], 1e-3) != quantise([1.0, 2.1], 1e-3)
+    # a tolerance can be provided for each value
+    assert quantise([1.0, 2.0], [0., 0.5]) == (1.0, 4)
+    assert quantise([1.0, 2.0], [0., 0.5]) == quantise([1.0, 2.2], [0., 0.5])
+    assert quantise([1.0, 2.0], [0., 0.5]) != quantise(
+        [1.0 + 1e-12, 2.0], [0., 0.5]
+    )
+
+
+def _write_entries(args):
+    from bilby_nr.cache import DiskCache
+    directory, seed = args
+    cache = DiskCache(directory)
+    for num in range(20):
+        value = np.arange(100) + num
+        cache[str(num)] = {"plus": value, "cross": 1j * value}
+    return seed
+
+
+class TestDiskCache(object):
+    def test_store_and_load(self, tmp_path):
+        from bilby_nr.cache import DiskCache
+        cache = DiskCache(str(tmp_path))
+        polarizations = {
+            "plus": np.arange(10, dtype=complex),
+            "cross": 1j * np.arange(10)
+        }
+        assert cache.get("a") is None
+        cache["a"] = polarizations
+        loaded = cache.get("a")
+        for key, value in polarizations.items():
+            np.testing.assert_array_equal(loaded[key], value)
+            assert not loaded[key].flags.writeable
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_eviction(self, tmp_path):
+        import os
+        from bilby_nr.cache import DiskCache
+        cache = DiskCache(str(tmp_path), max_size=4000 / 1024**3)
+        for num, key in enumerate(["a", "b", "c"]):
+            cache[key] = {"plus": np.zeros(60, dtype=complex)}
+            os.utime(cache._path(key), (num, num))
+        # "a" becomes the most recently used entry
+        cache.get("a")
+        cache["d"] = {"plus": np.zeros(60, dtype=complex)}
+        assert cache.size() <= cache.max_bytes
+        assert "a" in cache and "d" in cache
+        assert "b" not in cache
+
+    def test_concurrent_writes(self, tmp_path):
+        import multiprocessing
+        from bilby_nr.cache import DiskCache
+        with multiprocessing.Pool(4) as pool:
+            pool.map(_write_entries, [(str(tmp_path), n) for n in range(8)])
+        cache = DiskCache(str(tmp_path))
+        assert len(cache._entries()) == 20
+        for num in range(20):
+            np.testing.assert_array_equal(
+                cache.get(str(num))["plus"], np.arange(100) + num
+            )
+
+    def test_waveform_key(self):
+        from bilby_nr.cache import waveform_key
+        frequencies = np.linspace(20, 1024, 100)
+        key = waveform_key("A", [1., 2.], {"f": 20.}, frequencies)
+        assert key == waveform_key("A", [1., 2.], {"f": 20.}, frequencies)
+        assert key != waveform_key("B", [1., 2.], {"f": 20.}, frequencies)
+        assert key != waveform_key("A", [1., 2.], {"f": 21.}, frequencies)
+        assert key != waveform_key("A", [1., 2.], {"f": 20.}, frequencies[1:])
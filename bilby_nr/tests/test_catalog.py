@@ -0,0 +1,74 @@
+import os
+import bilby
+import numpy as np
+import pandas as pd
+from bilby_nr import catalog
+
+
+def _make_result(outdir, label, nsamples=500, seed=0):
+    rng = np.random.default_rng(seed)
+    mass_1 = rng.uniform(30, 180, nsamples)
+    posterior = pd.DataFrame({
+        "mass_1": mass_1,
+        "mass_2": mass_1 * rng.uniform(0.3, 1, nsamples),
+        "a_1": rng.uniform(0, 0.99, nsamples),
+        "a_2": rng.uniform(0, 0.99, nsamples),
+        "tilt_1": np.arccos(rng.uniform(-1, 1, nsamples)),
+        "tilt_2": np.arccos(rng.uniform(-1, 1, nsamples)),
+        "phi_12": rng.uniform(0, 2 * np.pi, nsamples),
+        "phi_jl": rng.uniform(0, 2 * np.pi, nsamples),
+        "theta_jn": rng.uniform(0, np.pi, nsamples),
+        "phase": rng.uniform(0, 2 * np.pi, nsamples),
+    })
+    result = bilby.core.result.Result(
+        label=label, outdir=outdir, posterior=posterior,
+        search_parameter_keys=list(posterior.keys())
+    )
+    result.save_to_file(extension="hdf5", outdir=outdir)
+    return os.path.join(outdir, f"{label}_result.hdf5")
+
+
+def test_summarise_result(tmp_path):
+    models = ["IMRPhenomXPHMST", "IMRPhenomTPHM"]
+    filename = _make_result(str(tmp_path), "event")
+    summary = catalog.summarise_result(filename, models, chunk_size=128)
+    assert summary["nsamples"] == 500
+    np.testing.assert_almost_equal(
+        sum(summary[f"dominant_{model}"] for model in models), 1.
+    )
+    np.testing.assert_almost_equal(
+        sum(summary[f"mean_weight_{model}"] for model in models), 1.,
+        decimal=5
+    )
+    # primary masses above 150 are outside of the domain of the fits
+    assert summary["outside_domain"] > 0
+    assert "outside of the domain" in summary["warnings"]
+    # streaming in chunks gives the same summary as a single chunk
+    assert summary == catalog.summarise_result(
+        filename, models, chunk_size=1000
+    )
+
+
+def test_summarise_catalog(tmp_path, monkeypatch):
+    for num in range(3):
+        _make_result(str(tmp_path), f"event{num}", seed=num)
+    outfile = str(tmp_path / "summary.csv")
+    catalog.main([str(tmp_path), "--outfile", outfile])
+    table = pd.read_csv(outfile)
+    assert len(table) == 3
+    assert "dominant_SEOBNRv5PHM" in table.columns
+
+    calls = []
+    _summarise = catalog.summarise_result
+
+    def summarise_result(filename, **kwargs):
+        calls.append(filename)
+        return _summarise(filename, **kwargs)
+
+    monkeypatch.setattr(catalog, "summarise_result", summarise_result)
+    catalog.main([str(tmp_path), "--outfile", outfile])
+    assert not len(calls)
+    _make_result(str(tmp_path), "event1", seed=10)
+    catalog.main([str(tmp_path), "--outfile", outfile])
+    assert calls == [str(tmp_path / "event1_result.hdf5")]
+    assert len(pd.read_csv(outfile)) == 3
@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def state(monkeypatch):
+    from bilby_nr import instrumentation, source, statistics
+    from bilby_nr.cache import LRUCache
+    _statistics = statistics.ModelStatistics()
+    _instrumentation = instrumentation.Instrumentation(enabled=True)
+    _cache = LRUCache(maxsize=4)
+    monkeypatch.setattr(statistics, "statistics", _statistics)
+    monkeypatch.setattr(instrumentation, "instrumentation", _instrumentation)
+    monkeypatch.setattr(source, "_weight_cache", _cache)
+    return _statistics, _instrumentation, _cache
+
+
+def test_save_and_load_state(state, tmp_path):
+    from bilby_nr.checkpoint import load_state, save_state
+    from bilby_nr.cache import quantise
+    statistics, instrumentation, cache = state
+    statistics.record_draw("IMRPhenomTPHM")
+    statistics.record_weights(["IMRPhenomTPHM", "SEOBNRv5PHM"], [0.3, 0.7])
+    instrumentation.record("waveform", 0.5, approximant="IMRPhenomTPHM")
+    instrumentation.increment("weight_cache_hit")
+    header = ("match", ("IMRPhenomTPHM", "SEOBNRv5PHM"), False, None)
+    keys = [
+        header + quantise([1.5, 2.5]), header + quantise([3., 4.], 0.1),
+        header[:2] + (True, None) + quantise([1.5, 2.5]),
+        header + quantise([3., 4.], [0., 0.1]),
+    ]
+    for num, key in enumerate(keys):
+        weights = np.array([0.1 * num, 1 - 0.1 * num])
+        weights.flags.writeable = False
+        cache[key] = weights
+    cache.get(keys[0])
+    expected = (
+        statistics.as_dict(), instrumentation.as_dict(), cache.items()
+    )
+    filename = save_state(str(tmp_path / "state.npz"))
+    statistics.reset()
+    instrumentation.reset()
+    cache.clear()
+    assert load_state(filename)
+    assert statistics.as_dict() == expected[0]
+    assert instrumentation.as_dict() == expected[1]
+    assert [key for key, _ in cache.items()] == [
+        key for key, _ in expected[2]
+    ]
+    for (_, value), (_, _expected) in zip(cache.items(), expected[2]):
+        np.testing.assert_array_equal(value, _expected)
+        assert not value.flags.writeable
+    # restoring again adds to the statistics collected so far
+    assert load_state(filename)
+    assert statistics.as_dict()["models"]["IMRPhenomTPHM"]["draws"] == 2
+
+
+def test_load_state_version_mismatch(state, tmp_path, monkeypatch):
+    from bilby_nr import checkpoint
+    statistics, _, _ = state
+    statistics.record_draw("IMRPhenomTPHM")
+    filename = checkpoint.save_state(str(tmp_path / "state.npz"))
+    statistics.reset()
+    monkeypatch.setattr(checkpoint, "FORMAT_VERSION", 2)
+    assert not checkpoint.load_state(filename)
+    assert statistics.as_dict()["models"]["IMRPhenomTPHM"]["draws"] == 0
+    assert not checkpoint.load_state(str(tmp_path / "missing.npz"))
+
+
+def test_load_worker_state(state, tmp_path, monkeypatch):
+    from bilby_nr import checkpoint
+    statistics, instrumentation, cache = state
+    filename = str(tmp_path / "state.npz")
+    statistics.record_draw("IMRPhenomTPHM")
+    instrumentation.increment("weight_cache_hit")
+    checkpoint.save_state(filename)
+    # a forked pool worker only stores what it recorded since the fork
+    monkeypatch.setattr(
+        checkpoint, "_fork_baseline", instrumentation.as_dict()
+    )
+    statistics.record_draw("IMRPhenomTPHM")
+    instrumentation.increment("weight_cache_hit")
+    worker = checkpoint.save_state(
+        checkpoint.worker_state_filename(filename, pid=1234)
+    )
+    assert checkpoint.worker_state_filenames(filename) == [worker]
+    monkeypatch.setattr(checkpoint, "_fork_baseline", {})
+    statistics.reset()
+    instrumentation.reset()
+    assert checkpoint.load_state(filename)
+    # statistics are shared between processes so the latest totals are
+    # restored, while the instrumentation of each process is combined
+    assert statistics.as_dict()["models"]["IMRPhenomTPHM"]["draws"] == 2
+    assert instrumentation.as_dict()["counters"]["weight_cache_hit"] == {
+        "all": 2
+    }
+    # the worker state is consolidated into the main file
+    assert not checkpoint.worker_state_filenames(filename)
+    statistics.reset()
+    instrumentation.reset()
+    assert checkpoint.load_state(filename)
+    assert statistics.as_dict()["models"]["IMRPhenomTPHM"]["draws"] == 2
+    checkpoint.remove_state(filename)
+    assert not checkpoint.load_state(filename)
+
+
+def test_load_state_weight_cache_size(state, tmp_path):
+    from bilby_nr import checkpoint
+    _, _, cache = state
+    filename = str(tmp_path / "state.npz")
+    header = ("match", ("IMRPhenomTPHM", "SEOBNRv5PHM"), False, None)
+    for num in range(4):
+        cache[header + (float(num),)] = np.array([0.5, 0.5])
+    checkpoint.save_state(filename)
+    cache.clear()
+    for num in range(4, 8):
+        cache[header + (float(num),)] = np.array([0.5, 0.5])
+    checkpoint.save_state(checkpoint.worker_state_filename(filename, 1234))
+    cache.clear()
+    # the size of the cache is not increased when the states of several
+    # processes are restored
+    assert checkpoint.load_state(filename)
+    assert cache.maxsize == 4
+    assert sorted(key[-1] for key, _ in cache.items()) == [2., 3., 6., 7.]
+    # the size used by the previous run is restored if it has not been set
+    cache.clear()
+    cache.maxsize = 0
+    assert checkpoint.load_state(filename)
+    assert cache.maxsize == 4
+    assert len(cache) == 4
+
+
+def test_maybe_save_state(state, tmp_path, monkeypatch):
+    import os
+    from bilby_nr import checkpoint
+    statistics, _, _ = state
+    filename = checkpoint.state_filename(str(tmp_path), "label")
+    resume = tmp_path / "label_resume.pickle"
+    checkpoint.start_periodic_save(
+        filename, str(tmp_path), "label", interval=0.
+    )
+    try:
+        checkpoint.maybe_save_state()
+        assert not os.path.isfile(filename)
+        # the state is stored once the sampler writes a checkpoint
+        resume.write_bytes(b"")
+        statistics.record_draw("IMRPhenomTPHM")
+        checkpoint.maybe_save_state()
+        assert os.path.isfile(filename)
+        os.remove(filename)
+        checkpoint.maybe_save_state()
+        assert not os.path.isfile(filename)
+        # pool workers store their state in a separate file
+        os.utime(resume, (1e10, 1e10))
+        monkeypatch.setitem(checkpoint._periodic, "owner", -1)
+        checkpoint.maybe_save_state()
+        assert not os.path.isfile(filename)
+        assert checkpoint.worker_state_filenames(filename) == [
+            checkpoint.worker_state_filename(filename)
+        ]
+    finally:
+        checkpoint.stop_periodic_save()
+    os.utime(resume, (2e10, 2e10))
+    checkpoint.maybe_save_state()
+    assert not os.path.isfile(filename)
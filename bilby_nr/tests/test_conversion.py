@@ -2,7 +2,8 @@ import bilby
 from bilby.gw import conversion
 from gwpy.timeseries import TimeSeries
 from bilby_nr.conversion import (
-    determine_waveform_approximant_from_likelihood
+    determine_waveform_approximant_from_likelihood,
+    _likelihood_for_given_model
 )
 import pytest
 
@@ -124,3 +125,184 @@ def test_determine_waveform_approximant_from_likelihood():
             likelihood
         )
         assert model == "IMRPhenomTPHM"
+
+
+def test_generate_model_accuracy_parameters():
+    import numpy as np
+    import pandas as pd
+    from bilby_nr.conversion import (
+        chi_par_chi_perp_from_mass_spin, generate_model_accuracy_parameters
+    )
+    from bilby_nr.match import match_from_interpolant
+    samples = pd.DataFrame({
+        "mass_1": [36., 65., 120.],
+        "mass_2": [32., 30., 80.],
+        "a_1": [0.8, 0.5, 0.7],
+        "a_2": [0.5, 0.2, 0.8],
+        "tilt_1": [2.4, 1.2, 0.5],
+        "tilt_2": [0.8, 0.6, 2.1],
+        "phi_12": [5.8, 4.0, 2.1],
+        "phi_jl": [0.25, 0.4, 0.1],
+        "theta_jn": [2.5, 2.4, 2.6],
+        "phase": [4., 5., 2.],
+    })
+    models = ["IMRPhenomXPHMST", "IMRPhenomTPHM"]
+    interpolant = "bilby_nr.match.match_from_pade_pade_interpolant"
+    converted = generate_model_accuracy_parameters(
+        samples.copy(), waveform_approximant_list=models,
+        match_interpolant=interpolant
+    )
+    columns = ["chi_par", "chi_perp"] + [
+        f"{prefix}_{model}" for prefix in ["match", "weight"] for model in
+        models
+    ]
+    for key in columns:
+        assert converted[key].dtype == np.float32
+    np.testing.assert_allclose(
+        converted[[f"weight_{model}" for model in models]].sum(axis=1), 1.,
+        rtol=1e-6
+    )
+    for num, sample in samples.iterrows():
+        _chi_par, _chi_perp = chi_par_chi_perp_from_mass_spin(
+            *[sample[key] for key in [
+                "mass_1", "mass_2", "a_1", "tilt_1", "a_2", "tilt_2", "phi_12",
+                "phi_jl", "theta_jn", "phase"
+            ]], 50.
+        )
+        np.testing.assert_allclose(
+            converted["chi_par"][num], _chi_par, rtol=1e-5
+        )
+        np.testing.assert_allclose(
+            converted["chi_perp"][num], _chi_perp, rtol=1e-5
+        )
+        for model in models:
+            match = match_from_interpolant(
+                model, *[sample[key] for key in [
+                    "mass_1", "mass_2", "a_1", "tilt_1", "phi_12", "a_2",
+                    "tilt_2", "phi_jl", "theta_jn", "phase"
+                ]], interp="pade_pade"
+            )
+            np.testing.assert_allclose(
+                converted[f"match_{model}"][num], match, rtol=1e-5
+            )
+    # explicit arguments take precedence over the likelihood
+    from types import SimpleNamespace
+    likelihood = SimpleNamespace(waveform_generator=SimpleNamespace(
+        waveform_arguments=dict(
+            waveform_approximant_list=models, match_interpolant=interpolant,
+            use_best_match=True
+        )
+    ))
+    weights = [f"weight_{model}" for model in models]
+    best = generate_model_accuracy_parameters(
+        samples.copy(), likelihood=likelihood
+    )
+    assert set(np.unique(best[weights].values)) == {0., 1.}
+    explicit = generate_model_accuracy_parameters(
+        samples.copy(), likelihood=likelihood, use_best=False
+    )
+    np.testing.assert_allclose(explicit[weights], converted[weights])
+
+
+@pytest.mark.parametrize("releases_gil", [True, False])
+def test_concurrent_attribution(monkeypatch, releases_gil):
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from bilby_nr import source
+    from bilby_nr.conversion import (
+        _attribution_executor, attribution_executor
+    )
+
+    def synthetic(*args, **kwargs):
+        return source.synthetic_binary_black_hole(*args, **kwargs)
+
+    synthetic.releases_gil = releases_gil
+    models = ["SyntheticA", "SyntheticB", "SyntheticC"]
+    for num, model in enumerate(models):
+        monkeypatch.setitem(
+            source._BACKENDS, model,
+            (synthetic, {"minimum_frequency": 20. + 5 * num})
+        )
+    expected = ThreadPoolExecutor if releases_gil else ProcessPoolExecutor
+    assert _attribution_executor(models) == expected
+
+    ifos = bilby.gw.detector.InterferometerList(["H1", "L1"])
+    ifos.set_strain_data_from_zero_noise(
+        sampling_frequency=1024, duration=4, start_time=0
+    )
+    waveform_generator = bilby.gw.waveform_generator.WaveformGenerator(
+        duration=4, sampling_frequency=1024,
+        frequency_domain_source_model=source.multi_model_binary_black_hole,
+        waveform_arguments={
+            "waveform_approximant_list": models,
+            "reference_frequency": 50,
+            "minimum_frequency": 20,
+        },
+    )
+    likelihood = bilby.gw.likelihood.GravitationalWaveTransient(
+        ifos, waveform_generator
+    )
+    sample = {
+        "mass_1": 36., "mass_2": 32., "a_1": 0.1, "a_2": 0.2, "tilt_1": 0.5,
+        "tilt_2": 0.8, "phi_12": 1.0, "phi_jl": 0.25, "theta_jn": 0.5,
+        "ra": 2.2, "dec": -1.2, "geocent_time": 2., "phase": 1.,
+        "psi": 0.7, "luminosity_distance": 500.,
+    }
+    for model in models:
+        logl = _likelihood_for_given_model(sample, model, likelihood)
+        attributed = determine_waveform_approximant_from_likelihood(
+            dict(sample, log_likelihood=logl), models, likelihood,
+            concurrent=True
+        )
+        assert attributed == model
+    # a single executor can be reused for many samples
+    submitted = []
+    with attribution_executor(models, likelihood=likelihood) as executor:
+        assert isinstance(executor, expected)
+        submit = executor.submit
+
+        def _submit(function, *args):
+            submitted.append(args)
+            return submit(function, *args)
+
+        monkeypatch.setattr(executor, "submit", _submit)
+        for model in models:
+            logl = _likelihood_for_given_model(sample, model, likelihood)
+            attributed = determine_waveform_approximant_from_likelihood(
+                dict(sample, log_likelihood=logl), models, likelihood,
+                executor=executor
+            )
+            assert attributed == model
+    # process pool workers receive the likelihood once when they start
+    assert len(submitted) >= len(models)
+    assert all(
+        (args[-1] is None) == (not releases_gil) for args in submitted
+    )
+    with attribution_executor(models, concurrent=False) as executor:
+        assert executor is None
+
+
+def test_generate_all_bbh_parameters_from_index():
+    import numpy as np
+    import pandas as pd
+    from bilby_nr.source import indexed_multi_model_binary_black_hole
+    from bilby_nr.tests.test_reweight import INJECTION, _likelihood
+    models = ["IMRPhenomPv2", "IMRPhenomXP"]
+    likelihood = _likelihood(models)
+    likelihood.waveform_generator = bilby.gw.WaveformGenerator(
+        duration=4, sampling_frequency=1024,
+        frequency_domain_source_model=indexed_multi_model_binary_black_hole,
+        waveform_arguments=likelihood.waveform_generator.waveform_arguments
+    )
+    np.random.seed(123)
+    samples = pd.DataFrame({
+        key: value + np.random.normal(0, 1e-3, 4) for key, value in
+        INJECTION.items()
+    })
+    samples["waveform_index"] = [1, 0, 1, 1]
+    converted = conversion.generate_all_bbh_parameters(
+        samples, likelihood=likelihood
+    )
+    assert list(converted["waveform_approximant"]) == [
+        models[index] for index in samples["waveform_index"]
+    ]
+    assert "H1_optimal_snr" in converted
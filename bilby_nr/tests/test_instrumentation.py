@@ -0,0 +1,96 @@
+from bilby_nr.instrumentation import Instrumentation
+import json
+import os
+import signal
+import tempfile
+
+
+class TestInstrumentation(object):
+    def setup_method(self):
+        self.instrumentation = Instrumentation(enabled=True)
+
+    def test_disabled_by_default(self):
+        instrumentation = Instrumentation()
+        with instrumentation.timer("waveform", approximant="A"):
+            pass
+        instrumentation.increment("cache_hit")
+        data = instrumentation.as_dict()
+        assert data["timers"] == {}
+        assert data["counters"] == {}
+
+    def test_timers_and_counters(self):
+        for _ in range(3):
+            with self.instrumentation.timer("waveform", approximant="A"):
+                pass
+        with self.instrumentation.timer("weights"):
+            pass
+        self.instrumentation.increment("cache_hit", value=2)
+        data = self.instrumentation.as_dict()
+        assert data["timers"]["waveform"]["A"]["count"] == 3
+        assert data["timers"]["waveform"]["A"]["time"] >= 0.
+        assert data["timers"]["weights"]["all"]["count"] == 1
+        assert data["counters"]["cache_hit"]["all"] == 2
+
+    def test_timer_records_on_exception(self):
+        try:
+            with self.instrumentation.timer("waveform", approximant="A"):
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        data = self.instrumentation.as_dict()
+        assert data["timers"]["waveform"]["A"]["count"] == 1
+
+    def test_reset(self):
+        with self.instrumentation.timer("waveform"):
+            pass
+        self.instrumentation.reset()
+        assert self.instrumentation.as_dict()["timers"] == {}
+
+    def test_dump_on_signal(self):
+        with self.instrumentation.timer("waveform"):
+            pass
+        with tempfile.TemporaryDirectory() as outdir:
+            previous = signal.getsignal(signal.SIGUSR1)
+            try:
+                self.instrumentation.install_signal_handler(outdir=outdir)
+                os.kill(os.getpid(), signal.SIGUSR1)
+            finally:
+                signal.signal(signal.SIGUSR1, previous)
+            filename = os.path.join(
+                outdir, f"bilby_nr_instrumentation_{os.getpid()}.json"
+            )
+            with open(filename, "r") as f:
+                data = json.load(f)
+        assert data["timers"]["waveform"]["all"]["count"] == 1
+
+
+def test_multi_model_binary_black_hole_instrumentation():
+    import numpy as np
+    from bilby.core.utils import create_frequency_series
+    from bilby_nr.instrumentation import instrumentation
+    from bilby_nr.source import multi_model_binary_black_hole
+
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        multi_model_binary_black_hole(
+            create_frequency_series(2048, 4), mass_1=100, mass_2=50,
+            luminosity_distance=100, a_1=0.6, tilt_1=np.pi / 3,
+            phi_12=np.pi / 2, a_2=0.2, tilt_2=np.pi / 10, phi_jl=np.pi,
+            theta_jn=np.pi / 3, phase=0., reference_frequency=50.0,
+            minimum_frequency=20.0,
+            match_interpolant="bilby_nr.match.match_from_interpolant",
+            waveform_approximant_list=["IMRPhenomXPHMST", "IMRPhenomTPHM"]
+        )
+        data = instrumentation.as_dict()
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
+    for stage in ["total", "weights", "draw"]:
+        assert data["timers"][stage]["all"]["count"] == 1
+    for approximant in ["IMRPhenomXPHMST", "IMRPhenomTPHM"]:
+        assert data["timers"]["interpolant"][approximant]["count"] == 1
+        assert data["timers"]["pade_pade"][approximant]["count"] == 1
+    assert sum(
+        item["count"] for item in data["timers"]["waveform"].values()
+    ) == 1
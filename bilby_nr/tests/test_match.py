@@ -75,3 +75,168 @@ class TestMatchInterpolants(object):
                 self.parameters["phase"],
                 interp="unknown"
             )
+
+    def test_pade_pade_batch_matches_scalar(self):
+        from bilby_nr.interp.pade_pade import mismatch_interpolant
+
+        np.random.seed(123)
+        _parameters = {
+            key: item + np.random.uniform(0, 0.1, size=10) for key, item in
+            self.parameters.items()
+        }
+        batch = mismatch_interpolant(
+            self.waveform_approximant, *[
+                _parameters[key] for key in self.parameters.keys()
+            ]
+        )
+        for ii in range(10):
+            scalar = mismatch_interpolant(
+                self.waveform_approximant, *[
+                    _parameters[key][ii] for key in self.parameters.keys()
+                ]
+            )
+            np.testing.assert_almost_equal(batch[ii], scalar)
+
+    def test_pade_pade_gradient(self):
+        from bilby_nr.interp.pade_pade import (
+            mismatch_interpolant, mismatch_interpolant_gradient
+        )
+
+        for approximant in ["IMRPhenomXPHMST", "IMRPhenomTPHM", "SEOBNRv5PHM"]:
+            log10_mismatch, gradient = mismatch_interpolant_gradient(
+                approximant, *self.parameters.values()
+            )
+            np.testing.assert_almost_equal(
+                log10_mismatch, np.log10(
+                    mismatch_interpolant(approximant, *self.parameters.values())
+                )
+            )
+            for key, value in self.parameters.items():
+                step = 1e-6 * max(1., abs(value))
+                _log10_mismatch = []
+                for shift in [step, -step]:
+                    _parameters = self.parameters.copy()
+                    _parameters[key] += shift
+                    _log10_mismatch.append(np.log10(
+                        mismatch_interpolant(approximant, *_parameters.values())
+                    ))
+                finite_difference = np.diff(_log10_mismatch[::-1])[0] / (2 * step)
+                np.testing.assert_allclose(
+                    gradient[key], finite_difference, rtol=1e-4, atol=1e-7
+                )
+
+    def test_truncated_pade_pade(self):
+        from bilby_nr.interp.pade_pade import load_interpolant
+        from bilby_nr.interp.truncate import (
+            truncate_interpolant, validation_samples
+        )
+        interpolant = load_interpolant(self.waveform_approximant)
+        samples = validation_samples(nsamples=1000, seed=1)
+        # with zero tolerance only terms that vanish are removed
+        truncated, report = truncate_interpolant(
+            interpolant, tolerance=0., nsamples=1000
+        )
+        np.testing.assert_almost_equal(
+            truncated.log10_mismatch(*samples),
+            interpolant.log10_mismatch(*samples)
+        )
+        truncated, report = truncate_interpolant(
+            interpolant, tolerance=0.05, nsamples=5000
+        )
+        assert report["retained"] + report["merged"] + report["dropped"] == (
+            np.prod(interpolant.numerator.shape[:2])
+        )
+        assert report["retained"] < np.prod(interpolant.numerator.shape[:2])
+        assert report["max_error"] <= 0.05
+        assert report["holdout_max_error"] <= 0.05
+        assert report["speedup"] > 0
+
+    def test_truncated_pade_pade_fallback(self, monkeypatch, caplog):
+        from bilby_nr.interp import truncate
+        from bilby_nr.interp.pade_pade import load_interpolant
+        interpolant = load_interpolant(self.waveform_approximant)
+        samples = truncate.validation_samples(nsamples=1000, seed=1)
+        attempts = []
+
+        def drop_most(drop_errors, merge_errors, impact, tolerance):
+            attempts.append(tolerance)
+            status = np.full(impact.shape, "dropped", dtype=object)
+            status[0, 0] = "retained"
+            return status
+
+        monkeypatch.setattr(truncate, "_select_terms", drop_most)
+        # if the tolerance cannot be met, the untruncated fit is returned
+        with caplog.at_level("WARNING", logger="bilby"):
+            truncated, report = truncate.truncate_interpolant(
+                interpolant, tolerance=0.01, nsamples=1000
+            )
+        assert len(attempts) == 10
+        assert "untruncated fit" in caplog.text
+        assert report["retained"] == np.prod(interpolant.numerator.shape[:2])
+        assert report["holdout_max_error"] <= 0.01
+        np.testing.assert_almost_equal(
+            truncated.log10_mismatch(*samples),
+            interpolant.log10_mismatch(*samples)
+        )
+
+    def test_pade_pade_fast_mode(self):
+        from bilby_nr.match import match_from_interpolant
+        full = match_from_interpolant(
+            self.waveform_approximant, *self.parameters.values()
+        )
+        fast = match_from_interpolant(
+            self.waveform_approximant, *self.parameters.values(),
+            interp="pade_pade_fast"
+        )
+        assert abs(np.log10(1 - fast) - np.log10(1 - full)) <= 0.01
+
+    def test_interpolant_bundle(self, tmp_path):
+        from bilby_nr.interp import pade_pade
+        from bilby_nr.interp.truncate import validation_samples
+        filename = pade_pade.save_bundle(
+            str(tmp_path / "bundle.npz"), ["IMRPhenomTPHM", "Unknown"]
+        )
+        bundle = pade_pade.load_bundle(filename)
+        assert list(bundle.keys()) == ["IMRPhenomTPHM"]
+        samples = validation_samples(nsamples=100)
+        np.testing.assert_array_equal(
+            bundle["IMRPhenomTPHM"].log10_mismatch(*samples),
+            pade_pade.load_interpolant("IMRPhenomTPHM").log10_mismatch(
+                *samples
+            )
+        )
+
+    def test_truncated_interpolant_bundle(self, tmp_path, monkeypatch):
+        from bilby_nr.interp import pade_pade, truncate
+        samples = truncate.validation_samples(nsamples=100)
+        filename = pade_pade.save_bundle(
+            str(tmp_path / "bundle.npz"), ["IMRPhenomTPHM"], truncate=True
+        )
+        bundle = pade_pade.load_bundle(filename, truncated=True)
+        assert list(bundle.keys()) == [
+            ("IMRPhenomTPHM", truncate.DEFAULT_TOLERANCE)
+        ]
+        truncated, report = truncate.truncate_interpolant(
+            pade_pade.load_interpolant("IMRPhenomTPHM")
+        )
+        np.testing.assert_array_equal(
+            bundle[("IMRPhenomTPHM", truncate.DEFAULT_TOLERANCE)][0]
+            .log10_mismatch(*samples), truncated.log10_mismatch(*samples)
+        )
+        # the stored coefficients are used rather than truncating again
+        monkeypatch.setattr(pade_pade, "_bundled_interpolants", {})
+        monkeypatch.setattr(pade_pade, "_bundled_truncated_interpolants", {})
+
+        def fail(*args, **kwargs):
+            raise AssertionError("The interpolant should not be truncated")
+
+        monkeypatch.setattr(truncate, "truncate_interpolant", fail)
+        truncate.load_truncated_interpolant.cache_clear()
+        try:
+            pade_pade.use_bundle(filename)
+            np.testing.assert_array_equal(
+                truncate.load_truncated_interpolant("IMRPhenomTPHM")
+                .log10_mismatch(*samples), truncated.log10_mismatch(*samples)
+            )
+        finally:
+            truncate.load_truncated_interpolant.cache_clear()
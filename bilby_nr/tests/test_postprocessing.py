@@ -0,0 +1,191 @@
+import bilby
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import shutil
+import tempfile
+from bilby_nr.tests.test_reweight import INJECTION, _likelihood
+
+
+class TestStreamingPostProcessing(object):
+    def setup_method(self):
+        from bilby_nr.reweight import _single_model_likelihood
+        self.outdir = tempfile.TemporaryDirectory(prefix=".", dir=".").name
+        self.models = ["IMRPhenomPv2", "IMRPhenomXP"]
+        self.likelihood = _likelihood(self.models)
+        np.random.seed(123)
+        nsamples = 7
+        posterior = pd.DataFrame({
+            key: value + np.random.normal(0, 1e-3, nsamples) for key, value
+            in INJECTION.items()
+        })
+        self.truth = [self.models[num % 2] for num in range(nsamples)]
+        posterior["log_likelihood"] = [
+            _single_model_likelihood(
+                self.likelihood, model
+            ).log_likelihood_ratio(parameters=dict(sample)) for
+            model, (_, sample) in zip(self.truth, posterior.iterrows())
+        ]
+        self.priors = bilby.gw.prior.BBHPriorDict()
+        result = bilby.core.result.Result(
+            label="test", outdir=self.outdir, posterior=posterior,
+            search_parameter_keys=["mass_1", "mass_2"], priors=self.priors
+        )
+        result.save_to_file(extension="hdf5", overwrite=True)
+        self.filename = os.path.join(self.outdir, "test_result.hdf5")
+
+    def teardown_method(self):
+        if os.path.isdir(self.outdir):
+            shutil.rmtree(self.outdir)
+
+    def test_concurrent_attribution(self, monkeypatch):
+        from concurrent.futures import ThreadPoolExecutor
+        from bilby_nr import conversion
+        from bilby_nr.postprocessing import (
+            generate_all_bbh_parameters_in_chunks
+        )
+        executors = []
+
+        class Executor(ThreadPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.shutdowns = 0
+                executors.append(self)
+
+            def shutdown(self, *args, **kwargs):
+                self.shutdowns += 1
+                return super().shutdown(*args, **kwargs)
+
+        monkeypatch.setattr(
+            conversion, "_attribution_executor", lambda models: Executor
+        )
+        outfile = os.path.join(self.outdir, "test_converted_result.hdf5")
+        generate_all_bbh_parameters_in_chunks(
+            self.filename, outfile, likelihood=self.likelihood,
+            priors=self.priors, chunk_size=3, concurrent=True
+        )
+        # a single executor is used for all samples and chunks
+        assert len(executors) == 1
+        assert executors[0].shutdowns == 1
+        result = bilby.core.result.read_in_result(outfile)
+        assert list(result.posterior["waveform_approximant"]) == self.truth
+
+    def test_generate_all_bbh_parameters_in_chunks(self):
+        from bilby_nr.postprocessing import (
+            generate_all_bbh_parameters_in_chunks
+        )
+        outfile = os.path.join(self.outdir, "test_converted_result.hdf5")
+        generate_all_bbh_parameters_in_chunks(
+            self.filename, outfile, likelihood=self.likelihood,
+            priors=self.priors, chunk_size=3
+        )
+        result = bilby.core.result.read_in_result(outfile)
+        assert len(result.posterior) == 7
+        assert list(result.posterior["waveform_approximant"]) == self.truth
+        np.testing.assert_almost_equal(
+            result.posterior["chirp_mass"].values,
+            bilby.gw.conversion.component_masses_to_chirp_mass(
+                result.posterior["mass_1"].values,
+                result.posterior["mass_2"].values
+            )
+        )
+        for key in ["H1_optimal_snr", "L1_matched_filter_snr"]:
+            assert key in result.posterior
+
+    def test_resume_from_checkpoint(self, monkeypatch):
+        from bilby_nr import postprocessing
+        outfile = os.path.join(self.outdir, "test_converted_result.hdf5")
+        original = postprocessing._generate_all_bbh_parameters_for_chunk
+        processed = []
+
+        def interrupt_after(nchunks):
+            def _generate(chunk, **kwargs):
+                if len(processed) == nchunks:
+                    raise KeyboardInterrupt
+                processed.append(list(chunk.index))
+                return original(chunk, **kwargs)
+            monkeypatch.setattr(
+                postprocessing, "_generate_all_bbh_parameters_for_chunk",
+                _generate
+            )
+            processed.clear()
+
+        # 4 samples are written but only the first 2 chunks are checkpointed
+        interrupt_after(2)
+        with pytest.raises(KeyboardInterrupt):
+            postprocessing.generate_all_bbh_parameters_in_chunks(
+                self.filename, outfile, likelihood=self.likelihood,
+                priors=self.priors, chunk_size=2, checkpoint_interval=3
+            )
+        assert postprocessing._read_checkpoint(outfile, 7) == 4
+
+        # samples written after the last checkpoint are discarded
+        interrupt_after(1)
+        with pytest.raises(KeyboardInterrupt):
+            postprocessing.generate_all_bbh_parameters_in_chunks(
+                self.filename, outfile, likelihood=self.likelihood,
+                priors=self.priors, chunk_size=2, checkpoint_interval=3,
+                checkpoint_time=1e3
+            )
+        assert postprocessing._read_checkpoint(outfile, 7) == 4
+
+        interrupt_after(-1)
+        postprocessing.generate_all_bbh_parameters_in_chunks(
+            self.filename, outfile, likelihood=self.likelihood,
+            priors=self.priors, chunk_size=2
+        )
+        assert processed == [[4, 5], [6]]
+        assert postprocessing._read_checkpoint(outfile, 7) == 7
+        result = bilby.core.result.read_in_result(outfile)
+        assert len(result.posterior) == 7
+        assert list(result.posterior["waveform_approximant"]) == self.truth
+
+    def test_conversion_checkpoint(self, monkeypatch):
+        from bilby_nr import conversion, postprocessing
+        posterior = bilby.core.result.read_in_result(self.filename).posterior
+        checkpoint_file = os.path.join(self.outdir, "conversion.hdf5")
+        original = postprocessing._generate_all_bbh_parameters_for_chunk
+        processed = []
+
+        def interrupt_after(nchunks):
+            def _generate(chunk, **kwargs):
+                if len(processed) == nchunks:
+                    raise KeyboardInterrupt
+                processed.append(list(chunk.index))
+                return original(chunk, **kwargs)
+            monkeypatch.setattr(
+                postprocessing, "_generate_all_bbh_parameters_for_chunk",
+                _generate
+            )
+            processed.clear()
+
+        interrupt_after(2)
+        with pytest.raises(KeyboardInterrupt):
+            with conversion.conversion_checkpoint(checkpoint_file, 2):
+                # bilby calls the patched function at the end of sampling
+                bilby.gw.conversion.generate_all_bbh_parameters(
+                    posterior.copy(), likelihood=self.likelihood,
+                    priors=self.priors
+                )
+        assert postprocessing._read_checkpoint(
+            checkpoint_file, 7, postprocessing._fingerprint(posterior)
+        ) == 4
+        # checkpoints produced from a different posterior are ignored
+        assert postprocessing._read_checkpoint(
+            checkpoint_file, 7, postprocessing._fingerprint(posterior + 1)
+        ) == 0
+
+        interrupt_after(-1)
+        result = conversion.generate_all_bbh_parameters(
+            posterior.copy(), likelihood=self.likelihood, priors=self.priors,
+            checkpoint_file=checkpoint_file
+        )
+        assert processed == [[4, 5, 6]]
+        assert not os.path.isfile(checkpoint_file)
+        assert list(result.index) == list(posterior.index)
+        assert list(result["waveform_approximant"]) == self.truth
+        np.testing.assert_almost_equal(
+            result["mass_1"].values, posterior["mass_1"].values
+        )
+        assert "chirp_mass" in result
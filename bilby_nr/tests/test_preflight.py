@@ -0,0 +1,77 @@
+import bilby
+import numpy as np
+import os
+import pytest
+import shutil
+import tempfile
+from bilby.core.utils import create_frequency_series
+
+
+def test_estimate_cost():
+    from bilby_nr.preflight import estimate_cost, format_report
+    models = ["IMRPhenomPv2", "IMRPhenomXP"]
+    report = estimate_cost(
+        bilby.gw.prior.BBHPriorDict(), models,
+        create_frequency_series(1024, 4),
+        dict(reference_frequency=20., minimum_frequency=20.), nsamples=10,
+        ntimings=2, likelihood_evaluations=1e6, target_wall_time=1.
+    )
+    assert report["draw_fractions"] == {model: 0.5 for model in models}
+    for model in models:
+        assert report["waveform_time"][model] > 0
+    np.testing.assert_almost_equal(
+        report["cost_per_likelihood"], report["interpolant_time"] + 0.5 * (
+            report["waveform_time"][models[0]] +
+            report["waveform_time"][models[1]]
+        )
+    )
+    assert report["suggested"]["npool"] == 64
+    assert report["suggested"]["request_cpus"] == 64
+    assert "suggested resources" in format_report(report)
+
+
+def test_estimate_cost_few_samples():
+    from bilby_nr.preflight import estimate_cost
+    models = ["IMRPhenomPv2", "IMRPhenomXP"]
+    args = (
+        bilby.gw.prior.BBHPriorDict(), models,
+        create_frequency_series(1024, 4),
+        dict(reference_frequency=20., minimum_frequency=20.)
+    )
+    # more timings than samples are requested
+    report = estimate_cost(*args, nsamples=2, ntimings=5)
+    for model in models:
+        assert report["waveform_time"][model] > 0
+    with pytest.raises(ValueError):
+        estimate_cost(*args, nsamples=0)
+
+
+def test_suggest_resources():
+    from bilby_nr.preflight import _suggest_resources
+    suggested = _suggest_resources(0.01, 1024**3, 1e6, 2500., 64)
+    assert suggested["npool"] == 4
+    np.testing.assert_almost_equal(suggested["expected_wall_time"], 2500.)
+    assert suggested["request_memory"] >= 8.
+
+
+def test_main_input_preflight():
+    from bilby_nr.bilby_pipe import create_parser, MainInput
+    from bilby_pipe.main import parse_args
+    outdir = tempfile.TemporaryDirectory(prefix=".", dir=".").name
+    args = [
+        os.path.join(
+            os.path.dirname(__file__),
+            "test_config_with_additional_arguments.ini"
+        ),
+        "--outdir", outdir, "--bilby-nr-preflight", "True",
+        "--bilby-nr-apply-resource-hints", "True",
+        "--bilby-nr-preflight-samples", "20",
+    ]
+    try:
+        inputs = MainInput(*parse_args(args, create_parser(top_level=True)))
+        assert os.path.isfile(os.path.join(outdir, "bilby_nr_preflight.json"))
+        assert inputs.sampler_kwargs["npool"] == inputs.request_cpus
+        assert inputs.known_args.request_cpus == inputs.request_cpus
+    finally:
+        if os.path.isdir(outdir):
+            shutil.rmtree(outdir)
@@ -0,0 +1,71 @@
+import bilby
+import numpy as np
+import pytest
+from bilby_nr.prior import ModelIndexPrior, _component_parameters
+from bilby_nr.source import _weights_for_samples
+
+
+class TestModelIndexPrior(object):
+    def setup_method(self):
+        self.waveform_approximant_list = [
+            "IMRPhenomXPHMST", "IMRPhenomTPHM", "SEOBNRv5PHM"
+        ]
+        self.interpolant = "bilby_nr.match.match_from_pade_pade_interpolant"
+        self.priors = bilby.gw.prior.BBHPriorDict()
+        self.priors["chirp_mass"] = bilby.core.prior.Uniform(25, 60)
+        self.priors["waveform_index"] = ModelIndexPrior(
+            self.waveform_approximant_list,
+            match_interpolant=self.interpolant
+        )
+
+    def _weights(self, samples):
+        prior = self.priors["waveform_index"]
+        return _weights_for_samples(
+            self.waveform_approximant_list, _component_parameters(
+                {key: samples[key] for key in prior.required_variables}
+            ), match_interpolant=self.interpolant
+        )
+
+    def test_sample(self):
+        bilby.core.utils.random.seed(1234)
+        samples = self.priors.sample(5000)
+        fractions = np.bincount(
+            samples["waveform_index"].astype(int),
+            minlength=len(self.waveform_approximant_list)
+        ) / 5000
+        np.testing.assert_allclose(
+            fractions, np.mean(self._weights(samples), axis=0), atol=0.02
+        )
+
+    def test_prob(self):
+        samples = self.priors.sample(10)
+        prior = self.priors["waveform_index"]
+        required = {key: samples[key] for key in prior.required_variables}
+        weights = self._weights(samples)
+        for index in range(len(self.waveform_approximant_list)):
+            np.testing.assert_allclose(
+                prior.prob(np.full(10, index), **required), weights[:, index]
+            )
+        sample = {key: value[0] for key, value in required.items()}
+        assert prior.prob(0.5, **sample) == 0.
+        assert prior.ln_prob(1, **sample) == pytest.approx(
+            np.log(weights[0, 1])
+        )
+        assert prior.cdf(2, **sample) == pytest.approx(1.)
+
+    def test_invalid(self):
+        prior = self.priors["waveform_index"]
+        assert prior.boundary is None
+        assert prior.minimum == 0
+        assert prior.maximum >= len(self.waveform_approximant_list) - 1
+        with pytest.raises(ValueError):
+            ModelIndexPrior(["IMRPhenomXPHMST"])
+
+    def test_repr(self):
+        priors = bilby.core.prior.PriorDict(
+            {"waveform_index": repr(self.priors["waveform_index"])}
+        )
+        assert isinstance(priors["waveform_index"], ModelIndexPrior)
+        assert priors["waveform_index"].waveform_approximant_list == (
+            self.waveform_approximant_list
+        )
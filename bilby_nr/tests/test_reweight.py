@@ -0,0 +1,100 @@
+import bilby
+import numpy as np
+import pandas as pd
+import pytest
+
+INJECTION = dict(
+    mass_1=36., mass_2=29., luminosity_distance=1000., a_1=0.4, tilt_1=0.5,
+    phi_12=1.7, a_2=0.3, tilt_2=1.0, phi_jl=0.3, theta_jn=0.4, phase=1.3,
+    ra=1.375, dec=-1.2108, psi=2.659, geocent_time=1126259642.413,
+)
+
+
+def _likelihood(waveform_approximant_list):
+    from bilby_nr.source import multi_model_binary_black_hole
+    generator = bilby.gw.WaveformGenerator(
+        duration=4, sampling_frequency=1024,
+        frequency_domain_source_model=multi_model_binary_black_hole,
+        waveform_arguments=dict(
+            waveform_approximant=waveform_approximant_list[0],
+            waveform_approximant_list=waveform_approximant_list,
+            reference_frequency=50., minimum_frequency=20.
+        )
+    )
+    ifos = bilby.gw.detector.InterferometerList(["H1", "L1"])
+    ifos.set_strain_data_from_zero_noise(
+        sampling_frequency=1024, duration=4,
+        start_time=INJECTION["geocent_time"] - 2
+    )
+    return bilby.gw.likelihood.GravitationalWaveTransient(ifos, generator)
+
+
+def _result(likelihood, waveform_approximant, nsamples=10, seed=1):
+    from bilby_nr.reweight import _single_model_likelihood
+    np.random.seed(seed)
+    posterior = pd.DataFrame({
+        key: value + np.random.normal(0, 1e-3, nsamples) for key, value in
+        INJECTION.items()
+    })
+    _likelihood = _single_model_likelihood(likelihood, waveform_approximant)
+    posterior["log_likelihood"] = [
+        _likelihood.log_likelihood_ratio(parameters=dict(sample))
+        for _, sample in posterior.iterrows()
+    ]
+    return bilby.core.result.Result(
+        label=waveform_approximant, posterior=posterior,
+        log_bayes_factor=10., log_noise_evidence=-100.,
+        meta_data={
+            "likelihood": {
+                "waveform_arguments": {
+                    "waveform_approximant": waveform_approximant
+                }
+            }
+        }
+    )
+
+
+def test_reweight_to_same_model():
+    from bilby_nr.reweight import reweight
+    likelihood = _likelihood(["IMRPhenomPv2"])
+    result = reweight([_result(likelihood, "IMRPhenomPv2")], likelihood)
+    diagnostics = result.meta_data["bilby_nr_reweighting"]
+    np.testing.assert_almost_equal(diagnostics["log_bayes_factor"], 10.)
+    np.testing.assert_almost_equal(diagnostics["effective_sample_size"], 10.)
+    assert len(result.posterior) == 10
+    assert all(result.posterior["waveform_approximant"] == "IMRPhenomPv2")
+
+
+def test_reweight_multiple_results():
+    from bilby_nr.reweight import reweight
+    models = ["IMRPhenomPv2", "IMRPhenomXP"]
+    likelihood = _likelihood(models)
+    results = [
+        _result(likelihood, model, seed=num) for num, model in
+        enumerate(models)
+    ]
+    serial = reweight(results, likelihood)
+    parallel = reweight(results, likelihood, npool=2)
+    for key in ["effective_sample_size", "log_bayes_factor"]:
+        np.testing.assert_almost_equal(
+            serial.meta_data["bilby_nr_reweighting"][key],
+            parallel.meta_data["bilby_nr_reweighting"][key]
+        )
+    diagnostics = serial.meta_data["bilby_nr_reweighting"]
+    assert 0 < diagnostics["effective_sample_size"] <= 20
+    np.testing.assert_almost_equal(
+        sum(diagnostics["model_fractions"].values()), 1.
+    )
+    assert set(serial.posterior["waveform_approximant"]) <= set(models)
+
+
+def test_reweighting_diagnostics():
+    from bilby_nr.reweight import _reweighting_diagnostics
+    diagnostics = _reweighting_diagnostics(
+        np.array([0., 0., -np.inf, -np.inf])
+    )
+    np.testing.assert_almost_equal(diagnostics["effective_sample_size"], 2.)
+    np.testing.assert_almost_equal(diagnostics["efficiency"], 0.5)
+    np.testing.assert_almost_equal(diagnostics["log_bayes_factor"], np.log(0.5))
+    with pytest.raises(ValueError):
+        _reweighting_diagnostics(np.full(4, -np.inf))
@@ -0,0 +1,66 @@
+from bilby_nr.interp.shared import SharedInterpolants, initializer
+import multiprocessing
+import os
+import numpy as np
+
+ARGS = [100., 50., 0.6, np.pi / 3, np.pi / 2, 0.2, np.pi / 10, np.pi, 1., 0.]
+
+
+def _evaluate_in_worker(approximant):
+    from bilby_nr.interp.pade_pade import mismatch_interpolant
+    from bilby_nr.interp.shared import shared_interpolants
+    shared = shared_interpolants.get(approximant)
+    return (
+        mismatch_interpolant(approximant, *ARGS),
+        shared is not None and not shared.numerator.flags.writeable
+    )
+
+
+class TestSharedInterpolants(object):
+    def setup_method(self):
+        self.shared = SharedInterpolants()
+
+    def teardown_method(self):
+        self.shared.unshare()
+
+    def test_share(self):
+        from bilby_nr.interp.pade_pade import _load_interpolant_from_file
+        self.shared.share(["IMRPhenomXPHMST", "IMRPhenomPv2"])
+        assert list(self.shared.interpolants) == ["IMRPhenomXPHMST"]
+        interpolant = self.shared.get("IMRPhenomXPHMST")
+        original = _load_interpolant_from_file("IMRPhenomXPHMST")
+        np.testing.assert_array_equal(
+            interpolant.numerator, original.numerator
+        )
+        np.testing.assert_array_equal(
+            interpolant.denominator, original.denominator
+        )
+        assert not interpolant.numerator.flags.writeable
+        assert interpolant.numerator.base is not None
+
+    def test_unshare(self):
+        self.shared.share(["IMRPhenomTPHM"])
+        assert "BILBY_NR_SHARED_INTERPOLANTS" in os.environ
+        self.shared.unshare()
+        assert "BILBY_NR_SHARED_INTERPOLANTS" not in os.environ
+        assert self.shared.get("IMRPhenomTPHM") is None
+
+    def test_pool_initializer(self):
+        from bilby_nr.interp.pade_pade import mismatch_interpolant
+        from bilby_nr.interp.shared import shared_interpolants
+        spec = shared_interpolants.share(["IMRPhenomXPHMST", "SEOBNRv5PHM"])
+        try:
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(2, initializer=initializer, initargs=(spec,)) as pool:
+                results = pool.map(
+                    _evaluate_in_worker, ["IMRPhenomXPHMST", "SEOBNRv5PHM"]
+                )
+        finally:
+            shared_interpolants.unshare()
+        for approximant, (mismatch, attached) in zip(
+            ["IMRPhenomXPHMST", "SEOBNRv5PHM"], results
+        ):
+            assert attached
+            np.testing.assert_almost_equal(
+                mismatch, mismatch_interpolant(approximant, *ARGS)
+            )
@@ -95,6 +95,335 @@ class TestMultiModelModel(object):
                 self.frequency_array, **self.parameters
             )
 
+    def test_weight_cache(self):
+        from bilby_nr.instrumentation import instrumentation
+        from bilby_nr.source import multi_model_binary_black_hole, _weight_cache
+        _weight_cache.clear()
+        self.parameters.update(self.waveform_kwargs)
+        self.parameters["weight_cache_size"] = 4
+        instrumentation.reset()
+        instrumentation.enable()
+        try:
+            for distance in [100, 200, 300]:
+                self.parameters["luminosity_distance"] = distance
+                pols = multi_model_binary_black_hole(
+                    self.frequency_array, **self.parameters
+                )
+                assert isinstance(pols, dict)
+            counters = instrumentation.as_dict()["counters"]
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+        assert counters["weight_cache_miss"]["all"] == 1
+        assert counters["weight_cache_hit"]["all"] == 2
+        assert len(_weight_cache) == 1
+
+    def test_weight_cache_tolerance(self):
+        from bilby_nr.source import _weight_cache_tolerance
+        assert _weight_cache_tolerance(0.1) == [0.1] * 8
+        assert _weight_cache_tolerance("{'mass_1': 1e-3, 'a_1': 0.01}") == [
+            1e-3, 0., 0.01, 0., 0., 0., 0., 0.
+        ]
+        with pytest.raises(ValueError):
+            _weight_cache_tolerance({"chirp_mass": 0.1})
+
+    def test_waveform_fallback(self, monkeypatch):
+        from bilby_nr import source
+        from bilby_nr.statistics import ModelStatistics
+        statistics = ModelStatistics()
+        monkeypatch.setattr(source, "statistics", statistics)
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args.pop("match_interpolant")
+        _wvf_args["waveform_approximant_list"] = [
+            "NotAnApproximant", "IMRPhenomPv2"
+        ]
+        self.parameters.update(_wvf_args)
+        np.random.seed(123)
+        pols = [
+            source.multi_model_binary_black_hole(
+                self.frequency_array, **self.parameters
+            ) for _ in range(10)
+        ]
+        assert any(_ is None for _ in pols)
+        assert statistics.as_dict()["models"]["IMRPhenomPv2"]["fallbacks"] == 0
+        statistics.reset()
+        self.parameters["waveform_fallback"] = True
+        pols = [
+            source.multi_model_binary_black_hole(
+                self.frequency_array, **self.parameters
+            ) for _ in range(10)
+        ]
+        assert all(isinstance(_, dict) for _ in pols)
+        data = statistics.as_dict()["models"]
+        assert data["NotAnApproximant"]["failures"] > 0
+        assert data["IMRPhenomPv2"]["failures"] == 0
+        assert (
+            data["IMRPhenomPv2"]["fallbacks"] ==
+            data["NotAnApproximant"]["failures"]
+        )
+        # attempts are bounded
+        self.parameters["max_waveform_attempts"] = 1
+        pols = [
+            source.multi_model_binary_black_hole(
+                self.frequency_array, **self.parameters
+            ) for _ in range(10)
+        ]
+        assert any(_ is None for _ in pols)
+
+    def test_reuse_buffers(self, monkeypatch):
+        import collections
+        from bilby_nr import buffers, source
+        failures = []
+
+        def fake_source(frequency_array, *args, out=None, **kwargs):
+            out["plus"][:] = frequency_array
+            out["cross"][:] = 1j * frequency_array
+            if len(failures):
+                raise RuntimeError()
+            return out
+
+        fake_source.supports_out = True
+        monkeypatch.setitem(source._BACKENDS, "Fake", (fake_source, {}))
+        monkeypatch.setattr(buffers, "buffers", buffers.BufferPool())
+        monkeypatch.setattr(source, "_buffer_leases", collections.deque())
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args.pop("match_interpolant")
+        _wvf_args["waveform_approximant_list"] = ["Fake"]
+        _wvf_args["reuse_buffers"] = True
+        self.parameters.update(_wvf_args)
+        first = source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        assert not first["plus"].flags.writeable
+        second = source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        assert not np.shares_memory(first["plus"], second["plus"])
+        # the buffers of the first call are released by the third call. The
+        # buffers of a failed call are released immediately
+        failures.append(True)
+        assert source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        ) is None
+        assert len(buffers.buffers) == 1
+        failures.clear()
+        third = source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        assert np.shares_memory(third["plus"], first["plus"])
+        assert not np.shares_memory(third["plus"], second["plus"])
+        np.testing.assert_almost_equal(second["plus"], self.frequency_array)
+        np.testing.assert_almost_equal(third["plus"], self.frequency_array)
+
+    def test_reuse_buffers_unsupported(self, monkeypatch, caplog):
+        from bilby_nr import source
+        monkeypatch.setattr(source, "_unsupported_buffer_warnings", set())
+        with caplog.at_level("WARNING", logger="bilby"):
+            for _ in range(2):
+                function, _ = source._prepare_waveform_arguments(
+                    waveform_approximant="IMRPhenomTPHM", reuse_buffers=True
+                )
+                assert function is source.source.lal_binary_black_hole
+            # source functions which support buffers are not warned about
+            function, _ = source._prepare_waveform_arguments(
+                waveform_approximant="Synthetic", reuse_buffers=True
+            )
+            assert function.func is source._generate_into_buffers
+        # the warning is only logged once for each source function
+        assert len(caplog.records) == 1
+        assert "reuse_buffers will be ignored" in caplog.records[0].message
+
+    def test_disk_cache(self, monkeypatch, tmp_path):
+        from bilby_nr import source
+        calls = []
+
+        def fake_source(frequency_array, *args, **kwargs):
+            calls.append(args)
+            return {
+                "plus": frequency_array + 0j, "cross": 1j * frequency_array
+            }
+
+        monkeypatch.setitem(source._BACKENDS, "Fake", (fake_source, {}))
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args.pop("match_interpolant")
+        _wvf_args["waveform_approximant_list"] = ["Fake"]
+        _wvf_args["waveform_cache_directory"] = str(tmp_path)
+        self.parameters.update(_wvf_args)
+        first = source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        second = source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        assert len(calls) == 1
+        assert not second["plus"].flags.writeable
+        np.testing.assert_array_equal(first["plus"], second["plus"])
+        self.parameters["mass_1"] += 1.
+        source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        assert len(calls) == 2
+
+    def test_indexed_multi_model_binary_black_hole(self, monkeypatch):
+        from bilby_nr import source
+        from bilby_nr.statistics import ModelStatistics
+        statistics = ModelStatistics()
+        monkeypatch.setattr(source, "statistics", statistics)
+        for num, model in enumerate(["FakeA", "FakeB"]):
+            def fake_source(frequency_array, *args, num=num, **kwargs):
+                return {
+                    "plus": num * frequency_array, "cross": frequency_array
+                }
+            monkeypatch.setitem(source._BACKENDS, model, (fake_source, {}))
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args["waveform_approximant_list"] = ["FakeA", "FakeB"]
+        self.parameters.update(_wvf_args)
+        for index in [0, 1, 1.]:
+            out = source.indexed_multi_model_binary_black_hole(
+                self.frequency_array, waveform_index=index, **self.parameters
+            )
+            np.testing.assert_almost_equal(
+                out["plus"], int(index) * self.frequency_array
+            )
+        data = statistics.as_dict()["models"]
+        assert data["FakeA"]["draws"] == 1
+        assert data["FakeB"]["draws"] == 2
+        with pytest.raises(ValueError):
+            source.indexed_multi_model_binary_black_hole(
+                self.frequency_array, waveform_index=2, **self.parameters
+            )
+        np.testing.assert_array_equal(
+            source.waveform_approximant_from_index(
+                [1, 0, 1], ["FakeA", "FakeB"]
+            ), ["FakeB", "FakeA", "FakeB"]
+        )
+
+    def test_synthetic_backend(self, monkeypatch):
+        import time
+        from bilby_nr import source
+        pols = source.synthetic_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        mask = self.frequency_array < 20.
+        assert not np.any(pols["plus"][mask])
+        assert np.all(np.abs(pols["plus"][~mask][:10]) > 0)
+        start = time.perf_counter()
+        source.synthetic_binary_black_hole(
+            self.frequency_array, synthetic_cost=0.05, **self.parameters
+        )
+        assert time.perf_counter() - start >= 0.05
+        # real approximant names can be mapped to the synthetic backend so
+        # that the weighting is unchanged
+        for approximant in self.waveform_kwargs["waveform_approximant_list"]:
+            monkeypatch.setitem(source._BACKENDS, approximant, None)
+            source.register_backend(
+                approximant, source.synthetic_binary_black_hole,
+                waveform_arguments={"synthetic_cost": 0.}
+            )
+        self.parameters.update(self.waveform_kwargs)
+        self.parameters["catch_waveform_errors"] = False
+        out = source.multi_model_binary_black_hole(
+            self.frequency_array, **self.parameters
+        )
+        np.testing.assert_almost_equal(out["plus"], pols["plus"])
+
+    def _batch_parameters(self, n=4):
+        np.random.seed(123)
+        return {
+            key: value + np.random.uniform(0, 0.1, size=n) for key, value in
+            self.parameters.items()
+        }
+
+    def test_multi_model_binary_black_hole_batch(self):
+        from bilby_nr.source import (
+            multi_model_binary_black_hole, multi_model_binary_black_hole_batch
+        )
+        from bilby_nr.match import match_from_interpolant
+        parameters = self._batch_parameters()
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args["use_best_match"] = True
+        results = list(multi_model_binary_black_hole_batch(
+            self.frequency_array, parameters, **_wvf_args
+        ))
+        assert sorted(index for index, _, _ in results) == [0, 1, 2, 3]
+        approximants = [approximant for _, approximant, _ in results]
+        # rows are grouped by approximant
+        assert approximants == sorted(
+            approximants, key=_wvf_args["waveform_approximant_list"].index
+        )
+        for index, approximant, pols in results:
+            row = {key: value[index] for key, value in parameters.items()}
+            matches = [
+                match_from_interpolant(wvf, *[
+                    row[key] for key in row.keys() if key !=
+                    "luminosity_distance"
+                ]) for wvf in _wvf_args["waveform_approximant_list"]
+            ]
+            assert approximant == _wvf_args["waveform_approximant_list"][
+                np.argmax(matches)
+            ]
+            expected = multi_model_binary_black_hole(
+                self.frequency_array, **row, **_wvf_args
+            )
+            for mode in ["plus", "cross"]:
+                np.testing.assert_almost_equal(pols[mode], expected[mode])
+
+    @pytest.mark.parametrize("record_statistics", [False, True])
+    def test_multi_model_binary_black_hole_batch_statistics(
+        self, monkeypatch, record_statistics
+    ):
+        from bilby_nr import source
+        from bilby_nr.statistics import ModelStatistics
+        statistics = ModelStatistics()
+        monkeypatch.setattr(source, "statistics", statistics)
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args.pop("match_interpolant")
+        list(source.multi_model_binary_black_hole_batch(
+            self.frequency_array, self._batch_parameters(),
+            record_statistics=record_statistics, **_wvf_args
+        ))
+        draws = sum(
+            data["draws"] for data in
+            statistics.as_dict()["models"].values()
+        )
+        assert draws == (4 if record_statistics else 0)
+
+    def test_multi_model_binary_black_hole_batch_reuse_buffers(self):
+        from bilby_nr.source import multi_model_binary_black_hole_batch
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args.pop("match_interpolant")
+        _wvf_args["waveform_approximant_list"] = ["Synthetic"]
+        results = {}
+        for reuse_buffers in [False, True]:
+            results[reuse_buffers] = list(multi_model_binary_black_hole_batch(
+                self.frequency_array, self._batch_parameters(n=20),
+                reuse_buffers=reuse_buffers, **_wvf_args
+            ))
+        # every row must keep its own polarizations
+        for (index, _, pols), (_index, _, _pols) in zip(
+            results[False], results[True]
+        ):
+            assert index == _index
+            for mode in ["plus", "cross"]:
+                np.testing.assert_allclose(
+                    _pols[mode], pols[mode], rtol=1e-10, atol=0
+                )
+
+    def test_multi_model_binary_black_hole_batch_pool(self):
+        from bilby_nr.source import multi_model_binary_black_hole_batch
+        _wvf_args = self.waveform_kwargs.copy()
+        _wvf_args.pop("match_interpolant")
+        results = multi_model_binary_black_hole_batch(
+            self.frequency_array, self._batch_parameters(n=6), npool=2,
+            chunk_size=2, **_wvf_args
+        )
+        indices = []
+        for index, approximant, pols in results:
+            assert approximant in _wvf_args["waveform_approximant_list"]
+            assert isinstance(pols, dict)
+            indices.append(index)
+        assert sorted(indices) == list(range(6))
+
     def test_multi_model_binary_black_hole_incorrect_weights(self):
         from bilby_nr.source import _multi_model_binary_black_hole
         with pytest.raises(ValueError):
@@ -123,6 +452,18 @@ def test_weights_from_matches():
         np.testing.assert_almost_equal(weights, _true)
 
 
+def test_weights_from_matches_batch():
+    from bilby_nr.source import _weights_from_matches
+    matches = np.array([[0.3, 0.9, 0.8], [0.95, 0.5, 0.6]])
+    for use_best in [True, False]:
+        weights = _weights_from_matches(matches, use_best=use_best)
+        for row in range(2):
+            np.testing.assert_almost_equal(
+                weights[row],
+                _weights_from_matches(matches[row], use_best=use_best)
+            )
+
+
 def test_weights_from_matches_custom_mapping():
     from bilby_nr.source import _weights_from_matches
     matches = np.array([0.3, 0.9, 0.8])
@@ -145,3 +486,16 @@ def test_weights_from_matches_custom_mapping():
         string_input = _weights_from_matches(
             matches, mapping="1 / ((1 - (matches + unknown_variable))**4)"
         )
+
+
+def test_rate_limited_warning(caplog):
+    from bilby_nr.source import _RateLimitedWarning
+    warning = _RateLimitedWarning(interval=1000.)
+    with caplog.at_level("WARNING", logger="bilby"):
+        for _ in range(5):
+            warning("failure")
+        assert len(caplog.records) == 1
+        warning._last -= 2000.
+        warning("failure")
+        assert len(caplog.records) == 2
+        assert "4 further waveform failures" in caplog.records[-1].message
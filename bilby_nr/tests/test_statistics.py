@@ -0,0 +1,99 @@
+from bilby_nr.statistics import ModelStatistics
+import multiprocessing
+import numpy as np
+import pytest
+
+
+def _record_in_worker(approximant):
+    from bilby_nr.statistics import statistics
+    statistics.record_draw(approximant)
+    statistics.record_waveform(approximant, 0.5, failed=True)
+    return statistics.slot
+
+
+class TestModelStatistics(object):
+    def setup_method(self):
+        self.statistics = ModelStatistics(max_models=2, weight_bins=4)
+
+    def teardown_method(self):
+        self.statistics.unshare()
+
+    def test_record(self):
+        self.statistics.record_weights(["A", "B"], [0.3, 0.7])
+        self.statistics.record_draw("B")
+        self.statistics.record_waveform("B", 0.1)
+        self.statistics.record_waveform("A", 0.2, failed=True)
+        data = self.statistics.as_dict()
+        assert data["weight_bin_edges"] == [0., 0.25, 0.5, 0.75, 1.]
+        assert data["models"]["A"]["draws"] == 0
+        assert data["models"]["A"]["failures"] == 1
+        assert data["models"]["A"]["weight_histogram"] == [0, 1, 0, 0]
+        assert data["models"]["B"]["draws"] == 1
+        assert data["models"]["B"]["failures"] == 0
+        assert data["models"]["B"]["weight_histogram"] == [0, 0, 1, 0]
+        np.testing.assert_almost_equal(
+            data["models"]["B"]["waveform_time"], 0.1
+        )
+
+    def test_fixed_size(self):
+        for model in ["A", "B", "C"]:
+            self.statistics.record_draw(model)
+        assert sorted(self.statistics.as_dict()["models"]) == ["A", "B"]
+        assert self.statistics.array.shape == (1, 2, 8)
+
+    def test_paused(self):
+        with self.statistics.paused():
+            self.statistics.record_draw("A")
+        assert self.statistics.as_dict()["models"] == {}
+
+    def test_reset(self):
+        self.statistics.record_draw("A")
+        self.statistics.reset()
+        assert self.statistics.as_dict()["models"]["A"]["draws"] == 0
+
+    @pytest.mark.skipif(
+        "fork" not in multiprocessing.get_all_start_methods(),
+        reason="requires the fork start method"
+    )
+    def test_shared_across_pool_workers(self):
+        from bilby_nr.statistics import statistics
+        statistics.share(["A", "B"], nslots=3)
+        try:
+            statistics.record_draw("B")
+            ctx = multiprocessing.get_context("fork")
+            with ctx.Pool(2) as pool:
+                slots = pool.map(_record_in_worker, ["A"] * 10)
+            data = statistics.as_dict()
+        finally:
+            statistics.unshare()
+            statistics.reset()
+        assert set(slots).issubset({1, 2})
+        assert data["models"]["A"]["draws"] == 10
+        assert data["models"]["A"]["failures"] == 10
+        assert data["models"]["B"]["draws"] == 1
+
+    @pytest.mark.skipif(
+        "fork" not in multiprocessing.get_all_start_methods(),
+        reason="requires the fork start method"
+    )
+    def test_replaced_pool_workers(self):
+        from bilby_nr.statistics import statistics
+        statistics.share(["A", "B"], nslots=2)
+        try:
+            ctx = multiprocessing.get_context("fork")
+            # each task is run by a new worker which reuses the slot of the
+            # worker that it replaced
+            with ctx.Pool(1, maxtasksperchild=1) as pool:
+                slots = pool.map(_record_in_worker, ["A"] * 4, chunksize=1)
+            assert set(slots) == {1}
+            # workers which are unable to claim a slot share the overflow
+            # slot
+            with ctx.Pool(3, maxtasksperchild=2) as pool:
+                slots += pool.map(_record_in_worker, ["A"] * 20, chunksize=1)
+            data = statistics.as_dict()
+        finally:
+            statistics.unshare()
+            statistics.reset()
+        assert set(slots).issubset({1, 2})
+        assert data["models"]["A"]["draws"] == 24
+        assert data["models"]["A"]["failures"] == 24
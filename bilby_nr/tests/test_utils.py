@@ -22,3 +22,31 @@ def test_convert_waveform_input_string():
     for opt in variation:
         out = utils.convert_waveform_input(opt)
         assert out == ["A", "B", "C"]
+
+
+@pytest.mark.parametrize("shared_tracker", [True, False])
+def test_attach_shared_memory(monkeypatch, shared_tracker):
+    import sys
+    from multiprocessing import resource_tracker
+    from bilby_nr import utils
+    if sys.version_info >= (3, 13):
+        pytest.skip("shared memory is attached with track=False")
+    shm = utils.create_shared_memory(8)
+    unregistered = []
+    monkeypatch.setattr(
+        utils, "_shares_resource_tracker", lambda: shared_tracker
+    )
+    monkeypatch.setattr(
+        resource_tracker, "unregister",
+        lambda name, rtype: unregistered.append(name)
+    )
+    try:
+        attached = utils.attach_shared_memory(shm.name)
+        attached.close()
+    finally:
+        monkeypatch.undo()
+        shm.close()
+        shm.unlink()
+    # the registration of the creating process must not be removed when
+    # the resource tracker is shared
+    assert len(unregistered) == int(not shared_tracker)
@@ -0,0 +1,39 @@
+import bilby
+import numpy as np
+
+
+def test_warm_up(monkeypatch):
+    from bilby_nr import source
+    from bilby_nr.statistics import ModelStatistics
+    from bilby_nr.warmup import warm_up
+    statistics = ModelStatistics()
+    monkeypatch.setattr("bilby_nr.statistics.statistics", statistics)
+    monkeypatch.setattr(source, "statistics", statistics)
+    models = ["IMRPhenomPv2", "IMRPhenomXP"]
+    ifos = bilby.gw.detector.InterferometerList(["H1", "L1"])
+    ifos.set_strain_data_from_zero_noise(
+        sampling_frequency=1024, duration=4, start_time=-2
+    )
+    waveform_generator = bilby.gw.WaveformGenerator(
+        duration=4, sampling_frequency=1024,
+        frequency_domain_source_model=source.multi_model_binary_black_hole,
+        waveform_arguments=dict(
+            waveform_approximant=models[0], waveform_approximant_list=models,
+            reference_frequency=20., minimum_frequency=20.
+        )
+    )
+    likelihood = bilby.gw.likelihood.GravitationalWaveTransient(
+        ifos, waveform_generator
+    )
+    priors = bilby.gw.prior.BBHPriorDict()
+    priors["geocent_time"] = bilby.core.prior.Uniform(-0.1, 0.1)
+    timings = warm_up(likelihood, priors)
+    assert list(timings.keys()) == [
+        "IMRPhenomPv2 waveform", "IMRPhenomXP waveform", "likelihood"
+    ]
+    assert all(value > 0 for value in timings.values())
+    # the fiducial point is not included in the model statistics
+    assert statistics.as_dict()["models"] == {}
+    assert np.isfinite(
+        likelihood.log_likelihood_ratio(parameters=priors.sample())
+    )
@@ -1,5 +1,8 @@
 # Licensed under an MIT style license -- see LICENSE.md
 
+import multiprocessing
+import sys
+from multiprocessing import resource_tracker, shared_memory
 from bilby_pipe.utils import strip_quotes
 
 __author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
@@ -46,3 +49,65 @@ def convert_waveform_list_from_input(waveform_list):
     if isinstance(waveform_list, list):
         return waveform_list
     return convert_waveform_input(waveform_list)
+
+
+def create_shared_memory(nbytes):
+    """Create a new shared memory segment
+
+    Parameters
+    ----------
+    nbytes: int
+        The size of the shared memory segment in bytes
+
+    Returns
+    -------
+    shm: multiprocessing.shared_memory.SharedMemory
+        The shared memory segment. The caller is responsible for closing and
+        unlinking the segment
+    """
+    return shared_memory.SharedMemory(create=True, size=max(int(nbytes), 1))
+
+
+def attach_shared_memory(name):
+    """Attach to an existing shared memory segment without taking ownership
+    of it. This prevents the resource tracker of the attaching process from
+    unlinking the segment when the attaching process exits
+
+    Parameters
+    ----------
+    name: str
+        The name of the shared memory segment
+
+    Returns
+    -------
+    shm: multiprocessing.shared_memory.SharedMemory
+        The shared memory segment
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # this must be checked before attaching since attaching starts a
+    # resource tracker if one is not already running
+    shared_tracker = _shares_resource_tracker()
+    shm = shared_memory.SharedMemory(name=name)
+    # registering a segment with a tracker that already tracks it has no
+    # effect, and unregistering it would remove the registration of the
+    # process which created the segment. We therefore only unregister if
+    # this process has its own resource tracker
+    if not shared_tracker:
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+def _shares_resource_tracker():
+    """Return True if the current process was started by multiprocessing,
+    e.g. a pool worker, and uses the resource tracker of its parent. Both
+    forked and spawned workers inherit the resource tracker of the parent
+    process
+    """
+    return (
+        multiprocessing.parent_process() is not None and
+        getattr(resource_tracker._resource_tracker, "_fd", None) is not None
+    )
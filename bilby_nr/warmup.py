@@ -0,0 +1,108 @@
+# Licensed under an MIT style license -- see LICENSE.md
+
+import time
+from contextlib import contextmanager
+import numpy as np
+from bilby.core.utils import logger
+
+__author__ = ["Charlie Hoy <charlie.hoy@port.ac.uk>"]
+
+_WEIGHT_ARGUMENTS = [
+    "waveform_approximant_list", "catch_waveform_errors", "match_interpolant",
+    "use_best_match", "match_to_weight", "weight_cache_size",
+    "weight_cache_tolerance", "waveform_fallback", "max_waveform_attempts"
+]
+_WAVEFORM_PARAMETERS = [
+    "mass_1", "mass_2", "luminosity_distance", "a_1", "tilt_1", "phi_12",
+    "a_2", "tilt_2", "phi_jl", "theta_jn", "phase"
+]
+
+
+@contextmanager
+def _timed(timings, item):
+    """Context manager which stores the time spent inside the context in
+    timings[item]. Errors are logged rather than raised since a failed
+    warm-up should not stop the analysis
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        logger.warning(f"Warm-up of {item} failed: {e}")
+    finally:
+        timings[item] = time.perf_counter() - start
+        logger.info(f"Warm-up of {item} took {timings[item]:.3f}s")
+
+
+def warm_up(likelihood, priors):
+    """Pay the one-off costs of a multi-model analysis before sampling
+    starts: the compiled interpolants are loaded and evaluated, each waveform
+    approximant is evaluated once at a fiducial point drawn from the prior
+    and the likelihood is evaluated once to prime the caches used by the
+    source model. This should be called in the parent process, before the
+    sampler creates its pool, so that the workers inherit the warm state
+
+    Parameters
+    ----------
+    likelihood: bilby.gw.likelihood.GravitationalWaveTransient
+        the likelihood used for the analysis
+    priors: bilby.gw.prior.BBHPriorDict
+        the prior used for the analysis. A single sample is drawn and used
+        as the fiducial point
+
+    Returns
+    -------
+    timings: dict
+        dictionary containing the time spent warming up each item in seconds
+    """
+    from bilby.gw.conversion import convert_to_lal_binary_black_hole_parameters
+    from .interp.pade_pade import ALLOWED_MODELS, load_interpolant
+    from .source import (
+        _generate_polarizations, _matches_for_samples,
+        _use_interpolant_bundle
+    )
+    from .statistics import statistics
+    from .utils import convert_waveform_list_from_input
+    waveform_generator = likelihood.waveform_generator
+    waveform_arguments = waveform_generator.waveform_arguments.copy()
+    waveform_approximant_list = convert_waveform_list_from_input(
+        waveform_arguments.get(
+            "waveform_approximant_list",
+            waveform_arguments.get("waveform_approximant")
+        )
+    )
+    if isinstance(waveform_approximant_list, str):
+        waveform_approximant_list = [waveform_approximant_list]
+    interpolant = waveform_arguments.get("match_interpolant", None)
+    _use_interpolant_bundle(waveform_arguments)
+    for key in _WEIGHT_ARGUMENTS:
+        waveform_arguments.pop(key, None)
+    sample = priors.sample()
+    parameters, _ = convert_to_lal_binary_black_hole_parameters(sample.copy())
+    timings = {}
+    # the fiducial point should not contribute to the model statistics
+    with statistics.paused():
+        if interpolant is not None:
+            for approximant in waveform_approximant_list:
+                if approximant not in ALLOWED_MODELS:
+                    continue
+                with _timed(timings, f"{approximant} interpolant"):
+                    load_interpolant(approximant)
+            with _timed(timings, f"{interpolant} evaluation"):
+                _matches_for_samples(
+                    waveform_approximant_list, {
+                        key: np.atleast_1d(value) for key, value in
+                        parameters.items()
+                    }, interpolant
+                )
+        for approximant in waveform_approximant_list:
+            with _timed(timings, f"{approximant} waveform"):
+                _generate_polarizations(
+                    waveform_generator.frequency_array,
+                    *[parameters[key] for key in _WAVEFORM_PARAMETERS],
+                    **dict(waveform_arguments, waveform_approximant=approximant)
+                )
+        with _timed(timings, "likelihood"):
+            likelihood.log_likelihood_ratio(parameters=sample)
+    logger.info(f"Warm-up completed in {sum(timings.values()):.3f}s")
+    return timings